@@ -0,0 +1,97 @@
+"""
+Окружение Alembic: асинхронный движок на asyncpg и блокировка от параллельных миграций
+"""
+import re
+import asyncio
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import pool, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.config import settings
+from app.database import Base, normalize_database_url
+import app.models  # noqa: F401 - регистрируем модели в метаданных
+
+config = context.config
+
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = Base.metadata
+
+# Ключ advisory lock: реплики, стартующие одновременно, мигрируют по очереди
+MIGRATION_LOCK_KEY = 7245019
+
+# Разделы секционированных таблиц создаются сервисом обслуживания, а не миграциями
+PARTITION_TABLE_RE = re.compile(r"^(coin_transactions_(legacy|p\d{6})|change_log_h\d+)$")
+
+
+def include_name(name, type_, parent_names) -> bool:
+    """Не сравнивать разделы и их индексы при autogenerate"""
+    if type_ == "table":
+        return not PARTITION_TABLE_RE.match(name)
+    return True
+
+
+# Индексы по выражению: Postgres хранит выражение в своей записи, и autogenerate видит различие
+EXPRESSION_INDEXES = {"ix_store_items_search"}
+
+
+def include_object(obj, name, type_, reflected, compare_to) -> bool:
+    """Не сравнивать индексы по выражению (создаются и меняются только миграциями)"""
+    return not (type_ == "index" and name in EXPRESSION_INDEXES)
+
+
+def run_migrations_offline() -> None:
+    """Сгенерировать SQL без подключения к базе"""
+    context.configure(
+        url=normalize_database_url(settings.database_url),
+        target_metadata=target_metadata,
+        include_name=include_name,
+        include_object=include_object,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def do_run_migrations(connection: Connection) -> None:
+    connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+    connection.commit()
+    try:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            include_name=include_name,
+            include_object=include_object,
+            compare_type=True
+        )
+
+        with context.begin_transaction():
+            context.run_migrations()
+    finally:
+        connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        connection.commit()
+
+
+async def run_async_migrations() -> None:
+    connectable = create_async_engine(normalize_database_url(settings.database_url), poolclass=pool.NullPool)
+
+    async with connectable.connect() as connection:
+        await connection.run_sync(do_run_migrations)
+
+    await connectable.dispose()
+
+
+def run_migrations_online() -> None:
+    asyncio.run(run_async_migrations())
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,265 @@
+"""baseline schema
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-19 00:00:00
+
+Базовая схема, ранее создававшаяся через Base.metadata.create_all.
+Если таблицы уже существуют (база создана до перехода на Alembic),
+миграция только отмечает версию и досоздает системные шаблоны заданий.
+"""
+import uuid
+from datetime import datetime
+
+from alembic import context, op
+import sqlalchemy as sa
+
+from app.services.init_data import DEFAULT_TASK_TEMPLATES
+
+
+# revision identifiers, used by Alembic.
+revision = '0001_baseline'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if context.is_offline_mode() or not sa.inspect(op.get_bind()).has_table('families'):
+        create_schema()
+    seed_task_templates()
+
+
+def create_schema() -> None:
+    op.create_table('families',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('passcode', sa.String(length=255), nullable=False),
+    sa.Column('settings', sa.JSON(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('task_templates',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('category', sa.String(length=50), nullable=False),
+    sa.Column('title', sa.String(length=200), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('default_reward_coins', sa.Integer(), nullable=False),
+    sa.Column('is_system_template', sa.Boolean(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('users',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('family_id', sa.UUID(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('username', sa.String(length=50), nullable=False),
+    sa.Column('password_hash', sa.String(length=255), nullable=False),
+    sa.Column('role', sa.String(length=10), nullable=False),
+    sa.Column('avatar_url', sa.String(length=255), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.CheckConstraint("role IN ('parent', 'child')", name='check_user_role'),
+    sa.ForeignKeyConstraint(['family_id'], ['families.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('username')
+    )
+    op.create_table('coin_balances',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('balance', sa.Integer(), nullable=False),
+    sa.Column('total_earned', sa.Integer(), nullable=False),
+    sa.Column('total_spent', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', name='unique_user_balance')
+    )
+    op.create_table('coin_transactions',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('amount', sa.Integer(), nullable=False),
+    sa.Column('transaction_type', sa.String(length=20), nullable=False),
+    sa.Column('description', sa.String(length=255), nullable=False),
+    sa.Column('reference_id', sa.UUID(), nullable=True),
+    sa.Column('reference_type', sa.String(length=20), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.CheckConstraint("transaction_type IN ('earned', 'spent', 'bonus', 'penalty')", name='check_transaction_type'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('store_items',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('family_id', sa.UUID(), nullable=False),
+    sa.Column('name', sa.String(length=200), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('category', sa.String(length=50), nullable=False),
+    sa.Column('price_coins', sa.Integer(), nullable=False),
+    sa.Column('is_available', sa.Boolean(), nullable=False),
+    sa.Column('created_by', sa.UUID(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['created_by'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['family_id'], ['families.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('tasks',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('family_id', sa.UUID(), nullable=False),
+    sa.Column('template_id', sa.UUID(), nullable=True),
+    sa.Column('title', sa.String(length=200), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('category', sa.String(length=50), nullable=False),
+    sa.Column('reward_coins', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('created_by', sa.UUID(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.CheckConstraint("status IN ('active', 'paused', 'archived')", name='check_task_status'),
+    sa.ForeignKeyConstraint(['created_by'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['family_id'], ['families.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['template_id'], ['task_templates.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('goals',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('family_id', sa.UUID(), nullable=False),
+    sa.Column('executor_type', sa.String(length=20), nullable=False),
+    sa.Column('executor_data', sa.JSON(), nullable=True),
+    sa.Column('child_id', sa.UUID(), nullable=True),
+    sa.Column('title', sa.String(length=200), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('goal_type', sa.String(length=20), nullable=False),
+    sa.Column('target_store_item_id', sa.UUID(), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('deadline', sa.Date(), nullable=True),
+    sa.Column('reward_coins', sa.Integer(), nullable=False),
+    sa.Column('goal_metadata', sa.JSON(), nullable=True),
+    sa.Column('created_by', sa.UUID(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('completed_at', sa.DateTime(), nullable=True),
+    sa.CheckConstraint("executor_type IN ('individual', 'multiple_children', 'all_children', 'all_parents', 'whole_family')", name='check_executor_type'),
+    sa.CheckConstraint("goal_type IN ('coin_saving', 'store_item', 'habit_building', 'mixed')", name='check_goal_type'),
+    sa.CheckConstraint("status IN ('active', 'completed', 'paused', 'cancelled')", name='check_goal_status'),
+    sa.ForeignKeyConstraint(['child_id'], ['users.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['created_by'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['family_id'], ['families.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['target_store_item_id'], ['store_items.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('purchases',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('child_id', sa.UUID(), nullable=False),
+    sa.Column('item_id', sa.UUID(), nullable=False),
+    sa.Column('price_paid', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('used_at', sa.DateTime(), nullable=True),
+    sa.Column('expires_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.CheckConstraint("status IN ('purchased', 'used', 'expired')", name='check_purchase_status'),
+    sa.ForeignKeyConstraint(['child_id'], ['users.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['item_id'], ['store_items.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('task_assignments',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('task_id', sa.UUID(), nullable=False),
+    sa.Column('child_id', sa.UUID(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('due_date', sa.Date(), nullable=True),
+    sa.Column('completed_at', sa.DateTime(), nullable=True),
+    sa.Column('approved_at', sa.DateTime(), nullable=True),
+    sa.Column('approved_by', sa.UUID(), nullable=True),
+    sa.Column('proof_text', sa.Text(), nullable=True),
+    sa.Column('proof_image_url', sa.String(length=255), nullable=True),
+    sa.Column('coins_earned', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.CheckConstraint("status IN ('assigned', 'completed', 'approved', 'rejected')", name='check_assignment_status'),
+    sa.ForeignKeyConstraint(['approved_by'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['child_id'], ['users.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['task_id'], ['tasks.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('goal_achievements',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('goal_id', sa.UUID(), nullable=False),
+    sa.Column('child_id', sa.UUID(), nullable=False),
+    sa.Column('achieved_at', sa.DateTime(), nullable=False),
+    sa.Column('reward_coins_earned', sa.Integer(), nullable=False),
+    sa.Column('notes', sa.Text(), nullable=True),
+    sa.ForeignKeyConstraint(['child_id'], ['users.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['goal_id'], ['goals.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('goal_conditions',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('goal_id', sa.UUID(), nullable=False),
+    sa.Column('condition_type', sa.String(length=20), nullable=False),
+    sa.Column('target_value', sa.Integer(), nullable=False),
+    sa.Column('target_reference_id', sa.UUID(), nullable=True),
+    sa.Column('description', sa.String(length=255), nullable=False),
+    sa.Column('weight', sa.Numeric(precision=3, scale=2), nullable=False),
+    sa.Column('is_streak_required', sa.Boolean(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.CheckConstraint("condition_type IN ('coin_amount', 'task_completion', 'habit_streak', 'habit_actions', 'custom')", name='check_condition_type'),
+    sa.CheckConstraint('weight >= 0 AND weight <= 1', name='check_weight_range'),
+    sa.ForeignKeyConstraint(['goal_id'], ['goals.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('goal_progress',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('goal_id', sa.UUID(), nullable=False),
+    sa.Column('condition_id', sa.UUID(), nullable=False),
+    sa.Column('current_value', sa.Integer(), nullable=False),
+    sa.Column('streak_count', sa.Integer(), nullable=False),
+    sa.Column('last_activity_date', sa.Date(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['condition_id'], ['goal_conditions.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['goal_id'], ['goals.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def seed_task_templates() -> None:
+    """Создать системные шаблоны заданий, если их еще нет"""
+    if not context.is_offline_mode():
+        exists = op.get_bind().execute(
+            sa.text("SELECT 1 FROM task_templates WHERE is_system_template = true LIMIT 1")
+        ).scalar()
+        if exists:
+            return
+
+    task_templates = sa.table(
+        'task_templates',
+        sa.column('id', sa.UUID()),
+        sa.column('category', sa.String()),
+        sa.column('title', sa.String()),
+        sa.column('description', sa.Text()),
+        sa.column('default_reward_coins', sa.Integer()),
+        sa.column('is_system_template', sa.Boolean()),
+        sa.column('created_at', sa.DateTime()),
+    )
+    now = datetime.utcnow()
+    op.bulk_insert(task_templates, [
+        {**template, "id": uuid.uuid4(), "is_system_template": True, "created_at": now}
+        for template in DEFAULT_TASK_TEMPLATES
+    ])
+
+
+def downgrade() -> None:
+    op.drop_table('goal_progress')
+    op.drop_table('goal_conditions')
+    op.drop_table('goal_achievements')
+    op.drop_table('task_assignments')
+    op.drop_table('purchases')
+    op.drop_table('goals')
+    op.drop_table('tasks')
+    op.drop_table('store_items')
+    op.drop_table('coin_transactions')
+    op.drop_table('coin_balances')
+    op.drop_table('users')
+    op.drop_table('task_templates')
+    op.drop_table('families')
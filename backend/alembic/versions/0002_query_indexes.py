@@ -0,0 +1,58 @@
+"""query indexes
+
+Revision ID: 0002_query_indexes
+Revises: 0001_baseline
+Create Date: 2026-10-19 00:00:00
+
+Индексы под фильтры сервисов (app/services): внешние ключи и пары
+"владелец + статус/дата". Создаются CONCURRENTLY, чтобы не блокировать
+запись в рабочие таблицы.
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_query_indexes'
+down_revision = '0001_baseline'
+branch_labels = None
+depends_on = None
+
+
+# (имя индекса, таблица, колонки)
+INDEXES = [
+    ('ix_users_family_id_role', 'users', ['family_id', 'role']),
+    ('ix_tasks_family_id', 'tasks', ['family_id']),
+    ('ix_tasks_created_by_status', 'tasks', ['created_by', 'status']),
+    ('ix_task_assignments_child_id_status', 'task_assignments', ['child_id', 'status']),
+    ('ix_task_assignments_task_id_status', 'task_assignments', ['task_id', 'status']),
+    ('ix_goals_child_id_status', 'goals', ['child_id', 'status']),
+    ('ix_goals_family_id_created_at', 'goals', ['family_id', 'created_at']),
+    ('ix_goal_conditions_goal_id', 'goal_conditions', ['goal_id']),
+    ('ix_goal_progress_goal_id_condition_id', 'goal_progress', ['goal_id', 'condition_id']),
+    ('ix_goal_achievements_goal_id', 'goal_achievements', ['goal_id']),
+    ('ix_goal_achievements_child_id', 'goal_achievements', ['child_id']),
+    ('ix_store_items_family_id_is_available', 'store_items', ['family_id', 'is_available']),
+    ('ix_purchases_child_id_created_at', 'purchases', ['child_id', 'created_at']),
+    ('ix_coin_transactions_user_id_created_at', 'coin_transactions', ['user_id', 'created_at']),
+]
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY нельзя выполнять внутри транзакции
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(
+                name, table, columns,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(
+                name, table_name=table,
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
@@ -0,0 +1,118 @@
+"""partition coin_transactions by month
+
+Revision ID: 0003_partition_coin_transactions
+Revises: 0002_query_indexes
+Create Date: 2026-10-19 00:00:00
+
+coin_transactions становится таблицей, секционированной по диапазону created_at
+(раздел на каждый месяц). Существующие данные не копируются: старая таблица
+подключается целиком как раздел coin_transactions_legacy (от MINVALUE до начала
+следующего месяца). Долгие операции - построение уникального индекса (id, created_at)
+и проверка CHECK-ограничения по диапазону - выполняются без блокировки записи,
+а эксклюзивная блокировка нужна только на короткое переключение в конце.
+"""
+from datetime import datetime
+
+from alembic import op
+
+from app.services.partition_service import add_months, month_start, partition_name
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_partition_coin_transactions'
+down_revision = '0002_query_indexes'
+branch_labels = None
+depends_on = None
+
+# Разделы, создаваемые заранее (дальше их поддерживает PartitionService)
+PREMAKE_MONTHS = 3
+
+COLUMNS_SQL = """
+    id uuid NOT NULL,
+    user_id uuid NOT NULL,
+    amount integer NOT NULL,
+    transaction_type varchar(20) NOT NULL,
+    description varchar(255) NOT NULL,
+    reference_id uuid,
+    reference_type varchar(20),
+    created_at timestamp without time zone NOT NULL
+"""
+
+
+def upgrade() -> None:
+    boundary = add_months(month_start(datetime.utcnow()), 1)
+    boundary_sql = boundary.isoformat(' ')
+
+    # 1. Без блокировки записи: уникальный индекс под будущий первичный ключ
+    #    и CHECK, доказывающий, что все строки лежат левее границы раздела
+    #    (благодаря ему ATTACH PARTITION не сканирует таблицу под блокировкой).
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS coin_transactions_id_created_at_idx "
+            "ON coin_transactions (id, created_at)"
+        )
+        op.execute(
+            "ALTER TABLE coin_transactions ADD CONSTRAINT coin_transactions_legacy_range "
+            f"CHECK (created_at < '{boundary_sql}') NOT VALID"
+        )
+        op.execute("ALTER TABLE coin_transactions VALIDATE CONSTRAINT coin_transactions_legacy_range")
+
+    # 2. Короткое переключение: только операции с каталогом
+    op.execute("SET LOCAL lock_timeout = '10s'")
+    op.execute("LOCK TABLE coin_transactions IN ACCESS EXCLUSIVE MODE")
+    op.execute("ALTER TABLE coin_transactions RENAME TO coin_transactions_legacy")
+    op.execute("ALTER TABLE coin_transactions_legacy DROP CONSTRAINT coin_transactions_pkey")
+    op.execute(
+        "ALTER TABLE coin_transactions_legacy ADD CONSTRAINT coin_transactions_legacy_pkey "
+        "PRIMARY KEY USING INDEX coin_transactions_id_created_at_idx"
+    )
+    op.execute(
+        "ALTER TABLE coin_transactions_legacy RENAME CONSTRAINT coin_transactions_user_id_fkey "
+        "TO coin_transactions_legacy_user_id_fkey"
+    )
+    op.execute(
+        "ALTER INDEX ix_coin_transactions_user_id_created_at "
+        "RENAME TO coin_transactions_legacy_user_id_created_at_idx"
+    )
+
+    op.execute(f"""
+        CREATE TABLE coin_transactions (
+            {COLUMNS_SQL},
+            CONSTRAINT coin_transactions_pkey PRIMARY KEY (id, created_at),
+            CONSTRAINT coin_transactions_user_id_fkey FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE,
+            CONSTRAINT check_transaction_type CHECK (transaction_type IN ('earned', 'spent', 'bonus', 'penalty'))
+        ) PARTITION BY RANGE (created_at)
+    """)
+    op.execute("CREATE INDEX ix_coin_transactions_user_id_created_at ON coin_transactions (user_id, created_at)")
+
+    # Совпадающие индексы и ограничения legacy подключаются к родительским, а не строятся заново
+    op.execute(
+        "ALTER TABLE coin_transactions ATTACH PARTITION coin_transactions_legacy "
+        f"FOR VALUES FROM (MINVALUE) TO ('{boundary_sql}')"
+    )
+    op.execute("ALTER TABLE coin_transactions_legacy DROP CONSTRAINT coin_transactions_legacy_range")
+
+    for offset in range(PREMAKE_MONTHS):
+        start, end = add_months(boundary, offset), add_months(boundary, offset + 1)
+        op.execute(
+            f"CREATE TABLE {partition_name(start)} PARTITION OF coin_transactions "
+            f"FOR VALUES FROM ('{start.isoformat(' ')}') TO ('{end.isoformat(' ')}')"
+        )
+
+
+def downgrade() -> None:
+    # Обратное преобразование копирует данные в обычную таблицу (отсоединенные архивные разделы не возвращаются)
+    op.execute(f"""
+        CREATE TABLE coin_transactions_plain (
+            {COLUMNS_SQL},
+            CONSTRAINT coin_transactions_plain_pkey PRIMARY KEY (id),
+            CONSTRAINT coin_transactions_plain_user_id_fkey FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE,
+            CONSTRAINT check_transaction_type CHECK (transaction_type IN ('earned', 'spent', 'bonus', 'penalty'))
+        )
+    """)
+    op.execute("INSERT INTO coin_transactions_plain SELECT * FROM coin_transactions")
+    op.execute("DROP TABLE coin_transactions")
+    op.execute("ALTER TABLE coin_transactions_plain RENAME TO coin_transactions")
+    op.execute("ALTER INDEX coin_transactions_plain_pkey RENAME TO coin_transactions_pkey")
+    op.execute("ALTER TABLE coin_transactions RENAME CONSTRAINT coin_transactions_plain_user_id_fkey TO coin_transactions_user_id_fkey")
+    op.execute("CREATE INDEX ix_coin_transactions_user_id_created_at ON coin_transactions (user_id, created_at)")
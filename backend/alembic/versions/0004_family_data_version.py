@@ -0,0 +1,29 @@
+"""family data version
+
+Revision ID: 0004_family_data_version
+Revises: 0003_partition_coin_transactions
+Create Date: 2026-10-19 00:00:00
+
+Счетчик версии данных семьи для условных GET (ETag / If-None-Match).
+Колонка с константным значением по умолчанию добавляется без перезаписи таблицы.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_family_data_version'
+down_revision = '0003_partition_coin_transactions'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'families',
+        sa.Column('data_version', sa.BigInteger(), server_default='0', nullable=False)
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('families', 'data_version')
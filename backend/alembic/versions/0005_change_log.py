@@ -0,0 +1,54 @@
+"""change log for delta sync
+
+Revision ID: 0005_change_log
+Revises: 0004_family_data_version
+Create Date: 2026-10-19 00:00:00
+
+Журнал изменений семьи (GET /v1/changes), секционированный по хешу family_id.
+Данные, созданные до миграции, в журнал не попали: change_log_floor существующих
+семей равен их текущей версии, и клиенты с более старым курсором получают reset.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '0005_change_log'
+down_revision = '0004_family_data_version'
+branch_labels = None
+depends_on = None
+
+# Число разделов по хешу семьи
+PARTITIONS = 8
+
+
+def upgrade() -> None:
+    op.create_table(
+        'change_log',
+        sa.Column('family_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('version', sa.BigInteger(), nullable=False),
+        sa.Column('entity_type', sa.String(length=20), nullable=False),
+        sa.Column('entity_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('changed_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['family_id'], ['families.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('family_id', 'version', 'entity_type', 'entity_id'),
+        postgresql_partition_by='HASH (family_id)',
+    )
+    op.create_index('ix_change_log_changed_at', 'change_log', ['changed_at'])
+    for remainder in range(PARTITIONS):
+        op.execute(
+            f"CREATE TABLE change_log_h{remainder} PARTITION OF change_log "
+            f"FOR VALUES WITH (MODULUS {PARTITIONS}, REMAINDER {remainder})"
+        )
+
+    op.add_column(
+        'families',
+        sa.Column('change_log_floor', sa.BigInteger(), server_default='0', nullable=False)
+    )
+    op.execute("UPDATE families SET change_log_floor = data_version WHERE data_version > 0")
+
+
+def downgrade() -> None:
+    op.drop_column('families', 'change_log_floor')
+    op.drop_table('change_log')
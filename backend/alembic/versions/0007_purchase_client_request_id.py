@@ -0,0 +1,32 @@
+"""purchase client request id
+
+Revision ID: 0007_purchase_client_request_id
+Revises: 0006_outbox_messages
+Create Date: 2026-10-19 00:00:00
+
+Ключ повтора покупки: повторный запрос с тем же client_request_id
+возвращает уже созданную покупку вместо второго списания.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '0007_purchase_client_request_id'
+down_revision = '0006_outbox_messages'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('purchases', sa.Column('client_request_id', postgresql.UUID(as_uuid=True), nullable=True))
+    op.create_index(
+        'uq_purchases_child_id_client_request_id', 'purchases', ['child_id', 'client_request_id'],
+        unique=True, postgresql_where=sa.text('client_request_id IS NOT NULL')
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('uq_purchases_child_id_client_request_id', table_name='purchases')
+    op.drop_column('purchases', 'client_request_id')
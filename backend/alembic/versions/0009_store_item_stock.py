@@ -0,0 +1,42 @@
+"""store item stock and purchase limits
+
+Revision ID: 0009_store_item_stock
+Revises: 0008_idempotency_keys
+Create Date: 2026-10-19 00:00:00
+
+Остаток товара и лимит покупок за период; оба проверяются одним условным
+UPDATE в транзакции покупки.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009_store_item_stock'
+down_revision = '0008_idempotency_keys'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('store_items', sa.Column('stock_quantity', sa.Integer(), nullable=True))
+    op.add_column('store_items', sa.Column('purchase_limit', sa.Integer(), nullable=True))
+    op.add_column('store_items', sa.Column('purchase_limit_period', sa.String(length=10), nullable=True))
+    op.add_column('store_items', sa.Column('period_started_at', sa.DateTime(), nullable=True))
+    op.add_column('store_items', sa.Column('period_purchases', sa.Integer(), nullable=False, server_default='0'))
+    op.create_check_constraint('check_store_item_stock', 'store_items', 'stock_quantity >= 0')
+    op.create_check_constraint(
+        'check_store_item_purchase_limit', 'store_items',
+        "(purchase_limit IS NULL AND purchase_limit_period IS NULL) OR "
+        "(purchase_limit > 0 AND purchase_limit_period IN ('day', 'week', 'month'))"
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint('check_store_item_purchase_limit', 'store_items', type_='check')
+    op.drop_constraint('check_store_item_stock', 'store_items', type_='check')
+    op.drop_column('store_items', 'period_purchases')
+    op.drop_column('store_items', 'period_started_at')
+    op.drop_column('store_items', 'purchase_limit_period')
+    op.drop_column('store_items', 'purchase_limit')
+    op.drop_column('store_items', 'stock_quantity')
@@ -0,0 +1,60 @@
+"""store catalog search and popularity
+
+Revision ID: 0010_store_catalog
+Revises: 0009_store_item_stock
+Create Date: 2026-10-19 00:00:00
+
+Счетчик покупок товара (популярность) с заполнением по существующим покупкам,
+индексы сортировок каталога и GIN-индекс полнотекстового поиска.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0010_store_catalog'
+down_revision = '0009_store_item_stock'
+branch_labels = None
+depends_on = None
+
+SEARCH_DOCUMENT = "to_tsvector('russian', name || ' ' || coalesce(description, ''))"
+
+
+def upgrade() -> None:
+    op.add_column('store_items', sa.Column('purchase_count', sa.Integer(), nullable=False, server_default='0'))
+    op.execute("""
+        UPDATE store_items s SET purchase_count = p.purchases
+        FROM (SELECT item_id, count(*) AS purchases FROM purchases GROUP BY item_id) p
+        WHERE s.id = p.item_id
+    """)
+    # CREATE INDEX CONCURRENTLY нельзя выполнять внутри транзакции
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_store_items_family_id_price', 'store_items', ['family_id', 'price_coins', 'id'],
+            postgresql_where=sa.text('is_available'),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            'ix_store_items_family_id_popularity', 'store_items', ['family_id', 'purchase_count', 'id'],
+            postgresql_where=sa.text('is_available'),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            'ix_store_items_search', 'store_items', [sa.text(SEARCH_DOCUMENT)],
+            postgresql_using='gin',
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name in ('ix_store_items_search', 'ix_store_items_family_id_popularity', 'ix_store_items_family_id_price'):
+            op.drop_index(
+                name, table_name='store_items',
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
+    op.drop_column('store_items', 'purchase_count')
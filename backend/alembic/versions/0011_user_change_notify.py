@@ -0,0 +1,39 @@
+"""notify on user changes
+
+Revision ID: 0011_user_change_notify
+Revises: 0010_store_catalog
+Create Date: 2026-10-19 00:00:00
+
+Триггер на users отправляет NOTIFY user_changed с id пользователя при любом UPDATE
+или DELETE (ORM, Core update(), каскадное удаление семьи, ручной SQL). Каждый процесс
+API сбрасывает по нему запись кэша пользователей.
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0011_user_change_notify'
+down_revision = '0010_store_catalog'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE FUNCTION notify_user_changed() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('user_changed', OLD.id::text);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER users_notify_changed
+        AFTER UPDATE OR DELETE ON users
+        FOR EACH ROW EXECUTE FUNCTION notify_user_changed()
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER users_notify_changed ON users")
+    op.execute("DROP FUNCTION notify_user_changed()")
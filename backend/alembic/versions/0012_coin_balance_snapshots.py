@@ -0,0 +1,34 @@
+"""coin balance snapshots
+
+Revision ID: 0012_coin_balance_snapshots
+Revises: 0011_user_change_notify
+Create Date: 2026-10-19 00:00:00
+
+Баланс каждого пользователя на верхней границе последнего отсоединенного раздела
+coin_transactions. Пересчет прогресса целей проигрывает оставшийся журнал от него.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '0012_coin_balance_snapshots'
+down_revision = '0011_user_change_notify'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'coin_balance_snapshots',
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('balance', sa.Integer(), nullable=False),
+        sa.Column('as_of', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('coin_balance_snapshots')
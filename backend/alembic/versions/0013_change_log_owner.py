@@ -0,0 +1,28 @@
+"""change log entity owner
+
+Revision ID: 0013_change_log_owner
+Revises: 0012_coin_balance_snapshots
+Create Date: 2026-10-19 00:00:00
+
+Ребенок-владелец сущности в журнале изменений: об удалении назначения, транзакции
+или цели лента сообщает только родителям и этому ребенку. У старых записей владелец
+неизвестен - их удаления видят только родители.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '0013_change_log_owner'
+down_revision = '0012_coin_balance_snapshots'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('change_log', sa.Column('owner_id', postgresql.UUID(as_uuid=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('change_log', 'owner_id')
@@ -0,0 +1,51 @@
+"""
+Служебное API (только из сетей INTERNAL_NETWORKS)
+"""
+from typing import Optional
+from fastapi import APIRouter, Depends, Query, status
+from fastapi.responses import PlainTextResponse
+
+from app.config import settings
+from app.utils.permissions import require_internal_network
+from app.utils.slow_queries import clear_slow_queries, get_slow_queries
+from app.utils.tracing import clear_traces, fold_traces, get_traces
+
+router = APIRouter(dependencies=[Depends(require_internal_network)])
+
+
+@router.get("/slow-queries")
+async def list_slow_queries(limit: int = Query(50, ge=1, le=1000)):
+    """Последние медленные SQL-выражения с планами EXPLAIN (новые первыми)"""
+    return {
+        "threshold_ms": settings.slow_query_threshold_ms,
+        "explain_enabled": settings.slow_query_explain,
+        "queries": get_slow_queries(limit)
+    }
+
+
+@router.delete("/slow-queries", status_code=status.HTTP_204_NO_CONTENT)
+async def reset_slow_queries():
+    """Очистить буфер медленных выражений"""
+    clear_slow_queries()
+
+
+@router.get("/traces")
+async def list_traces(limit: int = Query(20, ge=1, le=1000)):
+    """Последние трассы запросов из внутреннего буфера (TRACE_EXPORTER=memory)"""
+    return {
+        "enabled": settings.tracing_enabled,
+        "sample_rate": settings.trace_sample_rate,
+        "traces": get_traces(limit)
+    }
+
+
+@router.get("/traces/folded", response_class=PlainTextResponse)
+async def traces_folded(route: Optional[str] = None, min_duration_ms: float = 0):
+    """Собственное время спанов всех трасс буфера в формате folded stacks (flamegraph.pl, speedscope)"""
+    return fold_traces(get_traces(settings.trace_buffer_size), route, min_duration_ms)
+
+
+@router.delete("/traces", status_code=status.HTTP_204_NO_CONTENT)
+async def reset_traces():
+    """Очистить буфер трасс"""
+    clear_traces()
@@ -1,7 +1,7 @@
 """
 API для аутентификации и управления семьями
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_async_session
@@ -10,8 +10,9 @@ from app.schemas.family import (
     AuthResponse, FamilyMembersResponse, UserLogin
 )
 from app.services.auth_service import AuthService
-from app.utils.permissions import get_current_user
-from app.models import User
+from app.utils.etag import family_etag
+from app.utils.permissions import CurrentUser, get_current_claims
+from app.utils.rate_limit import enforce_login_limits, enforce_join_limits
 
 router = APIRouter()
 
@@ -42,9 +43,12 @@ async def create_family(
 @router.post("/family/join", response_model=AuthResponse)
 async def join_family(
     join_data: FamilyJoin,
+    request: Request,
     db: AsyncSession = Depends(get_async_session)
 ):
     """Присоединиться к семье"""
+    await enforce_join_limits(request, join_data.passcode)
+    
     user, access_token = await AuthService.join_family(join_data, db)
     
     return AuthResponse(
@@ -56,9 +60,12 @@ async def join_family(
 @router.post("/login", response_model=AuthResponse)
 async def login(
     login_data: UserLogin,
+    request: Request,
     db: AsyncSession = Depends(get_async_session)
 ):
     """Авторизация пользователя по логину и паролю"""
+    await enforce_login_limits(request, login_data.username)
+    
     user, access_token = await AuthService.login_user(login_data, db)
     
     return AuthResponse(
@@ -67,9 +74,9 @@ async def login(
     )
 
 
-@router.get("/family/members", response_model=FamilyMembersResponse)
+@router.get("/family/members", response_model=FamilyMembersResponse, dependencies=[Depends(family_etag)])
 async def get_family_members(
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_claims),
     db: AsyncSession = Depends(get_async_session)
 ):
     """Получить членов семьи"""
@@ -0,0 +1,165 @@
+"""
+API пакетных запросов: несколько вызовов API одним HTTP-запросом
+"""
+import json
+import asyncio
+import logging
+from typing import Dict, List, Sequence, Tuple
+from urllib.parse import urlsplit
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+
+from app.config import settings
+from app.schemas.batch import BatchRequest, BatchSubRequest, BatchSubResponse
+from app.utils.permissions import RESOLVED_USER_STATE, CurrentUser, get_current_claims
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Пути, которые нельзя вызывать из пакета (поток событий не завершается)
+EXCLUDED_PREFIXES = ("/v1/batch", "/v1/admin", "/v1/events")
+
+# Заголовки, которые подзапрос может задать сам; остальные берутся из пакета
+SUB_REQUEST_HEADERS = {"if-none-match", "idempotency-key"}
+
+# Метка read-your-writes (см. ReadYourWritesMiddleware)
+PRIMARY_UNTIL = "x-primary-until"
+
+# Заголовки пакета, которые не переходят в подзапросы
+_DROPPED_HEADERS = {b"content-length", b"content-type", b"if-none-match", b"idempotency-key"}
+
+
+def _validate(sub: BatchSubRequest):
+    path = urlsplit(sub.path).path
+    if path.startswith(EXCLUDED_PREFIXES):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Path is not allowed in batch: {path}"
+        )
+    unknown = {name.lower() for name in sub.headers} - SUB_REQUEST_HEADERS
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Headers are not allowed in batch sub-request: {', '.join(sorted(unknown))}"
+        )
+
+
+async def _dispatch(
+    request: Request,
+    sub: BatchSubRequest,
+    current_user: CurrentUser,
+    pinned: Sequence[Tuple[bytes, bytes]] = ()
+) -> BatchSubResponse:
+    """Выполнить подзапрос через ASGI-приложение в этом же процессе от имени уже проверенного пользователя"""
+    url = urlsplit(sub.path)
+    body = b"" if sub.body is None else json.dumps(sub.body).encode()
+
+    # Тот же пользователь, IP и прокси-заголовки, что у пакета; метка read-your-writes
+    # записи из этого же пакета заменяет метку клиента
+    dropped = _DROPPED_HEADERS | {k for k, _ in pinned}
+    headers = [(k, v) for k, v in request.scope["headers"] if k not in dropped] + list(pinned)
+    headers += [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in sub.headers.items()]
+    if body:
+        headers += [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+
+    scope = {
+        **{key: request.scope[key] for key in ("type", "asgi", "http_version", "scheme", "server", "client", "root_path")
+           if key in request.scope},
+        "method": sub.method,
+        "path": url.path,
+        "raw_path": url.path.encode(),
+        "query_string": url.query.encode(),
+        "headers": headers,
+        # Зависимости авторизации берут пользователя отсюда и не проверяют токен заново
+        "state": {RESOLVED_USER_STATE: current_user},
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    response_status = 500
+    response_headers: Dict[str, str] = {}
+    chunks: List[bytes] = []
+    started = False
+
+    async def send(message):
+        nonlocal response_status, started
+        if message["type"] == "http.response.start":
+            started = True
+            response_status = message["status"]
+            response_headers.update(
+                (k.decode("latin-1"), v.decode("latin-1")) for k, v in message.get("headers", [])
+            )
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    try:
+        await request.app(scope, receive, send)
+    except Exception as e:
+        # Ошибка одного подзапроса не прерывает пакет: ответы уже выполненных записей дойдут до клиента
+        logger.exception(f"Batch sub-request {sub.method} {url.path} failed: {e}")
+        return BatchSubResponse(
+            status=response_status if started else 500,
+            headers={},
+            body={"detail": "Internal Server Error"}
+        )
+
+    raw = b"".join(chunks)
+    response_headers.pop("content-length", None)
+    if not raw:
+        payload = None
+    elif response_headers.get("content-type", "").startswith("application/json"):
+        payload = json.loads(raw)
+    else:
+        payload = raw.decode("utf-8", errors="replace")
+    return BatchSubResponse(status=response_status, headers=response_headers, body=payload)
+
+
+@router.post("", response_model=List[BatchSubResponse])
+async def run_batch(
+    batch: BatchRequest,
+    request: Request,
+    current_user: CurrentUser = Depends(get_current_claims)
+):
+    """Выполнить подзапросы и вернуть ответы в том же порядке.
+
+    Токен проверяется один раз для всего пакета: подзапросы получают пользователя
+    через scope["state"]. Подряд идущие GET выполняются
+    параллельно (каждый в своей сессии - одна сессия не выполняет запросы одновременно),
+    изменяющие запросы - строго по очереди, в порядке пакета.
+    """
+    if len(batch.requests) > settings.batch_max_requests:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Too many requests in batch (max {settings.batch_max_requests})"
+        )
+    for sub in batch.requests:
+        _validate(sub)
+
+    semaphore = asyncio.Semaphore(max(1, settings.batch_max_concurrency))
+
+    pinned: List[Tuple[bytes, bytes]] = []
+
+    async def run(sub: BatchSubRequest) -> BatchSubResponse:
+        async with semaphore:
+            return await _dispatch(request, sub, current_user, pinned)
+
+    # Каждый подзапрос - отдельная задача: свой контекст (статистика SQL, трассировка)
+    results: List[BatchSubResponse] = []
+    reads: List[BatchSubRequest] = []
+    for sub in batch.requests + [None]:
+        if sub is not None and sub.method == "GET":
+            reads.append(sub)
+            continue
+        if reads:
+            results += await asyncio.gather(*(run(read) for read in reads))
+            reads = []
+        if sub is not None:
+            response = await asyncio.create_task(_dispatch(request, sub, current_user, pinned))
+            if PRIMARY_UNTIL in response.headers:
+                # Следующие чтения пакета должны видеть эту запись
+                pinned[:] = [(PRIMARY_UNTIL.encode(), response.headers[PRIMARY_UNTIL].encode())]
+            results.append(response)
+
+    return results
@@ -0,0 +1,38 @@
+"""
+API ленты изменений для инкрементальной синхронизации клиентов
+"""
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.goals import goal_with_details
+from app.config import settings
+from app.database import get_read_session
+from app.schemas.changes import ChangesResponse
+from app.services.change_feed_service import ChangeFeedService
+from app.utils.etag import family_etag
+from app.utils.permissions import CurrentUser, get_current_claims
+
+router = APIRouter()
+
+
+@router.get("", response_model=ChangesResponse, dependencies=[Depends(family_etag)])
+async def get_changes(
+    since: int = Query(0, ge=0, description="Курсор из предыдущего ответа (0 - первая синхронизация)"),
+    limit: int = Query(500, ge=1, le=2000, description="Максимум записей журнала в ответе"),
+    current_user: CurrentUser = Depends(get_current_claims),
+    db: AsyncSession = Depends(get_read_session)
+):
+    """Задания, назначения, транзакции, цели и товары семьи, измененные после курсора"""
+    changes = await ChangeFeedService.get_changes(current_user, since, limit, db)
+    entities = changes["entities"]
+    return ChangesResponse(
+        cursor=changes["cursor"],
+        reset=changes["reset"],
+        has_more=changes["has_more"],
+        tasks=entities.get("task", []),
+        assignments=entities.get("assignment", []),
+        transactions=entities.get("transaction", []),
+        goals=[goal_with_details(goal) for goal in entities.get("goal", [])],
+        store_items=entities.get("store_item", []),
+        deleted=changes["deleted"]
+    )
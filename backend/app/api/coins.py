@@ -1,24 +1,25 @@
 """
 API для работы с коинами и транзакциями
 """
+from datetime import date
 from typing import Optional
 from fastapi import APIRouter, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_async_session
+from app.database import get_async_session, get_read_session
 from app.schemas.coins import (
     CoinBalanceResponse, CoinTransactionsResponse, CoinAdjustment, CoinAdjustmentResponse
 )
 from app.services.coin_service import CoinService
-from app.utils.permissions import get_current_user, require_parent, require_child_or_parent_of_child
-from app.models import User
+from app.utils.etag import family_etag
+from app.utils.permissions import CurrentUser, get_current_claims, require_parent, require_child_or_parent_of_child
 
 router = APIRouter()
 
 
-@router.get("/balance", response_model=CoinBalanceResponse)
+@router.get("/balance", response_model=CoinBalanceResponse, dependencies=[Depends(family_etag)])
 async def get_coin_balance(
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_claims),
     db: AsyncSession = Depends(get_async_session)
 ):
     """Получить баланс коинов текущего пользователя"""
@@ -32,13 +33,15 @@ async def get_coin_balance(
     )
 
 
-@router.get("/transactions", response_model=CoinTransactionsResponse)
+@router.get("/transactions", response_model=CoinTransactionsResponse, dependencies=[Depends(family_etag)])
 async def get_coin_transactions(
     limit: int = Query(20, ge=1, le=100),
     offset: int = Query(0, ge=0),
     transaction_type: Optional[str] = Query(None, pattern="^(earned|spent|bonus|penalty)$"),
-    current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_async_session)
+    date_from: Optional[date] = Query(None, description="Начало периода (включительно)"),
+    date_to: Optional[date] = Query(None, description="Конец периода (включительно)"),
+    current_user: CurrentUser = Depends(get_current_claims),
+    db: AsyncSession = Depends(get_read_session)
 ):
     """Получить историю транзакций"""
     transactions, total_count, has_more = await CoinService.get_transactions(
@@ -46,7 +49,9 @@ async def get_coin_transactions(
         limit=limit,
         offset=offset,
         transaction_type=transaction_type,
-        db=db
+        db=db,
+        date_from=date_from,
+        date_to=date_to
     )
     
     return CoinTransactionsResponse(
@@ -59,7 +64,7 @@ async def get_coin_transactions(
 @router.post("/adjust", response_model=CoinAdjustmentResponse)
 async def adjust_coins(
     adjustment: CoinAdjustment,
-    current_user: User = Depends(require_parent),
+    current_user: CurrentUser = Depends(require_parent),
     db: AsyncSession = Depends(get_async_session)
 ):
     """Ручная корректировка баланса коинов (только для родителей)"""
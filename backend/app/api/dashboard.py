@@ -0,0 +1,48 @@
+"""
+API сводного дашборда: один запрос вместо отдельных вызовов баланса, заданий, статистики, целей и магазина
+"""
+from fastapi import APIRouter, Depends, Request
+
+from app.api.goals import goals_list_response
+from app.database import read_session_maker
+from app.schemas.coins import CoinBalanceResponse
+from app.schemas.dashboard import DashboardResponse
+from app.schemas.family import FamilyMembersResponse
+from app.schemas.task import MyTasksChildResponse, MyTasksParentResponse
+from app.services.dashboard_service import DashboardService
+from app.utils.etag import family_etag
+from app.utils.permissions import CurrentUser, get_current_claims
+
+router = APIRouter()
+
+
+@router.get("", response_model=DashboardResponse, dependencies=[Depends(family_etag)])
+async def get_dashboard(
+    request: Request,
+    current_user: CurrentUser = Depends(get_current_claims)
+):
+    """Данные главного экрана текущего пользователя"""
+    data = await DashboardService.get_dashboard(current_user, read_session_maker(request))
+
+    balance = data["balance"]
+    family, members = data["family"]
+    if current_user.role == "parent":
+        created_tasks, pending_approvals = data["tasks"]
+        tasks = MyTasksParentResponse(created_tasks=created_tasks, pending_approvals=pending_approvals)
+    else:
+        tasks = MyTasksChildResponse(assignments=data["tasks"])
+
+    return DashboardResponse(
+        role=current_user.role,
+        balance=CoinBalanceResponse(
+            balance=balance.balance,
+            total_earned=balance.total_earned,
+            total_spent=balance.total_spent,
+            updated_at=balance.updated_at
+        ),
+        family=FamilyMembersResponse(family=family, members=members),
+        tasks=tasks,
+        statistics=data["statistics"],
+        goals=goals_list_response(data["goals"]),
+        store_items=data["store_items"]
+    )
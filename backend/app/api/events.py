@@ -0,0 +1,60 @@
+"""
+API событий в реальном времени (Server-Sent Events)
+"""
+import asyncio
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
+
+from app.config import settings
+from app.schemas.events import StreamTokenResponse
+from app.utils.auth import create_stream_token
+from app.utils.events import Subscription, broker, format_sse
+from app.utils.permissions import CurrentUser, get_current_claims, get_stream_claims
+
+router = APIRouter()
+
+# Пауза перед переподключением EventSource, мс
+RETRY_MS = 3000
+
+
+async def _stream(subscription: Subscription):
+    try:
+        yield f"retry: {RETRY_MS}\n\n"
+        # Клиент отключается, если не успевал читать события; после переподключения он перечитывает данные
+        while not subscription.overflowed:
+            try:
+                message = await asyncio.wait_for(subscription.queue.get(), settings.events_heartbeat_seconds)
+            except asyncio.TimeoutError:
+                # Комментарий не дает прокси закрыть простаивающее соединение
+                yield ": ping\n\n"
+                continue
+            yield format_sse(message)
+    finally:
+        broker.unsubscribe(subscription)
+
+
+@router.post("/token", response_model=StreamTokenResponse)
+async def issue_stream_token(current_user: CurrentUser = Depends(get_current_claims)):
+    """Короткий токен для GET /v1/events?token=...: годится только для подключения к потоку"""
+    return StreamTokenResponse(
+        token=create_stream_token(current_user),
+        expires_in=settings.events_token_ttl_seconds
+    )
+
+
+@router.get("")
+async def stream_events(current_user: CurrentUser = Depends(get_stream_claims)):
+    """Поток событий семьи: balance.changed, task.*, purchase.created, goal.completed, resync"""
+    if not settings.events_enabled:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Event stream is disabled"
+        )
+
+    subscription = broker.subscribe(current_user.family_id)
+    return StreamingResponse(
+        _stream(subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
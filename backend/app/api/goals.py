@@ -6,8 +6,7 @@ from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_async_session
-from app.models import User
+from app.database import get_async_session, get_read_session
 from app.schemas.goals import (
     GoalCreate, GoalCreateLegacy, GoalUpdate, StoreItemGoalCreate, GoalStatus,
     Goal, GoalWithDetails, GoalResponse, GoalCreateResponse,
@@ -16,18 +15,40 @@ from app.schemas.goals import (
     ExecutorType, GoalType, HabitGoalData, StoreItemGoalData
 )
 from app.services.goal_service import GoalService
-from app.utils.permissions import get_current_user
+from app.utils.etag import family_etag
+from app.utils.permissions import CurrentUser, get_current_claims
 
 router = APIRouter(prefix="/v1/goals", tags=["goals"])
 
 
+def goal_with_details(goal) -> GoalWithDetails:
+    """Цель с условиями, прогрессом и именами участников"""
+    return GoalWithDetails(
+        **goal.__dict__,
+        conditions=[condition.__dict__ for condition in goal.conditions],
+        progress=[progress.__dict__ for progress in goal.progress],
+        child_name=goal.child.name,
+        creator_name=goal.creator.name,
+        target_store_item_name=goal.target_store_item.name if goal.target_store_item else None
+    )
+
+
+def goals_list_response(goals) -> GoalsListResponse:
+    goals_with_details = [goal_with_details(goal) for goal in goals]
+    return GoalsListResponse(
+        goals=goals_with_details,
+        total_count=len(goals_with_details)
+    )
+
+
 # Эндпоинты для поддержки пошаговой формы
 @router.get(
     "/form-data/executors",
-    response_model=dict
+    response_model=dict,
+    dependencies=[Depends(family_etag)]
 )
 async def get_goal_executors_data(
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_claims),
     db: AsyncSession = Depends(get_async_session)
 ):
     """
@@ -102,7 +123,7 @@ async def get_goal_types_data():
 )
 async def create_enhanced_goal(
     goal_data: GoalCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_claims),
     db: AsyncSession = Depends(get_async_session)
 ):
     """
@@ -146,7 +167,7 @@ async def create_enhanced_goal(
 )
 async def create_goal(
     goal_data: GoalCreateLegacy,
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_claims),
     db: AsyncSession = Depends(get_async_session)
 ):
     """
@@ -183,13 +204,14 @@ async def create_goal(
 
 @router.get(
     "/",
-    response_model=GoalsListResponse
+    response_model=GoalsListResponse,
+    dependencies=[Depends(family_etag)]
 )
 async def get_goals(
     status_filter: Optional[GoalStatus] = Query(None, description="Фильтр по статусу цели"),
     child_id: Optional[uuid.UUID] = Query(None, description="Фильтр по ребенку (только для родителей)"),
-    current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_async_session)
+    current_user: CurrentUser = Depends(get_current_claims),
+    db: AsyncSession = Depends(get_read_session)
 ):
     """
     Получить список целей
@@ -213,36 +235,19 @@ async def get_goals(
             child_id_filter=child_id
         )
     
-    # Формируем детализированные данные
-    goals_with_details = []
-    for goal in goals:
-        progress_summary = await GoalService.get_goal_progress_summary(goal)
-        
-        goal_details = GoalWithDetails(
-            **goal.__dict__,
-            conditions=[condition.__dict__ for condition in goal.conditions],
-            progress=[progress.__dict__ for progress in goal.progress],
-            child_name=goal.child.name,
-            creator_name=goal.creator.name,
-            target_store_item_name=goal.target_store_item.name if goal.target_store_item else None
-        )
-        goals_with_details.append(goal_details)
-    
-    return GoalsListResponse(
-        goals=goals_with_details,
-        total_count=len(goals_with_details)
-    )
+    return goals_list_response(goals)
 
 
 @router.get(
     "/{goal_id}",
     response_model=GoalResponse,
-    responses={404: {"model": GoalNotFoundError}}
+    responses={404: {"model": GoalNotFoundError}},
+    dependencies=[Depends(family_etag)]
 )
 async def get_goal(
     goal_id: uuid.UUID,
-    current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_async_session)
+    current_user: CurrentUser = Depends(get_current_claims),
+    db: AsyncSession = Depends(get_read_session)
 ):
     """
     Получить детали конкретной цели
@@ -266,17 +271,8 @@ async def get_goal(
     
     progress_summary = await GoalService.get_goal_progress_summary(goal)
     
-    goal_details = GoalWithDetails(
-        **goal.__dict__,
-        conditions=[condition.__dict__ for condition in goal.conditions],
-        progress=[progress.__dict__ for progress in goal.progress],
-        child_name=goal.child.name,
-        creator_name=goal.creator.name,
-        target_store_item_name=goal.target_store_item.name if goal.target_store_item else None
-    )
-    
     return GoalResponse(
-        goal=goal_details,
+        goal=goal_with_details(goal),
         progress_summary=progress_summary
     )
 
@@ -292,7 +288,7 @@ async def get_goal(
 async def update_goal(
     goal_id: uuid.UUID,
     goal_data: GoalUpdate,
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_claims),
     db: AsyncSession = Depends(get_async_session)
 ):
     """
@@ -338,7 +334,7 @@ async def update_goal(
 )
 async def pause_goal(
     goal_id: uuid.UUID,
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_claims),
     db: AsyncSession = Depends(get_async_session)
 ):
     """
@@ -374,7 +370,7 @@ async def pause_goal(
 )
 async def resume_goal(
     goal_id: uuid.UUID,
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_claims),
     db: AsyncSession = Depends(get_async_session)
 ):
     """
@@ -410,7 +406,7 @@ async def resume_goal(
 )
 async def delete_goal(
     goal_id: uuid.UUID,
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_claims),
     db: AsyncSession = Depends(get_async_session)
 ):
     """
@@ -438,11 +434,12 @@ async def delete_goal(
 
 @router.get(
     "/statistics/family",
-    response_model=FamilyGoalStatistics
+    response_model=FamilyGoalStatistics,
+    dependencies=[Depends(family_etag)]
 )
 async def get_family_goal_statistics(
-    current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_async_session)
+    current_user: CurrentUser = Depends(get_current_claims),
+    db: AsyncSession = Depends(get_read_session)
 ):
     """
     Получить статистику целей семьи
@@ -466,7 +463,7 @@ async def get_family_goal_statistics(
 async def create_store_item_goal(
     item_id: uuid.UUID,
     goal_data: StoreItemGoalCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_claims),
     db: AsyncSession = Depends(get_async_session)
 ):
     """
@@ -510,7 +507,7 @@ async def create_store_item_goal(
 async def update_goal_progress_coins(
     user_id: uuid.UUID,
     coin_change: int,
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_claims),
     db: AsyncSession = Depends(get_async_session)
 ):
     """
@@ -552,7 +549,7 @@ async def update_goal_progress_coins(
 async def update_goal_progress_task(
     child_id: uuid.UUID,
     task_assignment_id: uuid.UUID,
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_claims),
     db: AsyncSession = Depends(get_async_session)
 ):
     """
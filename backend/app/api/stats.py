@@ -6,21 +6,21 @@ from typing import Optional
 from fastapi import APIRouter, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_async_session
+from app.database import get_read_session
 from app.services.stats_service import StatsService
-from app.utils.permissions import get_current_user, require_parent
-from app.models import User
+from app.utils.etag import family_etag
+from app.utils.permissions import CurrentUser, get_current_claims, require_parent
 
 router = APIRouter()
 
 
-@router.get("/family")
+@router.get("/family", dependencies=[Depends(family_etag)])
 async def get_family_stats(
     period: str = Query("month", pattern="^(week|month)$"),
     start_date: Optional[date] = Query(None),
     end_date: Optional[date] = Query(None),
-    current_user: User = Depends(require_parent),
-    db: AsyncSession = Depends(get_async_session)
+    current_user: CurrentUser = Depends(require_parent),
+    db: AsyncSession = Depends(get_read_session)
 ):
     """Статистика по семье (родители)"""
     
@@ -43,10 +43,10 @@ async def get_family_stats(
     return stats
 
 
-@router.get("/child")
+@router.get("/child", dependencies=[Depends(family_etag)])
 async def get_child_stats(
-    current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_async_session)
+    current_user: CurrentUser = Depends(get_current_claims),
+    db: AsyncSession = Depends(get_read_session)
 ):
     """Статистика ребенка"""
     
@@ -1,37 +1,57 @@
 """
 API для семейного магазина
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+import uuid
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_async_session
+from app.database import get_async_session, get_read_session
 from app.schemas.store import (
-    StoreItemsResponse, StoreItemCreate, StoreItem,
+    StoreItemsResponse, StoreItemCreate, StoreItemUpdate, StoreItem,
     PurchaseCreate, PurchaseResponse
 )
 from app.schemas.goals import StoreItemGoalCreate, GoalCreateResponse
 from app.services.store_service import StoreService
-from app.utils.permissions import get_current_user, require_parent, require_child
-from app.models import User
+from app.utils.etag import family_etag
+from app.utils.permissions import CurrentUser, get_current_claims, require_parent, require_child
 
 router = APIRouter()
 
 
-@router.get("/items", response_model=StoreItemsResponse)
+@router.get("/items", response_model=StoreItemsResponse, dependencies=[Depends(family_etag)])
 async def get_store_items(
-    current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_async_session)
+    category: Optional[str] = Query(None, max_length=50),
+    min_price: Optional[int] = Query(None, ge=0),
+    max_price: Optional[int] = Query(None, ge=0),
+    q: Optional[str] = Query(None, max_length=100, description="Поиск по названию и описанию"),
+    sort: str = Query("name", pattern="^(name|price_asc|price_desc|popular)$"),
+    limit: Optional[int] = Query(None, ge=1, le=100, description="Размер страницы; без него - все товары"),
+    cursor: Optional[str] = Query(None, description="next_cursor предыдущей страницы"),
+    current_user: CurrentUser = Depends(get_current_claims),
+    db: AsyncSession = Depends(get_read_session)
 ):
-    """Получить товары в семейном магазине"""
-    items = await StoreService.get_store_items(current_user.family_id, db)
+    """Получить товары в семейном магазине: фильтры, поиск, сортировка и страницы"""
+    items, next_cursor = await StoreService.search_store_items(
+        current_user.family_id,
+        db,
+        category=category,
+        min_price=min_price,
+        max_price=max_price,
+        search=q,
+        sort=sort,
+        limit=limit,
+        cursor=cursor
+    )
     
-    return StoreItemsResponse(items=items)
+    return StoreItemsResponse(items=items, next_cursor=next_cursor)
 
 
 @router.post("/items", response_model=StoreItem, status_code=status.HTTP_201_CREATED)
 async def create_store_item(
     item_data: StoreItemCreate,
-    current_user: User = Depends(require_parent),
+    current_user: CurrentUser = Depends(require_parent),
     db: AsyncSession = Depends(get_async_session)
 ):
     """Добавить товар в магазин (родители)"""
@@ -45,28 +65,37 @@ async def create_store_item(
     return item
 
 
+@router.patch("/items/{item_id}", response_model=StoreItem)
+async def update_store_item(
+    item_id: uuid.UUID,
+    item_data: StoreItemUpdate,
+    current_user: CurrentUser = Depends(require_parent),
+    db: AsyncSession = Depends(get_async_session)
+):
+    """Изменить товар: цена, доступность, остаток и лимит покупок (родители)"""
+    return await StoreService.update_store_item(
+        item_id=item_id,
+        item_data=item_data,
+        family_id=current_user.family_id,
+        db=db
+    )
+
+
 @router.post("/purchase", response_model=PurchaseResponse)
 async def purchase_item(
     purchase_data: PurchaseCreate,
-    current_user: User = Depends(require_child),
+    current_user: CurrentUser = Depends(require_child),
     db: AsyncSession = Depends(get_async_session)
 ):
     """Купить товар (дети)"""
     try:
-        purchase, new_balance = await StoreService.purchase_item(
+        purchase, item, new_balance = await StoreService.purchase_item(
             purchase_data=purchase_data,
             child_id=current_user.id,
             family_id=current_user.family_id,
             db=db
         )
         
-        # Получаем название товара для ответа
-        from sqlalchemy import select
-        from app.models import StoreItem
-        
-        result = await db.execute(select(StoreItem).where(StoreItem.id == purchase.item_id))
-        item = result.scalar_one()
-        
         purchase_with_item = {
             "id": purchase.id,
             "child_id": purchase.child_id,
@@ -95,7 +124,7 @@ async def purchase_item(
 async def create_goal_for_store_item(
     item_id: str,
     goal_data: StoreItemGoalCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_claims),
     db: AsyncSession = Depends(get_async_session)
 ):
     """
@@ -13,7 +13,8 @@ from app.schemas.task import (
     TaskAssignmentComplete, TaskAssignmentApprove
 )
 from app.services.task_service import TaskService
-from app.utils.permissions import get_current_user, require_parent, require_child
+from app.utils.etag import family_etag
+from app.utils.permissions import CurrentUser, get_current_claims, require_parent, require_child
 from app.models import User
 
 router = APIRouter()
@@ -21,7 +22,7 @@ router = APIRouter()
 
 @router.get("/templates", response_model=TaskTemplatesResponse)
 async def get_task_templates(
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_claims),
     db: AsyncSession = Depends(get_async_session)
 ):
     """Получить шаблоны заданий"""
@@ -33,7 +34,7 @@ async def get_task_templates(
 @router.post("", response_model=TaskCreateResponse, status_code=status.HTTP_201_CREATED)
 async def create_task(
     task_data: TaskCreate,
-    current_user: User = Depends(require_parent),
+    current_user: CurrentUser = Depends(require_parent),
     db: AsyncSession = Depends(get_async_session)
 ):
     """Создать задание (только родители)"""
@@ -79,9 +80,9 @@ async def create_task(
     )
 
 
-@router.get("/my")
+@router.get("/my", dependencies=[Depends(family_etag)])
 async def get_my_tasks(
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_claims),
     db: AsyncSession = Depends(get_async_session)
 ):
     """Получить задания текущего пользователя"""
@@ -109,7 +110,7 @@ async def get_my_tasks(
 async def complete_task(
     assignment_id: uuid.UUID = Path(...),
     completion_data: TaskAssignmentComplete = ...,
-    current_user: User = Depends(require_child),
+    current_user: CurrentUser = Depends(require_child),
     db: AsyncSession = Depends(get_async_session)
 ):
     """Отметить задание как выполненное (дети)"""
@@ -134,7 +135,7 @@ async def complete_task(
 async def approve_task(
     assignment_id: uuid.UUID = Path(...),
     approval_data: TaskAssignmentApprove = ...,
-    current_user: User = Depends(require_parent),
+    current_user: CurrentUser = Depends(require_parent),
     db: AsyncSession = Depends(get_async_session)
 ):
     """Одобрить выполнение задания (родители)"""
@@ -160,9 +161,9 @@ async def approve_task(
     return response
 
 
-@router.get("/statistics")
+@router.get("/statistics", dependencies=[Depends(family_etag)])
 async def get_task_statistics(
-    current_user: User = Depends(require_parent),
+    current_user: CurrentUser = Depends(require_parent),
     db: AsyncSession = Depends(get_async_session)
 ):
     """Получить статистику заданий для родителя"""
@@ -175,12 +176,12 @@ async def get_task_statistics(
     return stats
 
 
-@router.get("/history")
+@router.get("/history", dependencies=[Depends(family_etag)])
 async def get_task_history(
     status_filter: str = None,
     child_filter: str = None,
     period_filter: str = None,
-    current_user: User = Depends(require_parent),
+    current_user: CurrentUser = Depends(require_parent),
     db: AsyncSession = Depends(get_async_session)
 ):
     """Получить историю заданий для родителя с фильтрами"""
@@ -0,0 +1,349 @@
+"""
+Проверка планов запросов сервисов: каждый горячий фильтр должен использовать свой индекс,
+а запросы к coin_transactions за период и к change_log семьи - читать только нужный раздел
+
+Проверяются выражения, которые строят сами сервисные методы: методы вызываются на временных
+данных в транзакции, которая затем откатывается, а выполненный ими SQL перехватывается.
+
+Запуск (нужна база с примененными миграциями):
+    python -m app.commands.check_query_plans
+Возвращает код 1, если хотя бы один запрос не использует ожидаемый индекс или читает лишние разделы.
+"""
+import asyncio
+import json
+import logging
+import sys
+import uuid
+from datetime import date
+from typing import Awaitable, Callable, Iterator, List, NamedTuple, Set, Tuple, Union
+
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import engine
+from app.models import (
+    Family, User, Task, TaskAssignment, Goal, GoalCondition, GoalProgress, StoreItem
+)
+from app.services.change_feed_service import ChangeFeedService
+from app.services.coin_service import CoinService
+from app.services.goal_service import GoalService
+from app.services.partition_service import PARTITIONED_TABLE
+from app.services.stats_service import StatsService
+from app.services.store_service import StoreService
+from app.services.task_service import TaskService
+from app.utils.permissions import CurrentUser
+
+logging.basicConfig(level=getattr(logging, settings.log_level))
+logger = logging.getLogger(__name__)
+
+
+class Fixture(NamedTuple):
+    """Временная семья, на которой вызываются сервисы"""
+    family_id: uuid.UUID
+    parent_id: uuid.UUID
+    child_id: uuid.UUID
+
+    @property
+    def parent(self) -> CurrentUser:
+        return CurrentUser(id=self.parent_id, family_id=self.family_id, role="parent")
+
+
+ServiceCall = Callable[[AsyncSession, Fixture], Awaitable[object]]
+
+
+class IndexCheck(NamedTuple):
+    """Первое выражение вызова с фрагментом fragment должно использовать индекс index
+    (или один из равноценных индексов, если их несколько)"""
+    name: str
+    call: ServiceCall
+    fragment: str
+    index: Union[str, Tuple[str, ...]]
+
+    @property
+    def indexes(self) -> Tuple[str, ...]:
+        return (self.index,) if isinstance(self.index, str) else self.index
+
+
+# Доступные товары семьи без сортировки одинаково хорошо читаются любым из этих индексов,
+# выбор между ними - дело планировщика
+AVAILABLE_STORE_ITEMS_INDEXES = (
+    "ix_store_items_family_id_is_available",
+    "ix_store_items_family_id_price",
+    "ix_store_items_family_id_popularity",
+)
+
+
+class PruningCheck(NamedTuple):
+    """Первое выражение вызова с фрагментом fragment должно читать ровно один раздел table"""
+    name: str
+    call: ServiceCall
+    fragment: str
+    table: str
+
+
+def index_checks() -> List[IndexCheck]:
+    """Сервисные методы и индекс, который должен использовать их горячий фильтр"""
+    return [
+        IndexCheck(
+            "StatsService.get_family_stats: дети семьи",
+            lambda db, f: StatsService.get_family_stats(f.family_id, db=db),
+            "FROM users", "ix_users_family_id_role",
+        ),
+        IndexCheck(
+            "StatsService.get_family_stats: задания за период",
+            lambda db, f: StatsService.get_family_stats(f.family_id, db=db),
+            "FROM task_assignments JOIN tasks", "ix_tasks_family_id",
+        ),
+        IndexCheck(
+            "TaskService.get_child_tasks",
+            lambda db, f: TaskService.get_child_tasks(f.child_id, db),
+            "FROM task_assignments", "ix_task_assignments_child_id_status",
+        ),
+        IndexCheck(
+            "TaskService.get_parent_tasks: созданные задания",
+            lambda db, f: TaskService.get_parent_tasks(f.parent_id, f.family_id, db),
+            "FROM tasks", "ix_tasks_created_by_status",
+        ),
+        IndexCheck(
+            "TaskService.get_parent_tasks: ожидают подтверждения",
+            lambda db, f: TaskService.get_parent_tasks(f.parent_id, f.family_id, db),
+            "FROM task_assignments JOIN tasks", "ix_task_assignments_task_id_status",
+        ),
+        IndexCheck(
+            "GoalService.apply_goal_progress_on_coin_change: активные цели ребенка",
+            lambda db, f: GoalService.apply_goal_progress_on_coin_change(f.child_id, 0, db),
+            "FROM goals", "ix_goals_child_id_status",
+        ),
+        IndexCheck(
+            "GoalService.get_family_goals",
+            lambda db, f: GoalService.get_family_goals(f.family_id, db),
+            "FROM goals", "ix_goals_family_id_created_at",
+        ),
+        IndexCheck(
+            "GoalService.get_family_goals: selectinload(Goal.conditions)",
+            lambda db, f: GoalService.get_family_goals(f.family_id, db),
+            "FROM goal_conditions", "ix_goal_conditions_goal_id",
+        ),
+        IndexCheck(
+            "GoalService.get_family_goals: selectinload(Goal.progress)",
+            lambda db, f: GoalService.get_family_goals(f.family_id, db),
+            "FROM goal_progress", "ix_goal_progress_goal_id_condition_id",
+        ),
+        IndexCheck(
+            "StoreService.get_store_items",
+            lambda db, f: StoreService.get_store_items(f.family_id, db),
+            "FROM store_items", AVAILABLE_STORE_ITEMS_INDEXES,
+        ),
+        IndexCheck(
+            "StoreService.search_store_items: по цене, следующая страница",
+            lambda db, f: StoreService.search_store_items(
+                f.family_id, db, sort="price_asc", limit=20,
+                cursor=StoreService._encode_cursor("price_asc", 50, uuid.uuid4())
+            ),
+            "FROM store_items", "ix_store_items_family_id_price",
+        ),
+        IndexCheck(
+            "StoreService.search_store_items: по популярности",
+            lambda db, f: StoreService.search_store_items(f.family_id, db, sort="popular", limit=20),
+            "FROM store_items", "ix_store_items_family_id_popularity",
+        ),
+        IndexCheck(
+            "StoreService.search_store_items: поиск",
+            lambda db, f: StoreService.search_store_items(f.family_id, db, search="кино"),
+            "FROM store_items", "ix_store_items_search",
+        ),
+        IndexCheck(
+            "StoreService.get_child_purchases",
+            lambda db, f: StoreService.get_child_purchases(f.child_id, db),
+            "FROM purchases", "ix_purchases_child_id_created_at",
+        ),
+        IndexCheck(
+            "CoinService.get_transactions",
+            lambda db, f: CoinService.get_transactions(f.child_id, limit=50, db=db),
+            "FROM coin_transactions", "ix_coin_transactions_user_id_created_at",
+        ),
+        IndexCheck(
+            "ChangeFeedService.get_changes",
+            lambda db, f: ChangeFeedService.get_changes(f.parent, 0, 500, db),
+            "FROM change_log", "change_log_pkey",
+        ),
+    ]
+
+
+def pruning_checks() -> List[PruningCheck]:
+    """Сервисные методы, чьи запросы к секционированным таблицам должны читать один раздел"""
+    today = date.today()
+
+    return [
+        PruningCheck(
+            "StatsService.get_family_stats: коины за месяц",
+            lambda db, f: StatsService.get_family_stats(f.family_id, db=db),
+            "FROM coin_transactions", PARTITIONED_TABLE,
+        ),
+        PruningCheck(
+            "CoinService.get_transactions за период",
+            lambda db, f: CoinService.get_transactions(f.child_id, limit=50, db=db, date_from=today, date_to=today),
+            "FROM coin_transactions", PARTITIONED_TABLE,
+        ),
+        PruningCheck(
+            "ChangeFeedService.get_changes: раздел семьи",
+            lambda db, f: ChangeFeedService.get_changes(f.parent, 0, 500, db),
+            "FROM change_log", "change_log",
+        ),
+    ]
+
+
+async def create_fixture(db: AsyncSession) -> Fixture:
+    """Семья с родителем, ребенком, заданием, целью и товаром: без строк сервисы не выполнят
+    часть запросов (selectinload, статистика по детям, лента изменений)"""
+    family = Family(name="query plan check", passcode="-")
+    db.add(family)
+    await db.flush()
+
+    suffix = uuid.uuid4().hex[:12]
+    parent = User(family_id=family.id, name="parent", username=f"plan-p-{suffix}", password_hash="-", role="parent")
+    child = User(family_id=family.id, name="child", username=f"plan-c-{suffix}", password_hash="-", role="child")
+    db.add_all([parent, child])
+    await db.flush()
+
+    task = Task(family_id=family.id, title="task", category="home", created_by=parent.id)
+    goal = Goal(family_id=family.id, child_id=child.id, title="goal", goal_type="coin_saving", created_by=parent.id)
+    db.add_all([task, goal, StoreItem(family_id=family.id, name="item", category="toys", price_coins=10, created_by=parent.id)])
+    await db.flush()
+
+    condition = GoalCondition(goal_id=goal.id, condition_type="coin_amount", target_value=100, description="coins")
+    db.add_all([condition, TaskAssignment(task_id=task.id, child_id=child.id, status="completed")])
+    await db.flush()
+    db.add(GoalProgress(goal_id=goal.id, condition_id=condition.id))
+    await db.flush()
+
+    # Сервисы должны загружать строки сами, а не брать уже загруженные коллекции
+    db.expunge_all()
+    return Fixture(family.id, parent.id, child.id)
+
+
+async def capture_statements(db: AsyncSession, call: ServiceCall, fixture: Fixture) -> List[Tuple[str, tuple]]:
+    """Выполнить сервисный метод и вернуть его SQL-выражения с параметрами"""
+    statements: List[Tuple[str, tuple]] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not executemany:
+            statements.append((statement, tuple(parameters or ())))
+
+    sync_connection = (await db.connection()).sync_connection
+    event.listen(sync_connection, "before_cursor_execute", record)
+    try:
+        await call(db, fixture)
+    finally:
+        event.remove(sync_connection, "before_cursor_execute", record)
+        db.expunge_all()
+    return statements
+
+
+def find_statement(statements: List[Tuple[str, tuple]], fragment: str) -> Tuple[str, tuple]:
+    """Первое выражение с фрагментом SQL (пробелы и переносы строк не учитываются)"""
+    for statement, parameters in statements:
+        if fragment in " ".join(statement.split()):
+            return statement, parameters
+    raise LookupError(f"no statement with '{fragment}'")
+
+
+def _plan_nodes(node: dict) -> Iterator[dict]:
+    """Все узлы плана"""
+    yield node
+    for child in node.get("Plans", []):
+        yield from _plan_nodes(child)
+
+
+async def _root_index_name(db: AsyncSession, name: str) -> str:
+    """Для индекса раздела - имя индекса секционированной таблицы"""
+    return await db.scalar(
+        text("SELECT CAST(COALESCE(pg_partition_root(CAST(:name AS regclass)), CAST(:name AS regclass)) AS regclass)::text"),
+        {"name": name}
+    )
+
+
+async def plan_indexes(db: AsyncSession, plan: dict) -> Set[str]:
+    """Индексы, используемые в плане (индексы разделов сводятся к родительским)"""
+    names = {node["Index Name"] for node in _plan_nodes(plan) if "Index Name" in node}
+    return {await _root_index_name(db, name) for name in names}
+
+
+def scanned_partitions(plan: dict, table: str = PARTITIONED_TABLE) -> Set[str]:
+    """Разделы таблицы, которые план реально читает"""
+    return {
+        node["Relation Name"] for node in _plan_nodes(plan)
+        if node.get("Relation Name", "").startswith(f"{table}_")
+    }
+
+
+async def explain(db: AsyncSession, statement: str, parameters: tuple) -> dict:
+    """EXPLAIN (FORMAT JSON) для перехваченного выражения с его параметрами"""
+    connection = await db.connection()
+    result = await connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+    plan = result.scalar_one()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Plan"]
+
+
+async def check_plans() -> List[str]:
+    """Проверить планы; вернуть описания запросов без ожидаемых индексов"""
+    failures = []
+
+    def fail(message: str):
+        failures.append(message)
+        logger.error(message)
+
+    try:
+        async with engine.connect() as connection:
+            transaction = await connection.begin()
+            db = AsyncSession(bind=connection, expire_on_commit=False)
+            try:
+                fixture = await create_fixture(db)
+                # На пустых и маленьких таблицах seq scan дешевле любого индекса -
+                # запрещаем его, чтобы проверить, что подходящий индекс вообще есть
+                await db.execute(text("SET LOCAL enable_seqscan = off"))
+                # Сортировки тоже: запрос с ORDER BY должен читать строки в порядке своего индекса
+                await db.execute(text("SET LOCAL enable_sort = off"))
+
+                for check in index_checks():
+                    try:
+                        statement, parameters = find_statement(await capture_statements(db, check.call, fixture), check.fragment)
+                    except LookupError as e:
+                        fail(f"{check.name}: {e}")
+                        continue
+                    used = await plan_indexes(db, await explain(db, statement, parameters))
+                    if not used.intersection(check.indexes):
+                        fail(f"{check.name}: missing {' | '.join(check.indexes)} (used: {', '.join(sorted(used)) or 'none'})")
+                    else:
+                        logger.info(f"{check.name}: {', '.join(sorted(used))}")
+
+                for check in pruning_checks():
+                    try:
+                        statement, parameters = find_statement(await capture_statements(db, check.call, fixture), check.fragment)
+                    except LookupError as e:
+                        fail(f"{check.name}: {e}")
+                        continue
+                    partitions = scanned_partitions(await explain(db, statement, parameters), check.table)
+                    if len(partitions) != 1:
+                        fail(f"{check.name}: expected 1 partition, scanned {', '.join(sorted(partitions)) or 'none'}")
+                    else:
+                        logger.info(f"{check.name}: {partitions.pop()}")
+            finally:
+                await db.close()
+                # Временная семья не сохраняется
+                await transaction.rollback()
+    finally:
+        await engine.dispose()
+    return failures
+
+
+def main() -> int:
+    failures = asyncio.run(check_plans())
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,35 @@
+"""
+Команда обслуживания разделов coin_transactions (то же, что периодически делает приложение)
+
+Запуск:
+    python -m app.commands.maintain_partitions
+"""
+import asyncio
+import json
+import logging
+import sys
+
+from app.config import settings
+from app.database import engine
+from app.services.partition_service import PartitionService
+
+logging.basicConfig(level=getattr(logging, settings.log_level))
+logger = logging.getLogger(__name__)
+
+
+async def run() -> dict:
+    """Создать будущие разделы, отсоединить устаревшие, очистить change_log и закрыть пул соединений"""
+    try:
+        return await PartitionService.run_maintenance()
+    finally:
+        await engine.dispose()
+
+
+def main() -> int:
+    report = asyncio.run(run())
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
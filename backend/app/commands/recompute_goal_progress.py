@@ -0,0 +1,67 @@
+"""
+Команда пересчета прогресса целей по журналу коинов и одобренным заданиям
+
+Запуск (по умолчанию только отчет, без изменений в базе):
+    python -m app.commands.recompute_goal_progress [--apply] [--concurrency 4] [--chunk-size 50] [--output report.json]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import uuid
+
+from app.config import settings
+from app.database import engine
+from app.services.goal_recompute_service import GoalRecomputeService
+
+logging.basicConfig(level=getattr(logging, settings.log_level))
+logger = logging.getLogger(__name__)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """Разобрать аргументы командной строки"""
+    parser = argparse.ArgumentParser(description="Пересчитать прогресс целей из coin_transactions и task_assignments")
+    parser.add_argument("--apply", action="store_true", help="Записать исправленные значения (иначе только отчет)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Сколько семей обрабатывать одновременно")
+    parser.add_argument("--chunk-size", type=int, default=50, help="Размер пачки семей")
+    parser.add_argument("--family-id", action="append", type=uuid.UUID, help="Пересчитать только указанные семьи")
+    parser.add_argument("--output", help="Файл для JSON-отчета (по умолчанию stdout)")
+    return parser.parse_args(argv)
+
+
+async def run(args: argparse.Namespace) -> dict:
+    """Выполнить пересчет и закрыть пул соединений"""
+    try:
+        return await GoalRecomputeService.recompute_all(
+            apply=args.apply,
+            concurrency=args.concurrency,
+            chunk_size=args.chunk_size,
+            family_ids=args.family_id
+        )
+    finally:
+        await engine.dispose()
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    report = asyncio.run(run(args))
+
+    logger.info(
+        f"Processed {report['families_processed']} families, "
+        f"{report['families_with_diffs']} with diffs, {report['total_diffs']} diffs total "
+        f"({'applied' if report['applied'] else 'dry run'})"
+    )
+
+    payload = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(payload)
+    else:
+        print(payload)
+
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
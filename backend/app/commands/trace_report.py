@@ -0,0 +1,35 @@
+"""
+Разбивка времени запросов по трассам из JSON Lines файла (TRACE_EXPORTER=jsonl)
+
+Запуск:
+    python -m app.commands.trace_report --route "PUT /v1/tasks/assignments/{assignment_id}/approve" > approve.folded
+    flamegraph.pl approve.folded > approve.svg   # или открыть .folded в speedscope.app
+"""
+import argparse
+import sys
+
+from app.config import settings
+from app.utils.tracing import fold_traces, read_trace_file
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Folded stacks по трассам запросов")
+    parser.add_argument("--file", default=settings.trace_file, help="файл трасс (по умолчанию TRACE_FILE)")
+    parser.add_argument("--route", help='только трассы маршрута, например "GET /v1/stats/family"')
+    parser.add_argument("--min-ms", type=float, default=0, help="только трассы не короче N мс")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    traces = read_trace_file(args.file)
+    if not traces:
+        print(f"No traces in {args.file}", file=sys.stderr)
+        return 1
+
+    print(fold_traces(traces, args.route, args.min_ms))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,27 @@
 """
 Основное приложение FastAPI для FamilyCoins
 """
-from contextlib import asynccontextmanager
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager, suppress
+from fastapi import Depends, FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 import logging
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
 from app.config import settings
-from app.database import create_tables, get_async_session
-from app.api import auth, coins, tasks, store, stats, goals
-from app.services.init_data import create_default_task_templates
+from app.database import get_async_session, prewarm_pool
+from app.services.outbox_service import OutboxService
+from app.services.partition_service import PartitionService
+from app.startup import is_prepared_before_fork, prepare_process
+from app.api import admin, auth, batch, changes, coins, dashboard, events, tasks, store, stats, goals
+from app.middleware.idempotency import IdempotencyMiddleware
+from app.middleware.metrics import PrometheusMiddleware
+from app.middleware.query_stats import QueryStatsMiddleware
+from app.middleware.read_your_writes import ReadYourWritesMiddleware
+from app.middleware.tracing import TracingMiddleware
+from app.utils.events import broker
+from app.utils.metrics import metrics_registry
+from app.utils.permissions import require_internal_network
 
 # Настройка логирования
 logging.basicConfig(level=getattr(logging, settings.log_level))
@@ -30,12 +42,17 @@ async def lifespan(app: FastAPI):
     logger.info(f"Starting {settings.project_name} in {settings.environment} mode")
     
     try:
-        await create_tables()
-        
-        # Инициализируем данные по умолчанию
-        async for db in get_async_session():
-            await create_default_task_templates(db)
-            break
+        # Схема и системные шаблоны заданий управляются миграциями Alembic;
+        # под gunicorn миграции и калибровка bcrypt уже выполнены в мастер-процессе
+        if not is_prepared_before_fork():
+            await prepare_process()
+        await prewarm_pool(settings.db_pool_prewarm)
+        # Разделы coin_transactions на будущие месяцы и отсоединение старых
+        partition_maintenance = asyncio.create_task(PartitionService.maintenance_loop())
+        # Побочные действия после коммита (прогресс целей) из outbox_messages
+        outbox_dispatcher = asyncio.create_task(OutboxService.dispatch_loop())
+        # LISTEN: события семей из всех процессов для подключений этого процесса
+        event_listener = asyncio.create_task(broker.run()) if settings.events_enabled else None
         
         logger.info("Application startup completed")
     except Exception as e:
@@ -45,6 +62,12 @@ async def lifespan(app: FastAPI):
     yield
     
     # Shutdown
+    for background in (partition_maintenance, outbox_dispatcher, event_listener):
+        if background is None:
+            continue
+        background.cancel()
+        with suppress(asyncio.CancelledError):
+            await background
     logger.info("Application shutdown")
 
 
@@ -60,6 +83,9 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+# Повторы изменяющих запросов с Idempotency-Key (внутри CORS: повторный ответ получает CORS-заголовки)
+app.add_middleware(IdempotencyMiddleware)
+
 # CORS настройки
 app.add_middleware(
     CORSMiddleware,
@@ -67,8 +93,21 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "PATCH"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Trace-Id", "ETag", "Idempotent-Replayed", "X-Primary-Until"],
 )
 
+# Закрепление чтений за основной базой после записи (реплика для чтения)
+app.add_middleware(ReadYourWritesMiddleware)
+
+# Число и время SQL-выражений на запрос (Server-Timing, детектор N+1)
+app.add_middleware(QueryStatsMiddleware)
+
+# Трассировка запросов (спаны сервисов и SQL)
+app.add_middleware(TracingMiddleware)
+
+# Метрики HTTP (добавлен последним - внешний слой, измеряет весь стек)
+app.add_middleware(PrometheusMiddleware)
+
 # Подключение роутеров
 app.include_router(auth.router, prefix="/v1/auth", tags=["authentication"])
 app.include_router(tasks.router, prefix="/v1/tasks", tags=["tasks"])
@@ -76,6 +115,11 @@ app.include_router(store.router, prefix="/v1/store", tags=["store"])
 app.include_router(coins.router, prefix="/v1/coins", tags=["coins"])
 app.include_router(stats.router, prefix="/v1/stats", tags=["stats"])
 app.include_router(goals.router, tags=["goals"])
+app.include_router(dashboard.router, prefix="/v1/dashboard", tags=["dashboard"])
+app.include_router(batch.router, prefix="/v1/batch", tags=["batch"])
+app.include_router(events.router, prefix="/v1/events", tags=["events"])
+app.include_router(changes.router, prefix="/v1/changes", tags=["changes"])
+app.include_router(admin.router, prefix="/v1/admin", tags=["admin"])
 
 
 @app.get("/")
@@ -111,33 +155,14 @@ async def health_check():
         }
 
 
-@app.get("/metrics")
-async def metrics():
-    """Метрики для мониторинга"""
-    if not settings.debug:
-        # В продакшене метрики доступны только локально
-        from fastapi import Request
-        
-        def get_client_ip(request: Request):
-            x_forwarded_for = request.headers.get("X-Forwarded-For")
-            if x_forwarded_for:
-                return x_forwarded_for.split(",")[0].strip()
-            return request.client.host
-        
-        # Разрешить доступ только с локальных адресов
-        # В реальном проекте нужно настроить правильную авторизацию
-    
-    return {
-        "app_info": {
-            "name": settings.project_name,
-            "version": "1.0.0",
-            "environment": settings.environment
-        },
-        "system_info": {
-            "python_version": "3.11",
-            "framework": "FastAPI"
-        }
-    }
+@app.get("/metrics", include_in_schema=False, dependencies=[Depends(require_internal_network)])
+def metrics():
+    """Метрики в текстовом формате Prometheus (только из сетей INTERNAL_NETWORKS).
+
+    Синхронный обработчик: сериализация реестра выполняется в пуле потоков,
+    не занимая event loop.
+    """
+    return Response(content=generate_latest(metrics_registry()), media_type=CONTENT_TYPE_LATEST)
 
 
 if __name__ == "__main__":
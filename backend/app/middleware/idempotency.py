@@ -0,0 +1,176 @@
+"""
+Middleware Idempotency-Key: повтор изменяющего запроса с тем же ключом получает сохраненный ответ
+"""
+import json
+import time
+import uuid
+import asyncio
+import hashlib
+import logging
+from typing import Dict, Tuple
+
+from app.config import settings
+from app.services.idempotency_service import IdempotencyService
+from app.utils.auth import get_token_subject
+from app.utils.metrics import IDEMPOTENT_REQUESTS_TOTAL
+from app.utils.permissions import RESOLVED_USER_STATE
+
+logger = logging.getLogger(__name__)
+
+MUTATING_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+# Ответы, которые не сохраняются: повтор должен выполнить запрос заново
+RETRYABLE_STATUSES = {401, 403, 408, 429}
+
+# Заголовки ответа, которые не повторяются (вычисляются заново или относятся к первому запросу)
+_UNSTORED_HEADERS = {
+    "content-length", "date", "server", "server-timing", "x-trace-id", "x-sql-repeated-statement", "x-primary-until"
+}
+
+
+def _json_response(status_code: int, detail: str) -> Tuple[int, list, bytes]:
+    body = json.dumps({"detail": detail}).encode()
+    return status_code, [["content-type", "application/json"]], body
+
+
+class IdempotencyMiddleware:
+    """Ключ действует в пределах пользователя токена. Запросы без ключа или без токена
+    проходят как обычно. Повтор, пришедший во время выполнения оригинала, ждет его ответа.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        # Выполняющиеся в этом процессе запросы: повторы ждут события, а не опрашивают базу
+        self._inflight: Dict[Tuple[uuid.UUID, str], asyncio.Event] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in MUTATING_METHODS or not settings.idempotency_enabled:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        raw_key = headers.get(b"idempotency-key")
+        resolved = scope.get("state", {}).get(RESOLVED_USER_STATE)
+        if resolved is not None:
+            # Подзапрос пакета: токен уже проверен
+            subject = str(resolved.id)
+        else:
+            subject = get_token_subject(headers.get(b"authorization", b"").decode("latin-1"))
+        if raw_key is None or subject is None:
+            await self.app(scope, receive, send)
+            return
+
+        key = raw_key.decode("latin-1").strip()
+        try:
+            user_id = uuid.UUID(subject)
+        except ValueError:
+            await self.app(scope, receive, send)
+            return
+        if not key or len(key) > 255:
+            await self._send(send, *_json_response(400, "Idempotency-Key must be 1-255 characters"))
+            return
+
+        # Тело читается целиком: оно входит в отпечаток и передается приложению заново
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        body = b"".join(chunks)
+
+        fingerprint = hashlib.sha256(b"\n".join([
+            scope["method"].encode(), scope["path"].encode(), scope.get("query_string", b""), body
+        ])).hexdigest()
+
+        deadline = time.monotonic() + settings.idempotency_wait_seconds
+        poll = 0.05
+        while True:
+            owned, record = await IdempotencyService.reserve(user_id, key, scope["method"], scope["path"], fingerprint)
+            if owned:
+                break
+            if record is None:
+                continue
+            if record.fingerprint != fingerprint:
+                IDEMPOTENT_REQUESTS_TOTAL.labels("mismatch").inc()
+                await self._send(send, *_json_response(422, "Idempotency-Key was already used for a different request"))
+                return
+            if record.status == "completed":
+                IDEMPOTENT_REQUESTS_TOTAL.labels("replayed").inc()
+                replay_headers = list(record.response_headers) + [["idempotent-replayed", "true"]]
+                await self._send(send, record.response_status, replay_headers, record.response_body)
+                return
+
+            # Оригинал еще выполняется: ждем его ответа (в этом процессе - по событию, в другом - опросом)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                IDEMPOTENT_REQUESTS_TOTAL.labels("in_progress").inc()
+                await self._send(send, *_json_response(409, "A request with this Idempotency-Key is in progress"))
+                return
+            inflight = self._inflight.get((user_id, key))
+            if inflight is not None:
+                try:
+                    await asyncio.wait_for(inflight.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+            else:
+                await asyncio.sleep(min(poll, remaining))
+                poll = min(poll * 2, 0.5)
+
+        IDEMPOTENT_REQUESTS_TOTAL.labels("executed").inc()
+        await self._execute(scope, receive, send, user_id, key, body)
+
+    async def _execute(self, scope, receive, send, user_id: uuid.UUID, key: str, body: bytes):
+        """Выполнить запрос, передавая ответ клиенту, и сохранить его для повторов"""
+        done = self._inflight[(user_id, key)] = asyncio.Event()
+        response_status = 500
+        response_headers = []
+        response_chunks = []
+
+        body_sent = False
+
+        async def receive_body():
+            # Тело уже прочитано - отдаем его один раз, дальше ждем отключения клиента
+            nonlocal body_sent
+            if body_sent:
+                return await receive()
+            body_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        async def send_wrapper(message):
+            nonlocal response_status
+            if message["type"] == "http.response.start":
+                response_status = message["status"]
+                response_headers.extend(
+                    [k.decode("latin-1"), v.decode("latin-1")] for k, v in message.get("headers", [])
+                    if k.decode("latin-1").lower() not in _UNSTORED_HEADERS
+                )
+            elif message["type"] == "http.response.body":
+                response_chunks.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive_body, send_wrapper)
+        finally:
+            try:
+                if response_status < 500 and response_status not in RETRYABLE_STATUSES:
+                    await IdempotencyService.complete(
+                        user_id, key, response_status, response_headers, b"".join(response_chunks)
+                    )
+                else:
+                    await IdempotencyService.release(user_id, key)
+            except Exception as e:
+                # Ответ уже отправлен; ключ освободится по истечении аренды
+                logger.warning(f"Failed to store idempotency key result: {e}")
+            finally:
+                del self._inflight[(user_id, key)]
+                done.set()
+
+    @staticmethod
+    async def _send(send, status_code: int, headers: list, body: bytes):
+        raw_headers = [(k.encode("latin-1"), v.encode("latin-1")) for k, v in headers]
+        raw_headers.append((b"content-length", str(len(body)).encode()))
+        await send({"type": "http.response.start", "status": status_code, "headers": raw_headers})
+        await send({"type": "http.response.body", "body": body})
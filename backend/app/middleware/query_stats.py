@@ -0,0 +1,53 @@
+"""
+Middleware статистики SQL: число и время выражений в заголовке Server-Timing, лог и детектор N+1
+"""
+import logging
+
+from app.config import settings
+from app.middleware.metrics import route_template
+from app.utils.query_stats import start_request_stats, finish_request_stats
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStatsMiddleware:
+    """Считает SQL-выражения, выполненные при обработке запроса"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.sql_stats_enabled:
+            await self.app(scope, receive, send)
+            return
+
+        stats = start_request_stats(lambda: f"{scope['method']} {route_template(scope)}")
+        threshold = settings.sql_repeat_threshold
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((
+                    b"server-timing",
+                    f'db;dur={stats.total_seconds * 1000:.1f};desc="{stats.count} queries"'.encode("latin-1")
+                ))
+                repeated = stats.most_repeated()
+                if threshold > 0 and repeated and repeated[1] > threshold:
+                    headers.append((b"x-sql-repeated-statement", str(repeated[1]).encode("latin-1")))
+                message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            finish_request_stats(stats)
+            route = stats.describe_route()
+            logger.debug(f"{route}: {stats.count} queries in {stats.total_seconds * 1000:.1f} ms")
+
+            repeated = stats.most_repeated()
+            if threshold > 0 and repeated and repeated[1] > threshold:
+                statement, times = repeated
+                logger.warning(
+                    f"Possible N+1 in {route}: statement repeated {times} times "
+                    f"({stats.count} queries total): {' '.join(statement.split())[:300]}"
+                )
@@ -0,0 +1,56 @@
+"""
+Middleware read-your-writes: после успешной записи чтения клиента идут в основную базу
+
+Метка хранится у клиента, а не в памяти процесса: ответ на запись содержит заголовок
+X-Primary-Until (unix-время в мс), клиент повторяет его в следующих запросах. Чтение,
+попавшее в другой воркер или реплику приложения, все равно идет в основную базу.
+"""
+import time
+from typing import Optional
+
+from app.config import settings
+from app.database import engine, read_engine
+
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+PRIMARY_UNTIL_HEADER = b"x-primary-until"
+
+# Допустимое расхождение часов серверов, мс
+CLOCK_SKEW_MS = 60_000
+
+
+def _is_pinned(value: Optional[bytes]) -> bool:
+    """Метка клиента еще действует (значения дальше окна READ_YOUR_WRITES_SECONDS игнорируются)"""
+    try:
+        until = int(value)
+    except (TypeError, ValueError):
+        return False
+    now = time.time() * 1000
+    return now < until <= now + settings.read_your_writes_seconds * 1000 + CLOCK_SKEW_MS
+
+
+class ReadYourWritesMiddleware:
+    """Направляет чтения клиента в основную базу по его метке и выдает метку после записи"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or read_engine is engine:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        scope.setdefault("state", {})["read_from_primary"] = _is_pinned(headers.get(PRIMARY_UNTIL_HEADER))
+
+        if scope["method"] in SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                until = int((time.time() + settings.read_your_writes_seconds) * 1000)
+                message["headers"] = [*message.get("headers", []), (PRIMARY_UNTIL_HEADER, str(until).encode())]
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,52 @@
+"""
+Middleware трассировки: корневой спан на HTTP-запрос
+"""
+from starlette.requests import Request
+
+from app.config import settings
+from app.middleware.metrics import route_template
+from app.utils.rate_limit import is_internal_client
+from app.utils.tracing import start_trace
+
+
+class TracingMiddleware:
+    """Открывает трассу для попавших в выборку запросов и возвращает ее id в заголовке"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.tracing_enabled:
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = None
+        for key, value in scope.get("headers", []):
+            if key == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+
+        # Флаг sampled принимаем только от внутренних сервисов (INTERNAL_NETWORKS)
+        trust_sampled = traceparent is not None and is_internal_client(Request(scope))
+        with start_trace(f"{scope['method']} {scope['path']}", traceparent, trust_sampled) as root:
+            if root is None:
+                await self.app(scope, receive, send)
+                return
+
+            status_code = 500
+
+            async def send_wrapper(message):
+                nonlocal status_code
+                if message["type"] == "http.response.start":
+                    status_code = message["status"]
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-trace-id", root.trace_id.encode("latin-1")))
+                    message["headers"] = headers
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                # Шаблон маршрута известен только после роутинга
+                root.name = f"{scope['method']} {route_template(scope)}"
+                root.attributes["status"] = status_code
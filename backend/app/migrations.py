@@ -0,0 +1,68 @@
+"""
+Проверка версии схемы базы данных при старте и применение миграций Alembic
+"""
+import asyncio
+import logging
+from pathlib import Path
+from typing import Optional
+from alembic import command
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from app.config import settings
+from app.database import engine
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def get_alembic_config() -> Config:
+    """Конфигурация Alembic с путями относительно каталога backend"""
+    config = Config(str(BACKEND_DIR / "alembic.ini"))
+    config.set_main_option("script_location", str(BACKEND_DIR / "alembic"))
+    # Логирование приложения уже настроено, alembic.ini не должен его перетирать
+    config.attributes["configure_logger"] = False
+    return config
+
+
+def get_head_revision() -> str:
+    """Последняя ревизия миграций (читается из файлов, без обращения к базе)"""
+    return ScriptDirectory.from_config(get_alembic_config()).get_current_head()
+
+
+async def get_current_revision() -> Optional[str]:
+    """Текущая ревизия схемы в базе: один запрос к alembic_version"""
+    async with engine.connect() as conn:
+        try:
+            result = await conn.execute(text("SELECT version_num FROM alembic_version"))
+        except DBAPIError:
+            # Таблицы alembic_version нет - база еще не под управлением Alembic
+            return None
+        return result.scalar()
+
+
+def upgrade_to_head():
+    """Применить миграции (синхронно; env.py поднимает свой event loop)"""
+    command.upgrade(get_alembic_config(), "head")
+
+
+async def ensure_database_schema():
+    """Убедиться, что схема актуальна; DDL выполняется только при расхождении версий"""
+    head = get_head_revision()
+    current = await get_current_revision()
+
+    if current == head:
+        logger.info(f"Database schema is up to date ({head})")
+        return
+
+    if not settings.db_auto_migrate:
+        raise RuntimeError(
+            f"Database schema revision is {current}, expected {head}. Run 'alembic upgrade head'."
+        )
+
+    logger.info(f"Migrating database schema from {current} to {head}")
+    # env.py использует asyncio.run, поэтому миграции идут в отдельном потоке
+    await asyncio.get_running_loop().run_in_executor(None, upgrade_to_head)
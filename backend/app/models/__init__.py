@@ -2,13 +2,18 @@
 from .family import Family, User
 from .task import TaskTemplate, Task, TaskAssignment
 from .store import StoreItem, Purchase
-from .coins import CoinBalance, CoinTransaction
+from .coins import CoinBalance, CoinTransaction, CoinBalanceSnapshot
 from .goals import Goal, GoalCondition, GoalProgress, GoalAchievement
+from .changes import ChangeLogEntry
+from .outbox import OutboxMessage
+from .idempotency import IdempotencyKey
+from . import versioning  # noqa: F401 - увеличение families.data_version при записи
 
 __all__ = [
     "Family", "User",
     "TaskTemplate", "Task", "TaskAssignment", 
     "StoreItem", "Purchase",
-    "CoinBalance", "CoinTransaction",
-    "Goal", "GoalCondition", "GoalProgress", "GoalAchievement"
+    "CoinBalance", "CoinTransaction", "CoinBalanceSnapshot",
+    "Goal", "GoalCondition", "GoalProgress", "GoalAchievement",
+    "ChangeLogEntry", "OutboxMessage", "IdempotencyKey"
 ]
\ No newline at end of file
@@ -0,0 +1,37 @@
+"""
+Журнал изменений семьи для инкрементальной синхронизации (GET /v1/changes)
+"""
+import uuid
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import BigInteger, String, DateTime, ForeignKey, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.dialects.postgresql import UUID
+
+from app.database import Base
+
+
+class ChangeLogEntry(Base):
+    """Сущность, измененная в транзакции с версией семьи version.
+
+    Строки пишет обработчик app/models/versioning.py в той же транзакции, что и изменение.
+    Версия - families.data_version: запись семьи блокирует строку семьи, поэтому версии
+    фиксируются строго по возрастанию и курсор клиента не пропускает изменений.
+    """
+    __tablename__ = "change_log"
+
+    family_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("families.id", ondelete="CASCADE"), primary_key=True
+    )
+    version: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    entity_type: Mapped[str] = mapped_column(String(20), primary_key=True)  # task, assignment, transaction, goal, store_item
+    entity_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
+    # Ребенок, которому принадлежит сущность (назначение, транзакция, цель); NULL - общая для семьи
+    owner_id: Mapped[Optional[uuid.UUID]] = mapped_column(UUID(as_uuid=True))
+    changed_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
+
+    # Разделы по хешу семьи: лента читает один раздел, очистка идет по changed_at
+    __table_args__ = (
+        Index("ix_change_log_changed_at", "changed_at"),
+        {"postgresql_partition_by": "HASH (family_id)"},
+    )
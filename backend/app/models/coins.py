@@ -4,11 +4,12 @@
 import uuid
 from datetime import datetime
 from typing import List, Optional
-from sqlalchemy import String, Integer, DateTime, ForeignKey, CheckConstraint, Text, UniqueConstraint
+from sqlalchemy import String, Integer, DateTime, ForeignKey, CheckConstraint, Text, UniqueConstraint, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.dialects.postgresql import UUID
 
 from app.database import Base
+from app.utils.ids import uuid7
 
 
 class CoinBalance(Base):
@@ -33,19 +34,37 @@ class CoinBalance(Base):
 class CoinTransaction(Base):
     __tablename__ = "coin_transactions"
 
-    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    # Журнал только растет - UUIDv7 держит вставки в конце индекса
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     amount: Mapped[int] = mapped_column(Integer, nullable=False)  # положительное для заработка, отрицательное для трат
     transaction_type: Mapped[str] = mapped_column(String(20), nullable=False)
     description: Mapped[str] = mapped_column(String(255), nullable=False)
     reference_id: Mapped[Optional[uuid.UUID]] = mapped_column(UUID(as_uuid=True))  # ID задания или покупки
     reference_type: Mapped[Optional[str]] = mapped_column(String(20))  # 'task', 'purchase', 'manual'
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    # Ключ секционирования по месяцам - входит в первичный ключ
+    created_at: Mapped[datetime] = mapped_column(DateTime, primary_key=True, default=datetime.utcnow)
 
     # Ограничения
     __table_args__ = (
         CheckConstraint("transaction_type IN ('earned', 'spent', 'bonus', 'penalty')", name="check_transaction_type"),
+        Index("ix_coin_transactions_user_id_created_at", "user_id", "created_at"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
     )
 
     # Отношения
-    user: Mapped["User"] = relationship("User", back_populates="coin_transactions")
\ No newline at end of file
+    user: Mapped["User"] = relationship("User", back_populates="coin_transactions")
+
+
+class CoinBalanceSnapshot(Base):
+    """Баланс пользователя на границе отсоединенных разделов coin_transactions.
+
+    Записывается перед отсоединением раздела; пересчет целей проигрывает журнал
+    начиная с этого баланса, а не с нуля.
+    """
+    __tablename__ = "coin_balance_snapshots"
+
+    user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    balance: Mapped[int] = mapped_column(Integer, nullable=False)
+    # Учтены все транзакции с created_at < as_of
+    as_of: Mapped[datetime] = mapped_column(DateTime, nullable=False)
@@ -4,7 +4,7 @@
 import uuid
 from datetime import datetime
 from typing import List, Optional
-from sqlalchemy import String, JSON, DateTime, ForeignKey, CheckConstraint
+from sqlalchemy import BigInteger, String, JSON, DateTime, ForeignKey, CheckConstraint, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.dialects.postgresql import UUID
 
@@ -20,6 +20,10 @@ class Family(Base):
     settings: Mapped[Optional[dict]] = mapped_column(JSON, default={})
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Растет в каждой транзакции, меняющей данные семьи (app/models/versioning.py); основа ETag
+    data_version: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0, server_default="0")
+    # Изменения с версией не выше этой могли быть удалены из change_log: клиенту нужна полная загрузка
+    change_log_floor: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0, server_default="0")
 
     # Отношения
     members: Mapped[List["User"]] = relationship("User", back_populates="family", cascade="all, delete-orphan")
@@ -44,6 +48,7 @@ class User(Base):
     # Ограничения
     __table_args__ = (
         CheckConstraint("role IN ('parent', 'child')", name="check_user_role"),
+        Index("ix_users_family_id_role", "family_id", "role"),
     )
 
     # Отношения
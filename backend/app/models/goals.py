@@ -5,11 +5,12 @@ import uuid
 from datetime import datetime, date
 from typing import List, Optional
 from decimal import Decimal
-from sqlalchemy import String, Integer, DateTime, Date, ForeignKey, CheckConstraint, Boolean, Text, Numeric, JSON
+from sqlalchemy import String, Integer, DateTime, Date, ForeignKey, CheckConstraint, Boolean, Text, Numeric, JSON, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.dialects.postgresql import UUID
 
 from app.database import Base
+from app.utils.ids import uuid7
 
 
 class Goal(Base):
@@ -46,6 +47,8 @@ class Goal(Base):
         CheckConstraint("goal_type IN ('coin_saving', 'store_item', 'habit_building', 'mixed')", name="check_goal_type"),
         CheckConstraint("status IN ('active', 'completed', 'paused', 'cancelled')", name="check_goal_status"),
         CheckConstraint("executor_type IN ('individual', 'multiple_children', 'all_children', 'all_parents', 'whole_family')", name="check_executor_type"),
+        Index("ix_goals_child_id_status", "child_id", "status"),
+        Index("ix_goals_family_id_created_at", "family_id", "created_at"),
     )
 
     # Отношения
@@ -75,6 +78,7 @@ class GoalCondition(Base):
     __table_args__ = (
         CheckConstraint("condition_type IN ('coin_amount', 'task_completion', 'habit_streak', 'habit_actions', 'custom')", name="check_condition_type"),
         CheckConstraint("weight >= 0 AND weight <= 1", name="check_weight_range"),
+        Index("ix_goal_conditions_goal_id", "goal_id"),
     )
 
     # Отношения
@@ -85,7 +89,7 @@ class GoalCondition(Base):
 class GoalProgress(Base):
     __tablename__ = "goal_progress"
 
-    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     goal_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("goals.id", ondelete="CASCADE"), nullable=False)
     condition_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("goal_conditions.id", ondelete="CASCADE"), nullable=False)
     current_value: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
@@ -93,6 +97,11 @@ class GoalProgress(Base):
     last_activity_date: Mapped[Optional[date]] = mapped_column(Date)  # Последняя дата активности для streak
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # Индексы
+    __table_args__ = (
+        Index("ix_goal_progress_goal_id_condition_id", "goal_id", "condition_id"),
+    )
+
     # Отношения
     goal: Mapped["Goal"] = relationship("Goal", back_populates="progress")
     condition: Mapped["GoalCondition"] = relationship("GoalCondition", back_populates="progress")
@@ -108,6 +117,12 @@ class GoalAchievement(Base):
     reward_coins_earned: Mapped[int] = mapped_column(Integer, default=0)
     notes: Mapped[Optional[str]] = mapped_column(Text)  # Заметки о достижении
 
+    # Индексы
+    __table_args__ = (
+        Index("ix_goal_achievements_goal_id", "goal_id"),
+        Index("ix_goal_achievements_child_id", "child_id"),
+    )
+
     # Отношения
     goal: Mapped["Goal"] = relationship("Goal", back_populates="achievements")
     child: Mapped["User"] = relationship("User", back_populates="goal_achievements")
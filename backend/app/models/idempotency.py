@@ -0,0 +1,39 @@
+"""
+Ключи идемпотентности: сохраненные ответы изменяющих запросов с заголовком Idempotency-Key
+"""
+import uuid
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import String, Integer, DateTime, CheckConstraint, LargeBinary, Index, JSON
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.dialects.postgresql import UUID
+
+from app.database import Base
+
+
+class IdempotencyKey(Base):
+    """Запрос пользователя с ключом (app/middleware/idempotency.py).
+
+    Пока запрос выполняется, строка in_progress с коротким сроком (аренда: после падения
+    процесса ключ освобождается). После ответа - completed с ответом до expires_at.
+    """
+    __tablename__ = "idempotency_keys"
+
+    user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    method: Mapped[str] = mapped_column(String(10), nullable=False)
+    path: Mapped[str] = mapped_column(String(500), nullable=False)
+    # sha256 метода, пути и тела: тот же ключ с другим запросом - ошибка клиента
+    fingerprint: Mapped[str] = mapped_column(String(64), nullable=False)
+    status: Mapped[str] = mapped_column(String(12), nullable=False, default="in_progress")
+    response_status: Mapped[Optional[int]] = mapped_column(Integer)
+    response_headers: Mapped[Optional[list]] = mapped_column(JSON)
+    response_body: Mapped[Optional[bytes]] = mapped_column(LargeBinary)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+    __table_args__ = (
+        CheckConstraint("status IN ('in_progress', 'completed')", name="check_idempotency_status"),
+        # Очистка просроченных ключей при обслуживании
+        Index("ix_idempotency_keys_expires_at", "expires_at"),
+    )
@@ -0,0 +1,36 @@
+"""
+Transactional outbox: побочные действия, записанные в одной транзакции с изменением
+"""
+import uuid
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import String, Integer, DateTime, CheckConstraint, Text, Index, JSON, text
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.dialects.postgresql import UUID
+
+from app.database import Base
+from app.utils.ids import uuid7
+
+
+class OutboxMessage(Base):
+    """Задача для фонового обработчика (app/services/outbox_service.py).
+
+    Строка удаляется в той же транзакции, в которой обработчик применяет свои изменения;
+    после исчерпания попыток остается со статусом failed для разбора.
+    """
+    __tablename__ = "outbox_messages"
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid7)
+    topic: Mapped[str] = mapped_column(String(50), nullable=False)
+    payload: Mapped[dict] = mapped_column(JSON, nullable=False)
+    status: Mapped[str] = mapped_column(String(10), nullable=False, default="pending")
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # Не раньше этого момента: задержка повтора или аренда захватившего обработчика
+    available_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
+    last_error: Mapped[Optional[str]] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        CheckConstraint("status IN ('pending', 'failed')", name="check_outbox_status"),
+        Index("ix_outbox_messages_pending", "available_at", postgresql_where=text("status = 'pending'")),
+    )
@@ -2,15 +2,29 @@
 Модели для семейного магазина
 """
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import List, Optional
-from sqlalchemy import String, Integer, DateTime, ForeignKey, CheckConstraint, Boolean, Text
+from sqlalchemy import String, Integer, DateTime, ForeignKey, CheckConstraint, Boolean, Text, Index, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.dialects.postgresql import UUID
 
 from app.database import Base
 
 
+# Документ полнотекстового поиска по каталогу; запрос должен использовать то же выражение, что индекс
+STORE_ITEM_SEARCH_DOCUMENT = "to_tsvector('russian', name || ' ' || coalesce(description, ''))"
+
+
+def purchase_period_start(period: str, now: Optional[datetime] = None) -> datetime:
+    """Начало текущего периода лимита покупок (UTC)"""
+    day = (now or datetime.utcnow()).replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    if period == "month":
+        return day.replace(day=1)
+    return day
+
+
 class StoreItem(Base):
     __tablename__ = "store_items"
 
@@ -24,6 +38,31 @@ class StoreItem(Base):
     created_by: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Остаток (NULL - без ограничения); уменьшается только условным UPDATE при покупке
+    stock_quantity: Mapped[Optional[int]] = mapped_column(Integer)
+    # Не больше purchase_limit покупок семьей за период (day, week, month по UTC)
+    purchase_limit: Mapped[Optional[int]] = mapped_column(Integer)
+    purchase_limit_period: Mapped[Optional[str]] = mapped_column(String(10))
+    # Счетчик покупок текущего периода; сбрасывается первой покупкой нового периода
+    period_started_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
+    period_purchases: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    # Всего покупок (популярность); увеличивается при покупке, а не считается по purchases
+    purchase_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+
+    # Индексы
+    __table_args__ = (
+        Index("ix_store_items_family_id_is_available", "family_id", "is_available"),
+        # Сортировки каталога с курсором (price_coins, id) и (purchase_count, id)
+        Index("ix_store_items_family_id_price", "family_id", "price_coins", "id", postgresql_where=text("is_available")),
+        Index("ix_store_items_family_id_popularity", "family_id", "purchase_count", "id", postgresql_where=text("is_available")),
+        Index("ix_store_items_search", text(STORE_ITEM_SEARCH_DOCUMENT), postgresql_using="gin"),
+        CheckConstraint("stock_quantity >= 0", name="check_store_item_stock"),
+        CheckConstraint(
+            "(purchase_limit IS NULL AND purchase_limit_period IS NULL) OR "
+            "(purchase_limit > 0 AND purchase_limit_period IN ('day', 'week', 'month'))",
+            name="check_store_item_purchase_limit"
+        ),
+    )
 
     # Отношения
     family: Mapped["Family"] = relationship("Family", back_populates="store_items")
@@ -31,6 +70,15 @@ class StoreItem(Base):
     purchases: Mapped[List["Purchase"]] = relationship("Purchase", back_populates="item")
     goals: Mapped[List["Goal"]] = relationship("Goal", back_populates="target_store_item")
 
+    @property
+    def period_remaining(self) -> Optional[int]:
+        """Сколько покупок осталось в текущем периоде лимита"""
+        if self.purchase_limit is None:
+            return None
+        if self.period_started_at != purchase_period_start(self.purchase_limit_period):
+            return self.purchase_limit
+        return max(0, self.purchase_limit - self.period_purchases)
+
 
 class Purchase(Base):
     __tablename__ = "purchases"
@@ -43,10 +91,17 @@ class Purchase(Base):
     used_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
     expires_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    # Ключ повтора от клиента: повторное нажатие не списывает коины второй раз
+    client_request_id: Mapped[Optional[uuid.UUID]] = mapped_column(UUID(as_uuid=True))
 
     # Ограничения
     __table_args__ = (
         CheckConstraint("status IN ('purchased', 'used', 'expired')", name="check_purchase_status"),
+        Index("ix_purchases_child_id_created_at", "child_id", "created_at"),
+        Index(
+            "uq_purchases_child_id_client_request_id", "child_id", "client_request_id",
+            unique=True, postgresql_where=text("client_request_id IS NOT NULL")
+        ),
     )
 
     # Отношения
@@ -4,11 +4,12 @@
 import uuid
 from datetime import datetime, date
 from typing import List, Optional
-from sqlalchemy import String, Integer, DateTime, Date, ForeignKey, CheckConstraint, Boolean, Text
+from sqlalchemy import String, Integer, DateTime, Date, ForeignKey, CheckConstraint, Boolean, Text, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.dialects.postgresql import UUID
 
 from app.database import Base
+from app.utils.ids import uuid7
 
 
 class TaskTemplate(Base):
@@ -44,6 +45,8 @@ class Task(Base):
     # Ограничения
     __table_args__ = (
         CheckConstraint("status IN ('active', 'paused', 'archived')", name="check_task_status"),
+        Index("ix_tasks_family_id", "family_id"),
+        Index("ix_tasks_created_by_status", "created_by", "status"),
     )
 
     # Отношения
@@ -56,7 +59,7 @@ class Task(Base):
 class TaskAssignment(Base):
     __tablename__ = "task_assignments"
 
-    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     task_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("tasks.id", ondelete="CASCADE"), nullable=False)
     child_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     status: Mapped[str] = mapped_column(String(20), nullable=False, default="assigned")
@@ -73,6 +76,8 @@ class TaskAssignment(Base):
     # Ограничения
     __table_args__ = (
         CheckConstraint("status IN ('assigned', 'completed', 'approved', 'rejected')", name="check_assignment_status"),
+        Index("ix_task_assignments_child_id_status", "child_id", "status"),
+        Index("ix_task_assignments_task_id_status", "task_id", "status"),
     )
 
     # Отношения
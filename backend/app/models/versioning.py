@@ -0,0 +1,207 @@
+"""
+Версия данных семьи: families.data_version увеличивается в каждой транзакции,
+которая меняет строки семьи (задания, цели, магазин, коины, участники).
+
+Обработчик after_flush определяет затронутые семьи по изменённым объектам и
+выполняет одно выражение в той же транзакции: UPDATE версии и запись измененных
+сущностей в change_log (лента GET /v1/changes). Новая версия и журнал становятся
+видны одновременно с данными. В пределах транзакции семья увеличивается один раз.
+
+Перед первой записью в транзакции (before_flush, CoinService.lock_balance) строка
+семьи блокируется FOR NO KEY UPDATE. Все пишущие транзакции семьи берут эту блокировку
+раньше блокировок строк (баланс, товар, задание), поэтому порядок захвата одинаков
+и взаимные блокировки между ними невозможны.
+"""
+import json
+import uuid
+from itertools import chain
+from typing import Dict, List, Set
+
+from sqlalchemy import bindparam, event, text
+from sqlalchemy.dialects.postgresql import ARRAY, UUID
+from sqlalchemy.orm import Session
+
+from app.models.coins import CoinTransaction
+from app.models.family import Family
+from app.models.goals import Goal, GoalAchievement, GoalCondition, GoalProgress
+from app.models.store import StoreItem
+from app.models.task import Task, TaskAssignment
+
+# Семьи, версия которых уже увеличена в текущей транзакции сессии
+_BUMPED_KEY = "family_versions_bumped"
+
+# Объекты, измененные в обход ORM (UPDATE ... RETURNING); учитываются при следующем flush
+_CHANGED_KEY = "family_objects_changed"
+
+# Ключи семей (family/user/goal, id), строки которых уже заблокированы в текущей транзакции
+_LOCKED_KEY = "family_rows_locked"
+
+# Сущности ленты изменений: класс -> (тип в change_log, атрибут с id сущности, атрибут с ребенком-владельцем).
+# Владелец нужен, чтобы сообщать ребенку только об удалении его собственных сущностей;
+# у условий и прогресса цели он берется из goals.child_id
+FEED_ENTITIES = {
+    Task: ("task", "id", None),
+    TaskAssignment: ("assignment", "id", "child_id"),
+    CoinTransaction: ("transaction", "id", "user_id"),
+    Goal: ("goal", "id", "child_id"),
+    GoalCondition: ("goal", "goal_id", None),
+    GoalProgress: ("goal", "goal_id", None),
+    GoalAchievement: ("goal", "goal_id", "child_id"),
+    StoreItem: ("store_item", "id", None),
+}
+
+# Журнал видит версию после UPDATE из CTE bumped (основной запрос видит снимок до него)
+_BUMP_SQL = text("""
+    WITH bumped AS (
+        UPDATE families SET data_version = data_version + 1
+        WHERE (
+            id = ANY(:family_ids)
+            OR id IN (SELECT family_id FROM users WHERE id = ANY(:user_ids))
+            OR id IN (SELECT family_id FROM goals WHERE id = ANY(:goal_ids))
+        )
+        AND id <> ALL(:bumped)
+        RETURNING id, data_version
+    ), logged AS (
+        INSERT INTO change_log (family_id, version, entity_type, entity_id, owner_id, changed_at)
+        SELECT
+            f.id, coalesce(b.data_version, f.data_version), c.entity_type, c.entity_id,
+            coalesce(c.owner_id, (SELECT child_id FROM goals WHERE id = c.goal_id)),
+            timezone('utc', now())
+        FROM json_to_recordset(CAST(:changes AS json))
+            AS c(family_id uuid, user_id uuid, goal_id uuid, entity_type text, entity_id uuid, owner_id uuid)
+        JOIN families f ON f.id = coalesce(
+            c.family_id,
+            (SELECT family_id FROM users WHERE id = c.user_id),
+            (SELECT family_id FROM goals WHERE id = c.goal_id)
+        )
+        LEFT JOIN bumped b ON b.id = f.id
+        ON CONFLICT DO NOTHING
+    )
+    SELECT id FROM bumped
+""").bindparams(*(
+    bindparam(name, type_=ARRAY(UUID(as_uuid=True)))
+    for name in ("family_ids", "user_ids", "goal_ids", "bumped")
+))
+
+
+# Порядок по id: транзакция, затрагивающая несколько семей, блокирует их как все остальные
+_LOCK_SQL = text("""
+    SELECT id FROM families
+    WHERE id = ANY(:family_ids)
+        OR id IN (SELECT family_id FROM users WHERE id = ANY(:user_ids))
+        OR id IN (SELECT family_id FROM goals WHERE id = ANY(:goal_ids))
+    ORDER BY id
+    FOR NO KEY UPDATE
+""").bindparams(*(
+    bindparam(name, type_=ARRAY(UUID(as_uuid=True)))
+    for name in ("family_ids", "user_ids", "goal_ids")
+))
+
+
+def _family_key(obj) -> Dict:
+    """Ключ, по которому находится семья объекта"""
+    if isinstance(obj, Family):
+        return {"family_id": obj.id}
+    if getattr(obj, "family_id", None):
+        return {"family_id": obj.family_id}
+    if getattr(obj, "goal_id", None):
+        return {"goal_id": obj.goal_id}
+    if getattr(obj, "user_id", None) or getattr(obj, "child_id", None):
+        return {"user_id": getattr(obj, "user_id", None) or obj.child_id}
+    return {}
+
+
+def mark_changed(session: Session, obj):
+    """Учесть объект, измененный выражением UPDATE: session.dirty его не видит"""
+    session.info.setdefault(_CHANGED_KEY, []).append(obj)
+
+
+def lock_families(session: Session, family_ids=(), user_ids=(), goal_ids=()):
+    """Заблокировать строки семей до конца транзакции (повторно не блокирует)"""
+    locked = session.info.setdefault(_LOCKED_KEY, set())
+    keys = {
+        *(("family", value) for value in family_ids),
+        *(("user", value) for value in user_ids),
+        *(("goal", value) for value in goal_ids),
+    }
+    if keys <= locked:
+        return
+    session.connection().execute(_LOCK_SQL, {
+        "family_ids": list(family_ids),
+        "user_ids": list(user_ids),
+        "goal_ids": list(goal_ids),
+    })
+    locked.update(keys)
+
+
+def _pending(session: Session):
+    dirty = (obj for obj in session.dirty if session.is_modified(obj, include_collections=False))
+    return chain(session.new, dirty, session.deleted)
+
+
+def _touched(session: Session):
+    """Ключи семей измененных объектов и записи для ленты изменений"""
+    family_ids: Set[uuid.UUID] = set()
+    user_ids: Set[uuid.UUID] = set()
+    goal_ids: Set[uuid.UUID] = set()
+    changes: Dict[tuple, Dict] = {}
+
+    changed = session.info.pop(_CHANGED_KEY, [])
+    for obj in chain(_pending(session), changed):
+        key = _family_key(obj)
+        if not key:
+            continue
+        family_ids.update(filter(None, [key.get("family_id")]))
+        user_ids.update(filter(None, [key.get("user_id")]))
+        goal_ids.update(filter(None, [key.get("goal_id")]))
+
+        feed = FEED_ENTITIES.get(type(obj))
+        if feed is not None:
+            entity_type, id_attr, owner_attr = feed
+            change = {
+                **key,
+                "entity_type": entity_type,
+                "entity_id": getattr(obj, id_attr),
+                "owner_id": getattr(obj, owner_attr) if owner_attr else None,
+            }
+            # Одна запись на сущность; удаленная цель знает владельца, ее условия - нет
+            feed_key = (entity_type, change["entity_id"])
+            if feed_key not in changes or changes[feed_key]["owner_id"] is None:
+                changes[feed_key] = change
+
+    return family_ids, user_ids, goal_ids, list(changes.values())
+
+
+@event.listens_for(Session, "before_flush")
+def lock_touched_families(session: Session, flush_context, instances):
+    keys = [_family_key(obj) for obj in chain(_pending(session), session.info.get(_CHANGED_KEY, []))]
+    family_ids = {key["family_id"] for key in keys if key.get("family_id")}
+    user_ids = {key["user_id"] for key in keys if key.get("user_id")}
+    goal_ids = {key["goal_id"] for key in keys if key.get("goal_id")}
+    if family_ids or user_ids or goal_ids:
+        lock_families(session, family_ids, user_ids, goal_ids)
+
+
+@event.listens_for(Session, "after_flush")
+def bump_family_versions(session: Session, flush_context):
+    family_ids, user_ids, goal_ids, changes = _touched(session)
+    if not (family_ids or user_ids or goal_ids):
+        return
+
+    bumped = session.info.setdefault(_BUMPED_KEY, set())
+    result = session.connection().execute(_BUMP_SQL, {
+        "family_ids": list(family_ids),
+        "user_ids": list(user_ids),
+        "goal_ids": list(goal_ids),
+        "bumped": list(bumped),
+        "changes": json.dumps(changes, default=str),
+    })
+    bumped.update(row[0] for row in result)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def reset_bumped_families(session: Session, transaction):
+    if transaction.parent is None:
+        session.info.pop(_BUMPED_KEY, None)
+        session.info.pop(_CHANGED_KEY, None)
+        session.info.pop(_LOCKED_KEY, None)
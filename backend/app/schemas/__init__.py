@@ -1,6 +1,6 @@
 # Schemas package
-from . import family, task, store, coins, goals
+from . import family, task, store, coins, goals, dashboard, batch, changes
 
 __all__ = [
-    "family", "task", "store", "coins", "goals"
+    "family", "task", "store", "coins", "goals", "dashboard", "batch", "changes"
 ]
\ No newline at end of file
@@ -0,0 +1,24 @@
+"""
+Pydantic схемы для пакетных запросов
+"""
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel, Field
+
+
+class BatchSubRequest(BaseModel):
+    method: str = Field("GET", pattern="^(GET|POST|PUT|PATCH|DELETE)$")
+    # Путь API вместе со строкой запроса, например /v1/coins/transactions?limit=5
+    path: str = Field(..., pattern="^/v1/", max_length=2048)
+    body: Optional[Any] = None
+    # Дополнительные заголовки подзапроса (If-None-Match и т.п.); Authorization берется из пакета
+    headers: Dict[str, str] = Field(default_factory=dict)
+
+
+class BatchRequest(BaseModel):
+    requests: List[BatchSubRequest] = Field(..., min_length=1)
+
+
+class BatchSubResponse(BaseModel):
+    status: int
+    headers: Dict[str, str]
+    body: Any = None
@@ -0,0 +1,30 @@
+"""
+Pydantic схемы для ленты изменений
+"""
+import uuid
+from typing import List
+from pydantic import BaseModel
+
+from app.schemas.coins import CoinTransaction
+from app.schemas.goals import GoalWithDetails
+from app.schemas.store import StoreItem
+from app.schemas.task import Task, TaskAssignment
+
+
+class DeletedEntity(BaseModel):
+    type: str  # task, assignment, transaction, goal, store_item
+    id: uuid.UUID
+
+
+class ChangesResponse(BaseModel):
+    """Сущности, измененные после курсора; следующий запрос - с since=cursor"""
+    cursor: int
+    # Курсор старше хранимого журнала: загрузите списки целиком и продолжайте с cursor
+    reset: bool
+    has_more: bool
+    tasks: List[Task] = []
+    assignments: List[TaskAssignment] = []
+    transactions: List[CoinTransaction] = []
+    goals: List[GoalWithDetails] = []
+    store_items: List[StoreItem] = []
+    deleted: List[DeletedEntity] = []
@@ -21,7 +21,7 @@ class CoinTransactionBase(BaseModel):
     amount: int
     transaction_type: str = Field(..., pattern="^(earned|spent|bonus|penalty)$")
     description: str = Field(..., max_length=255)
-    reference_type: Optional[str] = Field(None, pattern="^(task|purchase|manual)$")
+    reference_type: Optional[str] = Field(None, pattern="^(task|purchase|manual|goal)$")
 
 
 class CoinTransaction(CoinTransactionBase):
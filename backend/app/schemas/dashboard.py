@@ -0,0 +1,23 @@
+"""
+Pydantic схемы для сводного дашборда
+"""
+from typing import List, Optional, Union
+from pydantic import BaseModel
+
+from app.schemas.coins import CoinBalanceResponse
+from app.schemas.family import FamilyMembersResponse
+from app.schemas.goals import GoalsListResponse
+from app.schemas.store import StoreItem
+from app.schemas.task import MyTasksChildResponse, MyTasksParentResponse
+
+
+class DashboardResponse(BaseModel):
+    """Все данные главного экрана родителя или ребенка одним ответом"""
+    role: str
+    balance: CoinBalanceResponse
+    family: FamilyMembersResponse
+    tasks: Union[MyTasksChildResponse, MyTasksParentResponse]
+    # Родителю - статистика заданий по детям, ребенку - его статистика
+    statistics: dict
+    goals: GoalsListResponse
+    store_items: List[StoreItem]
@@ -0,0 +1,9 @@
+"""
+Pydantic схемы для потока событий
+"""
+from pydantic import BaseModel
+
+
+class StreamTokenResponse(BaseModel):
+    token: str
+    expires_in: int  # секунды; подключение, открытое до истечения, не разрывается
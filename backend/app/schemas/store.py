@@ -12,6 +12,11 @@ class StoreItemBase(BaseModel):
     description: Optional[str] = None
     category: str = Field(..., max_length=50)
     price_coins: int = Field(..., ge=1)
+    # Остаток товара; None - без ограничения
+    stock_quantity: Optional[int] = Field(None, ge=0)
+    # Не больше purchase_limit покупок семьей за период
+    purchase_limit: Optional[int] = Field(None, ge=1)
+    purchase_limit_period: Optional[str] = Field(None, pattern="^(day|week|month)$")
 
 
 class StoreItemCreate(StoreItemBase):
@@ -23,6 +28,9 @@ class StoreItemUpdate(BaseModel):
     description: Optional[str] = None
     price_coins: Optional[int] = Field(None, ge=1)
     is_available: Optional[bool] = None
+    stock_quantity: Optional[int] = Field(None, ge=0)
+    purchase_limit: Optional[int] = Field(None, ge=1)
+    purchase_limit_period: Optional[str] = Field(None, pattern="^(day|week|month)$")
 
 
 class StoreItem(StoreItemBase):
@@ -32,6 +40,9 @@ class StoreItem(StoreItemBase):
     created_by: uuid.UUID
     created_at: datetime
     updated_at: datetime
+    # Осталось покупок в текущем периоде (None - лимита нет)
+    period_remaining: Optional[int] = None
+    purchase_count: int = 0
 
     class Config:
         from_attributes = True
@@ -39,6 +50,8 @@ class StoreItem(StoreItemBase):
 
 class PurchaseCreate(BaseModel):
     item_id: uuid.UUID
+    # Повтор с тем же ключом возвращает уже созданную покупку
+    client_request_id: Optional[uuid.UUID] = None
 
 
 class Purchase(BaseModel):
@@ -61,6 +74,8 @@ class PurchaseWithItem(Purchase):
 
 class StoreItemsResponse(BaseModel):
     items: List[StoreItem]
+    # Курсор следующей страницы (только при limit); None - это последняя страница
+    next_cursor: Optional[str] = None
 
 
 class PurchaseResponse(BaseModel):
@@ -9,12 +9,16 @@ from fastapi import HTTPException, status
 
 from app.models import Family, User, CoinBalance
 from app.schemas.family import FamilyCreate, FamilyJoin, UserLogin
-from app.utils.auth import generate_passcode, create_access_token, get_password_hash, verify_password
+from app.utils.auth import (
+    generate_passcode, create_user_access_token, get_password_hash_async, verify_password_async, password_needs_rehash
+)
+from app.utils.tracing import traced
 
 
 class AuthService:
     
     @staticmethod
+    @traced()
     async def create_family(family_data: FamilyCreate, db: AsyncSession) -> Tuple[Family, User, str]:
         """Создать новую семью с родителем"""
         
@@ -34,7 +38,7 @@ class AuthService:
             family_id=family.id,
             name=family_data.parent_name,
             username=family_data.parent_username,
-            password_hash=get_password_hash(family_data.parent_password),
+            password_hash=await get_password_hash_async(family_data.parent_password),
             role="parent"
         )
         db.add(parent)
@@ -54,11 +58,12 @@ class AuthService:
         await db.refresh(parent)
         
         # Создаем токен
-        access_token = create_access_token(data={"sub": str(parent.id)})
+        access_token = create_user_access_token(parent)
         
         return family, parent, access_token, passcode
     
     @staticmethod
+    @traced()
     async def join_family(join_data: FamilyJoin, db: AsyncSession) -> Tuple[User, str]:
         """Присоединиться к существующей семье"""
         
@@ -89,7 +94,7 @@ class AuthService:
             family_id=family.id,
             name=join_data.user_name,
             username=join_data.username,
-            password_hash=get_password_hash(join_data.password),
+            password_hash=await get_password_hash_async(join_data.password),
             role=join_data.role
         )
         db.add(user)
@@ -108,11 +113,12 @@ class AuthService:
         await db.refresh(user)
         
         # Создаем токен
-        access_token = create_access_token(data={"sub": str(user.id)})
+        access_token = create_user_access_token(user)
         
         return user, access_token
     
     @staticmethod
+    @traced()
     async def login_user(login_data: UserLogin, db: AsyncSession) -> Tuple[User, str]:
         """Авторизация пользователя по логину и паролю"""
         
@@ -127,18 +133,25 @@ class AuthService:
             )
         
         # Проверяем пароль
-        if not verify_password(login_data.password, user.password_hash):
+        if not await verify_password_async(login_data.password, user.password_hash):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid username or password"
             )
         
+        # Перехешируем пароль, если cost-фактор изменился
+        if password_needs_rehash(user.password_hash):
+            user.password_hash = await get_password_hash_async(login_data.password)
+            await db.commit()
+            await db.refresh(user)
+        
         # Создаем токен
-        access_token = create_access_token(data={"sub": str(user.id)})
+        access_token = create_user_access_token(user)
         
         return user, access_token
     
     @staticmethod
+    @traced()
     async def get_family_members(family_id: uuid.UUID, db: AsyncSession) -> Tuple[Family, list[User]]:
         """Получить семью и её членов"""
         
@@ -0,0 +1,165 @@
+"""
+Сервис ленты изменений: сущности семьи, измененные после курсора клиента
+"""
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
+
+from app.models import ChangeLogEntry, CoinTransaction, Family, Goal, StoreItem, Task, TaskAssignment, User
+from app.utils.permissions import CurrentUser
+from app.utils.tracing import traced
+
+# Транзакции приложение не удаляет: отсутствующая транзакция лежит в отсоединенном
+# разделе coin_transactions (срок хранения), и клиент должен оставить ее у себя
+UNDELETABLE_TYPES = {"transaction"}
+
+# Удаление старых записей журнала; семья запоминает последнюю удаленную версию
+_PURGE_SQL = text("""
+    WITH purged AS (
+        DELETE FROM change_log WHERE changed_at < :cutoff
+        RETURNING family_id, version
+    )
+    UPDATE families f SET change_log_floor = p.version
+    FROM (SELECT family_id, max(version) AS version FROM purged GROUP BY family_id) p
+    WHERE f.id = p.family_id AND f.change_log_floor < p.version
+""")
+
+
+class ChangeFeedService:
+
+    @staticmethod
+    @traced()
+    async def get_changes(current_user: CurrentUser, since: int, limit: int, db: AsyncSession) -> Dict:
+        """Изменения после версии since, не больше limit записей журнала (транзакция не делится между страницами)"""
+        result = await db.execute(
+            select(Family.data_version, Family.change_log_floor).where(Family.id == current_user.family_id)
+        )
+        row = result.one_or_none()
+        if row is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Family not found"
+            )
+        current_version, floor = row
+
+        changes = {"cursor": current_version, "reset": False, "has_more": False, "entities": {}, "deleted": []}
+        if since < floor or since > current_version:
+            # Журнал за этот период очищен (или курсор чужой) - клиенту нужна полная загрузка
+            changes["reset"] = True
+            return changes
+        if since == current_version:
+            return changes
+
+        # Версия прочитана раньше журнала: все записи до нее уже зафиксированы
+        base = select(
+            ChangeLogEntry.version, ChangeLogEntry.entity_type, ChangeLogEntry.entity_id, ChangeLogEntry.owner_id
+        ).where(
+            ChangeLogEntry.family_id == current_user.family_id,
+            ChangeLogEntry.version > since,
+            ChangeLogEntry.version <= current_version
+        )
+        result = await db.execute(base.order_by(ChangeLogEntry.version).limit(limit + 1))
+        entries = list(result.all())
+
+        if len(entries) > limit:
+            boundary = entries[limit].version
+            entries = [entry for entry in entries[:limit] if entry.version < boundary]
+            if not entries:
+                # Одна транзакция больше страницы - отдаем ее целиком
+                result = await db.execute(base.where(ChangeLogEntry.version == boundary))
+                entries = list(result.all())
+            changes["has_more"] = True
+            changes["cursor"] = entries[-1].version
+
+        ids: Dict[str, Set[uuid.UUID]] = defaultdict(set)
+        owners: Dict[Tuple[str, uuid.UUID], Optional[uuid.UUID]] = {}
+        for entry in entries:
+            ids[entry.entity_type].add(entry.entity_id)
+            key = (entry.entity_type, entry.entity_id)
+            owners[key] = entry.owner_id or owners.get(key)
+
+        found = await ChangeFeedService._load_entities(current_user.family_id, ids, db)
+        visible = await ChangeFeedService._visible(current_user, found, db)
+        changes["entities"] = visible
+
+        existing = {(entity_type, entity.id) for entity_type, entities in found.items() for entity in entities}
+        changes["deleted"] = [
+            {"type": entity_type, "id": entity_id}
+            for (entity_type, entity_id), owner_id in owners.items()
+            if (entity_type, entity_id) not in existing
+            and entity_type not in UNDELETABLE_TYPES
+            and ChangeFeedService._may_see_deleted(current_user, entity_type, owner_id)
+        ]
+        return changes
+
+    @staticmethod
+    @traced()
+    async def _load_entities(family_id: uuid.UUID, ids: Dict[str, Set[uuid.UUID]], db: AsyncSession) -> Dict[str, List]:
+        """Текущее состояние сущностей семьи; отсутствующие удалены"""
+        queries = {
+            "task": (Task, select(Task).where(Task.family_id == family_id)),
+            "assignment": (TaskAssignment, select(TaskAssignment).join(Task).where(Task.family_id == family_id)),
+            "transaction": (CoinTransaction, select(CoinTransaction).join(User).where(User.family_id == family_id)),
+            "goal": (Goal, select(Goal).options(
+                selectinload(Goal.conditions),
+                selectinload(Goal.progress),
+                joinedload(Goal.child),
+                joinedload(Goal.creator),
+                joinedload(Goal.target_store_item)
+            ).where(Goal.family_id == family_id)),
+            "store_item": (StoreItem, select(StoreItem).where(StoreItem.family_id == family_id)),
+        }
+        found = {}
+        for entity_type, entity_ids in ids.items():
+            if entity_type not in queries:
+                continue
+            model, query = queries[entity_type]
+            result = await db.execute(query.where(model.id.in_(entity_ids)))
+            found[entity_type] = list(result.unique().scalars().all())
+        return found
+
+    @staticmethod
+    def _may_see_deleted(current_user: CurrentUser, entity_type: str, owner_id: Optional[uuid.UUID]) -> bool:
+        """Ребенок узнает об удалении только своих сущностей и товаров (удаление задания - через его назначение)"""
+        if current_user.role == "parent":
+            return True
+        return entity_type == "store_item" or owner_id == current_user.id
+
+    @staticmethod
+    async def _visible(current_user: CurrentUser, found: Dict[str, List], db: AsyncSession) -> Dict[str, List]:
+        """Родитель видит всю семью, ребенок - свои задания, транзакции и цели"""
+        if current_user.role == "parent":
+            return found
+
+        user_id = current_user.id
+        visible = {
+            "assignment": [a for a in found.get("assignment", []) if a.child_id == user_id],
+            "transaction": [t for t in found.get("transaction", []) if t.user_id == user_id],
+            "goal": [g for g in found.get("goal", []) if g.child_id == user_id],
+            "store_item": found.get("store_item", []),
+        }
+        tasks = found.get("task", [])
+        if tasks:
+            result = await db.execute(
+                select(TaskAssignment.task_id).where(
+                    TaskAssignment.task_id.in_([task.id for task in tasks]),
+                    TaskAssignment.child_id == user_id
+                )
+            )
+            assigned = set(result.scalars().all())
+            visible["task"] = [task for task in tasks if task.id in assigned]
+        return visible
+
+    @staticmethod
+    async def purge_expired(conn: AsyncConnection, retention_days: int) -> int:
+        """Удалить записи журнала старше срока хранения; возвращает число семей с новым порогом"""
+        if retention_days <= 0:
+            return 0
+        result = await conn.execute(_PURGE_SQL, {"cutoff": datetime.utcnow() - timedelta(days=retention_days)})
+        return result.rowcount
@@ -2,18 +2,44 @@
 Сервис для работы с коинами и транзакциями
 """
 import uuid
+from datetime import date, datetime, timedelta
 from typing import Tuple, List, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc, func
+from sqlalchemy import event, select, desc, func
+from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
 
 from app.models import CoinBalance, CoinTransaction, User
+from app.models.versioning import lock_families
 from app.schemas.coins import CoinAdjustment
+from app.services.outbox_service import OutboxService
+from app.utils.events import emit_event
+from app.utils.metrics import COINS_CREDITED_TOTAL, COINS_DEBITED_TOTAL
+from app.utils.tracing import traced
+
+# Начисления и списания текущей транзакции: счетчики увеличиваются только после коммита
+_COUNTED_KEY = "coins_counted"
+
+
+def _count_after_commit(db: AsyncSession, counter, transaction_type: str, amount: int):
+    db.info.setdefault(_COUNTED_KEY, []).append((counter, transaction_type, amount))
+
+
+@event.listens_for(Session, "after_commit")
+def _count_committed(session: Session):
+    for counter, transaction_type, amount in session.info.pop(_COUNTED_KEY, []):
+        counter.labels(transaction_type).inc(amount)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_counted(session: Session, previous_transaction):
+    session.info.pop(_COUNTED_KEY, None)
 
 
 class CoinService:
     
     @staticmethod
+    @traced()
     async def get_user_balance(user_id: uuid.UUID, db: AsyncSession) -> CoinBalance:
         """Получить баланс пользователя"""
         result = await db.execute(
@@ -36,6 +62,7 @@ class CoinService:
         return balance
     
     @staticmethod
+    @traced()
     async def add_coins(
         user_id: uuid.UUID,
         amount: int,
@@ -47,12 +74,60 @@ class CoinService:
     ) -> Tuple[CoinTransaction, int]:
         """Добавить коины пользователю"""
         
-        # Получаем текущий баланс
-        balance = await CoinService.get_user_balance(user_id, db)
+        # Блокировка баланса: начисление не затирает параллельное списание
+        balance = await CoinService.lock_balance(user_id, db)
+        transaction = CoinService.credit(balance, amount, description, transaction_type, reference_id, reference_type, db)
+        
+        await db.commit()
+        await db.refresh(transaction)
+        await db.refresh(balance)
+        
+        return transaction, balance.balance
+    
+    @staticmethod
+    @traced()
+    async def lock_balance(user_id: uuid.UUID, db: AsyncSession) -> CoinBalance:
+        """Баланс пользователя под блокировкой строки до конца транзакции (без коммита).
+
+        Сначала блокируется строка семьи - в том же порядке, что и при любой записи
+        (см. app.models.versioning), поэтому списания и начисления не блокируют друг друга взаимно.
+        """
+        await db.run_sync(lock_families, user_ids=[user_id])
+        result = await db.execute(
+            select(CoinBalance)
+            .where(CoinBalance.user_id == user_id)
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        )
+        balance = result.scalar_one_or_none()
+        
+        if not balance:
+            balance = CoinBalance(
+                user_id=user_id,
+                balance=0,
+                total_earned=0,
+                total_spent=0
+            )
+            db.add(balance)
+            await db.flush()
+        
+        return balance
+    
+    @staticmethod
+    def credit(
+        balance: CoinBalance,
+        amount: int,
+        description: str,
+        transaction_type: str = "earned",
+        reference_id: Optional[uuid.UUID] = None,
+        reference_type: Optional[str] = None,
+        db: AsyncSession = None
+    ) -> CoinTransaction:
+        """Начислить коины на заблокированный баланс в текущей транзакции (коммит - у вызывающего)"""
         
         # Создаем транзакцию
         transaction = CoinTransaction(
-            user_id=user_id,
+            user_id=balance.user_id,
             amount=amount,
             transaction_type=transaction_type,
             description=description,
@@ -64,37 +139,23 @@ class CoinService:
         # Обновляем баланс
         balance.balance += amount
         balance.total_earned += amount
+        _count_after_commit(db, COINS_CREDITED_TOTAL, transaction_type, amount)
+        emit_event(db, "balance.changed", user_id=balance.user_id, balance=balance.balance, amount=amount)
+        # Прогресс целей обновит фоновый обработчик после коммита
+        OutboxService.enqueue(db, "goals.coin_change", user_id=balance.user_id, amount=amount)
         
-        await db.commit()
-        await db.refresh(transaction)
-        await db.refresh(balance)
-        
-        # Обновляем прогресс целей при изменении коинов
-        try:
-            from app.services.goal_service import GoalService
-            await GoalService.update_goal_progress_on_coin_change(user_id, amount, db)
-        except ImportError:
-            # Игнорируем если модуль целей недоступен
-            pass
-        except Exception:
-            # Не прерываем основную операцию при ошибке обновления целей
-            pass
-        
-        return transaction, balance.balance
+        return transaction
     
     @staticmethod
-    async def spend_coins(
-        user_id: uuid.UUID,
+    def debit(
+        balance: CoinBalance,
         amount: int,
         description: str,
         reference_id: Optional[uuid.UUID] = None,
         reference_type: Optional[str] = None,
         db: AsyncSession = None
-    ) -> Tuple[CoinTransaction, int]:
-        """Потратить коины пользователя"""
-        
-        # Получаем текущий баланс
-        balance = await CoinService.get_user_balance(user_id, db)
+    ) -> CoinTransaction:
+        """Списать коины с заблокированного баланса в текущей транзакции (коммит - у вызывающего)"""
         
         # Проверяем, достаточно ли коинов
         if balance.balance < amount:
@@ -110,7 +171,7 @@ class CoinService:
         
         # Создаем транзакцию
         transaction = CoinTransaction(
-            user_id=user_id,
+            user_id=balance.user_id,
             amount=-amount,  # Отрицательное значение для трат
             transaction_type="spent",
             description=description,
@@ -122,25 +183,37 @@ class CoinService:
         # Обновляем баланс
         balance.balance -= amount
         balance.total_spent += amount
+        _count_after_commit(db, COINS_DEBITED_TOTAL, "spent", amount)
+        emit_event(db, "balance.changed", user_id=balance.user_id, balance=balance.balance, amount=-amount)
+        # Прогресс целей обновит фоновый обработчик после коммита
+        OutboxService.enqueue(db, "goals.coin_change", user_id=balance.user_id, amount=-amount)
+        
+        return transaction
+    
+    @staticmethod
+    @traced()
+    async def spend_coins(
+        user_id: uuid.UUID,
+        amount: int,
+        description: str,
+        reference_id: Optional[uuid.UUID] = None,
+        reference_type: Optional[str] = None,
+        db: AsyncSession = None
+    ) -> Tuple[CoinTransaction, int]:
+        """Потратить коины пользователя"""
+        
+        # Блокировка баланса: параллельные списания не проходят проверку по одному и тому же остатку
+        balance = await CoinService.lock_balance(user_id, db)
+        transaction = CoinService.debit(balance, amount, description, reference_id, reference_type, db)
         
         await db.commit()
         await db.refresh(transaction)
         await db.refresh(balance)
         
-        # Обновляем прогресс целей при изменении коинов
-        try:
-            from app.services.goal_service import GoalService
-            await GoalService.update_goal_progress_on_coin_change(user_id, -amount, db)
-        except ImportError:
-            # Игнорируем если модуль целей недоступен
-            pass
-        except Exception:
-            # Не прерываем основную операцию при ошибке обновления целей
-            pass
-        
         return transaction, balance.balance
     
     @staticmethod
+    @traced()
     async def adjust_coins(
         adjustment: CoinAdjustment,
         adjusted_by: uuid.UUID,
@@ -171,7 +244,7 @@ class CoinService:
             )
         else:
             # Для отрицательных значений
-            balance = await CoinService.get_user_balance(adjustment.child_id, db)
+            balance = await CoinService.lock_balance(adjustment.child_id, db)
             
             transaction = CoinTransaction(
                 user_id=adjustment.child_id,
@@ -189,20 +262,25 @@ class CoinService:
             balance.balance = new_balance
             if spent_amount > 0:
                 balance.total_spent += spent_amount
+            emit_event(db, "balance.changed", user_id=adjustment.child_id, balance=new_balance, amount=-spent_amount)
             
             await db.commit()
+            COINS_DEBITED_TOTAL.labels("penalty").inc(spent_amount)
             await db.refresh(transaction)
             await db.refresh(balance)
             
             return transaction, balance.balance
     
     @staticmethod
+    @traced()
     async def get_transactions(
         user_id: uuid.UUID,
         limit: int = 20,
         offset: int = 0,
         transaction_type: Optional[str] = None,
-        db: AsyncSession = None
+        db: AsyncSession = None,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None
     ) -> Tuple[List[CoinTransaction], int, bool]:
         """Получить историю транзакций пользователя"""
         
@@ -213,6 +291,12 @@ class CoinService:
         if transaction_type:
             query = query.where(CoinTransaction.transaction_type == transaction_type)
         
+        # Фильтр по периоду: полуоткрытый диапазон позволяет отсечь лишние месячные разделы
+        if date_from:
+            query = query.where(CoinTransaction.created_at >= datetime.combine(date_from, datetime.min.time()))
+        if date_to:
+            query = query.where(CoinTransaction.created_at < datetime.combine(date_to + timedelta(days=1), datetime.min.time()))
+        
         # Подсчет общего количества
         count_query = select(func.count()).select_from(query.subquery())
         total_count = await db.scalar(count_query)
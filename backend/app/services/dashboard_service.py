@@ -0,0 +1,69 @@
+"""
+Сервис сводного дашборда: независимые чтения выполняются параллельно
+"""
+import asyncio
+from typing import Dict
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.database import async_session_maker
+from app.services.auth_service import AuthService
+from app.services.coin_service import CoinService
+from app.services.goal_service import GoalService
+from app.services.stats_service import StatsService
+from app.services.store_service import StoreService
+from app.services.task_service import TaskService
+from app.utils.permissions import CurrentUser
+from app.utils.tracing import traced
+
+
+class DashboardService:
+
+    @staticmethod
+    @traced()
+    async def get_dashboard(current_user: CurrentUser, read_session_maker: async_sessionmaker) -> Dict:
+        """Данные главного экрана.
+
+        Каждый раздел читается в своей сессии (отдельное соединение из пула),
+        поэтому общее время близко к самому медленному запросу, а не к их сумме.
+        """
+        user_id, family_id = current_user.id, current_user.family_id
+        is_parent = current_user.role == "parent"
+
+        async def section(loader, session_maker=read_session_maker):
+            async with session_maker() as db:
+                return await loader(db)
+
+        async def load_tasks(db):
+            if is_parent:
+                return await TaskService.get_parent_tasks(user_id, family_id, db)
+            return await TaskService.get_child_tasks(user_id, db)
+
+        async def load_statistics(db):
+            if is_parent:
+                return await TaskService.get_parent_task_statistics(user_id, family_id, db)
+            return await StatsService.get_child_stats(user_id, db)
+
+        async def load_goals(db):
+            if is_parent:
+                return await GoalService.get_family_goals(family_id=family_id, db=db)
+            return await GoalService.get_child_goals(child_id=user_id, family_id=family_id, db=db)
+
+        # Баланс - из основной базы: при отсутствии строки сервис создает ее
+        balance, family, tasks, statistics, goals, store_items = await asyncio.gather(
+            section(lambda db: CoinService.get_user_balance(user_id, db), async_session_maker),
+            section(lambda db: AuthService.get_family_members(family_id, db)),
+            section(load_tasks),
+            section(load_statistics),
+            section(load_goals),
+            section(lambda db: StoreService.get_store_items(family_id, db)),
+        )
+
+        return {
+            "balance": balance,
+            "family": family,
+            "tasks": tasks,
+            "statistics": statistics,
+            "goals": goals,
+            "store_items": store_items,
+        }
@@ -0,0 +1,209 @@
+"""
+Сервис для пересчета прогресса целей по журналу транзакций и заданий
+"""
+import asyncio
+import uuid
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, and_
+from sqlalchemy.orm import selectinload
+
+from app.database import async_session_maker
+from app.models import Family, Goal, GoalProgress, CoinTransaction, CoinBalanceSnapshot, TaskAssignment
+from app.schemas.goals import ConditionType, GoalStatus
+
+
+class GoalRecomputeService:
+
+    @staticmethod
+    async def recompute_all(
+        apply: bool = False,
+        concurrency: int = 4,
+        chunk_size: int = 50,
+        family_ids: Optional[List[uuid.UUID]] = None
+    ) -> Dict:
+        """Пересчитать прогресс целей всех семей и вернуть отчет о расхождениях"""
+
+        if family_ids is None:
+            async with async_session_maker() as db:
+                result = await db.execute(select(Family.id).order_by(Family.id))
+                family_ids = list(result.scalars().all())
+
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def process(family_id: uuid.UUID) -> Dict:
+            async with semaphore:
+                try:
+                    diffs = await GoalRecomputeService.recompute_family(family_id, apply)
+                    return {"family_id": str(family_id), "diffs": diffs}
+                except Exception as e:
+                    # Ошибка одной семьи не должна останавливать весь пересчет
+                    return {"family_id": str(family_id), "diffs": [], "error": str(e)}
+
+        families = []
+        for start in range(0, len(family_ids), chunk_size):
+            chunk = family_ids[start:start + chunk_size]
+            families.extend(await asyncio.gather(*(process(fid) for fid in chunk)))
+
+        return {
+            "applied": apply,
+            "families_processed": len(families),
+            "families_with_diffs": len([f for f in families if f["diffs"]]),
+            "total_diffs": sum(len(f["diffs"]) for f in families),
+            "errors": [f for f in families if "error" in f],
+            "families": [f for f in families if f["diffs"]]
+        }
+
+    @staticmethod
+    async def recompute_family(family_id: uuid.UUID, apply: bool = False) -> List[Dict]:
+        """Пересчитать прогресс целей одной семьи в отдельной короткой транзакции"""
+
+        async with async_session_maker() as db:
+            query = select(Goal).options(
+                selectinload(Goal.conditions)
+            ).where(
+                and_(
+                    Goal.family_id == family_id,
+                    Goal.child_id.is_not(None),
+                    Goal.status.in_([GoalStatus.ACTIVE, GoalStatus.PAUSED])
+                )
+            )
+            result = await db.execute(query)
+            goals = list(result.scalars().all())
+            if not goals:
+                return []
+
+            # Блокируем строки прогресса, чтобы не гоняться с живыми обновлениями
+            progress_query = select(GoalProgress).where(
+                GoalProgress.goal_id.in_([g.id for g in goals])
+            )
+            if apply:
+                progress_query = progress_query.with_for_update()
+            result = await db.execute(progress_query)
+            progress_by_condition = {p.condition_id: p for p in result.scalars().all()}
+
+            child_ids = {g.child_id for g in goals}
+            balances = await GoalRecomputeService._replay_balances(child_ids, db)
+            approvals = await GoalRecomputeService._load_approvals(child_ids, db)
+
+            diffs = []
+            for goal in goals:
+                for condition in goal.conditions:
+                    progress = progress_by_condition.get(condition.id)
+                    if not progress:
+                        continue
+
+                    expected = GoalRecomputeService._expected_progress(
+                        goal, condition, balances.get(goal.child_id, 0), approvals.get(goal.child_id, [])
+                    )
+                    if expected is None:
+                        continue
+
+                    for field, new_value in expected.items():
+                        old_value = getattr(progress, field)
+                        if old_value != new_value:
+                            diffs.append({
+                                "goal_id": str(goal.id),
+                                "condition_id": str(condition.id),
+                                "condition_type": condition.condition_type,
+                                "field": field,
+                                "old": old_value.isoformat() if isinstance(old_value, date) else old_value,
+                                "new": new_value.isoformat() if isinstance(new_value, date) else new_value
+                            })
+                            if apply:
+                                setattr(progress, field, new_value)
+
+            if apply and diffs:
+                await db.commit()
+            else:
+                await db.rollback()
+
+            return diffs
+
+    # Private helper methods
+
+    @staticmethod
+    def _expected_progress(goal: Goal, condition, balance: int, approvals: List[TaskAssignment]) -> Optional[Dict]:
+        """Вычислить ожидаемые значения прогресса для условия цели"""
+
+        if condition.condition_type == ConditionType.COIN_AMOUNT:
+            return {"current_value": balance}
+
+        # Учитываем только задания, одобренные после создания цели
+        relevant = [
+            a for a in approvals
+            if a.approved_at and a.approved_at >= goal.created_at
+            and (not condition.target_reference_id or a.task_id == condition.target_reference_id)
+        ]
+
+        if condition.condition_type == ConditionType.TASK_COMPLETION:
+            return {"current_value": len(relevant)}
+
+        if condition.condition_type == ConditionType.HABIT_STREAK and condition.is_streak_required:
+            streak = 0
+            last_date = None
+            for activity_date in sorted({a.approved_at.date() for a in relevant}):
+                if last_date and activity_date == last_date + timedelta(days=1):
+                    streak += 1
+                else:
+                    streak = 1
+                last_date = activity_date
+            return {"current_value": streak, "streak_count": streak, "last_activity_date": last_date}
+
+        # habit_actions и custom обновляются вручную, пересчитывать нечего
+        return None
+
+    @staticmethod
+    def replay_transactions(balances: Dict[uuid.UUID, int], rows) -> Dict[uuid.UUID, int]:
+        """Применить к балансам транзакции (user_id, amount, transaction_type) в порядке журнала"""
+        for user_id, amount, transaction_type in rows:
+            balance = balances.get(user_id, 0) + amount
+            # Штрафы не уводят баланс в минус (см. CoinService.adjust_coins)
+            balances[user_id] = max(0, balance) if transaction_type == "penalty" else balance
+        return balances
+
+    @staticmethod
+    async def _replay_balances(child_ids, db: AsyncSession) -> Dict[uuid.UUID, int]:
+        """Восстановить баланс каждого ребенка, проиграв журнал транзакций.
+
+        Отсоединенные разделы в журнале уже не видны: проигрывание начинается со снимка
+        баланса на их границе (PartitionService.snapshot_balances).
+        """
+
+        result = await db.execute(
+            select(CoinBalanceSnapshot).where(CoinBalanceSnapshot.user_id.in_(child_ids))
+        )
+        snapshots = {s.user_id: s for s in result.scalars().all()}
+
+        query = (
+            select(CoinTransaction.user_id, CoinTransaction.amount, CoinTransaction.transaction_type)
+            .where(CoinTransaction.user_id.in_(child_ids))
+            .order_by(CoinTransaction.created_at, CoinTransaction.id)
+        )
+        if snapshots:
+            # Все снимки сделаны на одной границе; условие отсекает разделы до нее
+            query = query.where(CoinTransaction.created_at >= min(s.as_of for s in snapshots.values()))
+        result = await db.execute(query)
+
+        balances = {child_id: 0 for child_id in child_ids}
+        balances.update({user_id: s.balance for user_id, s in snapshots.items()})
+        return GoalRecomputeService.replay_transactions(balances, result)
+
+    @staticmethod
+    async def _load_approvals(child_ids, db: AsyncSession) -> Dict[uuid.UUID, List[TaskAssignment]]:
+        """Получить одобренные задания детей"""
+
+        result = await db.execute(
+            select(TaskAssignment).where(
+                and_(
+                    TaskAssignment.child_id.in_(child_ids),
+                    TaskAssignment.status == "approved"
+                )
+            )
+        )
+
+        approvals: Dict[uuid.UUID, List[TaskAssignment]] = {}
+        for assignment in result.scalars().all():
+            approvals.setdefault(assignment.child_id, []).append(assignment)
+        return approvals
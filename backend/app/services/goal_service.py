@@ -16,11 +16,14 @@ from app.schemas.goals import (
     ConditionType, GoalProgressSummary, GoalStatistics, ExecutorType, HabitGoalData, StoreItemGoalData
 )
 from app.services.coin_service import CoinService
+from app.utils.events import emit_event
+from app.utils.tracing import traced
 
 
 class GoalService:
     
     @staticmethod
+    @traced()
     async def get_executors_data(
         family_id: uuid.UUID,
         current_user_id: uuid.UUID,
@@ -119,6 +122,7 @@ class GoalService:
         }
     
     @staticmethod
+    @traced()
     async def create_enhanced_goal(
         goal_data: GoalCreate,
         creator_id: uuid.UUID,
@@ -186,6 +190,7 @@ class GoalService:
                 is_streak_required=condition_data.is_streak_required
             )
             db.add(condition)
+            await db.flush()  # id условия нужен для прогресса
             
             # Создаем прогресс для каждого условия и каждого исполнителя
             for executor_id in executor_ids:
@@ -202,6 +207,7 @@ class GoalService:
         return goal
     
     @staticmethod
+    @traced()
     async def _validate_and_get_executor_ids(
         executor_data,
         family_id: uuid.UUID,
@@ -292,6 +298,7 @@ class GoalService:
             )
     
     @staticmethod
+    @traced()
     async def _validate_goal_type_data(
         goal_data: GoalCreate,
         family_id: uuid.UUID,
@@ -363,6 +370,7 @@ class GoalService:
                     )
     
     @staticmethod
+    @traced()
     async def create_legacy_goal(
         goal_data: GoalCreateLegacy,
         creator_id: uuid.UUID,
@@ -440,6 +448,7 @@ class GoalService:
                 is_streak_required=condition_data.is_streak_required
             )
             db.add(condition)
+            await db.flush()  # id условия нужен для прогресса
             
             # Создаем прогресс для каждого условия
             progress = GoalProgress(
@@ -459,6 +468,7 @@ class GoalService:
         return goal
     
     @staticmethod
+    @traced()
     async def create_store_item_goal(
         item_id: uuid.UUID,
         goal_data: StoreItemGoalCreate,
@@ -509,6 +519,7 @@ class GoalService:
         return await GoalService.create_goal(goal_create_data, creator_id, family_id, db)
     
     @staticmethod
+    @traced()
     async def get_child_goals(
         child_id: uuid.UUID,
         family_id: uuid.UUID,
@@ -539,6 +550,7 @@ class GoalService:
         return list(result.scalars().all())
     
     @staticmethod
+    @traced()
     async def get_family_goals(
         family_id: uuid.UUID,
         db: AsyncSession,
@@ -567,6 +579,7 @@ class GoalService:
         return list(result.scalars().all())
     
     @staticmethod
+    @traced()
     async def get_goal_by_id(
         goal_id: uuid.UUID,
         family_id: uuid.UUID,
@@ -591,6 +604,7 @@ class GoalService:
         return result.scalar_one_or_none()
     
     @staticmethod
+    @traced()
     async def update_goal(
         goal_id: uuid.UUID,
         goal_data: GoalUpdate,
@@ -619,6 +633,7 @@ class GoalService:
         return goal
     
     @staticmethod
+    @traced()
     async def pause_goal(goal_id: uuid.UUID, family_id: uuid.UUID, db: AsyncSession) -> Goal:
         """Приостановить цель"""
         return await GoalService.update_goal(
@@ -629,6 +644,7 @@ class GoalService:
         )
     
     @staticmethod
+    @traced()
     async def resume_goal(goal_id: uuid.UUID, family_id: uuid.UUID, db: AsyncSession) -> Goal:
         """Возобновить цель"""
         return await GoalService.update_goal(
@@ -639,6 +655,7 @@ class GoalService:
         )
     
     @staticmethod
+    @traced()
     async def cancel_goal(goal_id: uuid.UUID, family_id: uuid.UUID, db: AsyncSession) -> Goal:
         """Отменить цель"""
         return await GoalService.update_goal(
@@ -649,6 +666,7 @@ class GoalService:
         )
     
     @staticmethod
+    @traced()
     async def delete_goal(goal_id: uuid.UUID, family_id: uuid.UUID, db: AsyncSession) -> bool:
         """Удалить цель"""
         
@@ -665,12 +683,25 @@ class GoalService:
         return True
     
     @staticmethod
+    @traced()
     async def update_goal_progress_on_coin_change(
         user_id: uuid.UUID,
         coin_change: int,
         db: AsyncSession
     ) -> List[Goal]:
         """Обновить прогресс целей при изменении коинов"""
+        updated_goals = await GoalService.apply_goal_progress_on_coin_change(user_id, coin_change, db)
+        await db.commit()
+        return updated_goals
+    
+    @staticmethod
+    @traced()
+    async def apply_goal_progress_on_coin_change(
+        user_id: uuid.UUID,
+        coin_change: int,
+        db: AsyncSession
+    ) -> List[Goal]:
+        """Обновить прогресс целей при изменении коинов в текущей транзакции (коммит - у вызывающего)"""
         
         # Получаем активные цели пользователя с условиями накопления коинов
         result = await db.execute(
@@ -692,8 +723,8 @@ class GoalService:
             coin_conditions = [c for c in goal.conditions if c.condition_type == ConditionType.COIN_AMOUNT]
             
             if coin_conditions:
-                # Получаем текущий баланс
-                balance = await CoinService.get_user_balance(user_id, db)
+                # Текущий баланс под блокировкой: параллельное списание не даст устаревшее значение
+                balance = await CoinService.lock_balance(user_id, db)
                 
                 for condition in coin_conditions:
                     # Находим прогресс для этого условия
@@ -707,16 +738,28 @@ class GoalService:
                     await GoalService._complete_goal(goal, db)
                     updated_goals.append(goal)
         
-        await db.commit()
         return updated_goals
     
     @staticmethod
+    @traced()
     async def update_goal_progress_on_task_completion(
         child_id: uuid.UUID,
         task_assignment_id: uuid.UUID,
         db: AsyncSession
     ) -> List[Goal]:
         """Обновить прогресс целей при выполнении задания"""
+        updated_goals = await GoalService.apply_goal_progress_on_task_completion(child_id, task_assignment_id, db)
+        await db.commit()
+        return updated_goals
+    
+    @staticmethod
+    @traced()
+    async def apply_goal_progress_on_task_completion(
+        child_id: uuid.UUID,
+        task_assignment_id: uuid.UUID,
+        db: AsyncSession
+    ) -> List[Goal]:
+        """Обновить прогресс целей при выполнении задания в текущей транзакции (коммит - у вызывающего)"""
         
         # Получаем назначение задания
         result = await db.execute(
@@ -782,10 +825,10 @@ class GoalService:
                 await GoalService._complete_goal(goal, db)
                 updated_goals.append(goal)
         
-        await db.commit()
         return updated_goals
     
     @staticmethod
+    @traced()
     async def get_goal_progress_summary(goal: Goal) -> GoalProgressSummary:
         """Получить сводку прогресса по цели"""
         
@@ -819,6 +862,7 @@ class GoalService:
         )
     
     @staticmethod
+    @traced()
     async def get_family_goal_statistics(family_id: uuid.UUID, db: AsyncSession) -> Dict:
         """Получить статистику целей семьи"""
         
@@ -896,6 +940,7 @@ class GoalService:
     # Private helper methods
     
     @staticmethod
+    @traced()
     async def _validate_goal_conditions(goal_data: GoalCreate, family_id: uuid.UUID, db: AsyncSession):
         """Валидировать условия цели"""
         
@@ -936,6 +981,7 @@ class GoalService:
                         )
     
     @staticmethod
+    @traced()
     async def _initialize_goal_progress(goal_id: uuid.UUID, db: AsyncSession):
         """Инициализировать прогресс цели на основе существующих данных"""
         
@@ -956,6 +1002,7 @@ class GoalService:
         await db.commit()
     
     @staticmethod
+    @traced()
     async def _check_goal_completion(goal: Goal, db: AsyncSession) -> bool:
         """Проверить завершение цели"""
         
@@ -978,16 +1025,19 @@ class GoalService:
             return True
     
     @staticmethod
+    @traced()
     async def _complete_goal(goal: Goal, db: AsyncSession):
-        """Завершить цель и начислить награду"""
+        """Завершить цель и начислить награду (без коммита)"""
         
         goal.status = GoalStatus.COMPLETED
         goal.completed_at = datetime.utcnow()
+        emit_event(db, "goal.completed", family_id=goal.family_id, user_id=goal.child_id, goal_id=goal.id)
         
         # Начисляем бонусные коины, если указаны
         if goal.reward_coins > 0:
-            await CoinService.add_coins(
-                user_id=goal.child_id,
+            balance = await CoinService.lock_balance(goal.child_id, db)
+            CoinService.credit(
+                balance,
                 amount=goal.reward_coins,
                 description=f"Награда за достижение цели: {goal.title}",
                 reference_id=goal.id,
@@ -0,0 +1,102 @@
+"""
+Сервис ключей идемпотентности: резервирование ключа, сохранение и выдача ответа
+"""
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy import Row, delete, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.config import settings
+from app.database import engine
+from app.models import IdempotencyKey
+
+
+class IdempotencyService:
+
+    @staticmethod
+    async def reserve(
+        user_id: uuid.UUID,
+        key: str,
+        method: str,
+        path: str,
+        fingerprint: str
+    ) -> Tuple[bool, Optional[Row]]:
+        """Занять ключ: (True, None) - запрос выполняет вызывающий, иначе (False, существующая запись).
+
+        Просроченная запись (старый ответ или аренда упавшего процесса) занимается заново.
+        Запись может исчезнуть между вставкой и чтением - тогда (False, None), нужно повторить.
+        """
+        now = datetime.utcnow()
+        values = {
+            "method": method,
+            "path": path,
+            "fingerprint": fingerprint,
+            "status": "in_progress",
+            "response_status": None,
+            "response_headers": None,
+            "response_body": None,
+            "created_at": now,
+            "expires_at": now + timedelta(seconds=settings.idempotency_lease_seconds),
+        }
+        statement = insert(IdempotencyKey).values(user_id=user_id, key=key, **values)
+        statement = statement.on_conflict_do_update(
+            index_elements=[IdempotencyKey.user_id, IdempotencyKey.key],
+            set_=values,
+            where=IdempotencyKey.expires_at < now
+        ).returning(IdempotencyKey.key)
+
+        async with engine.begin() as conn:
+            if (await conn.execute(statement)).first() is not None:
+                return True, None
+            result = await conn.execute(
+                select(IdempotencyKey.__table__).where(
+                    IdempotencyKey.user_id == user_id,
+                    IdempotencyKey.key == key
+                )
+            )
+            return False, result.first()
+
+    @staticmethod
+    async def complete(
+        user_id: uuid.UUID,
+        key: str,
+        status_code: int,
+        headers: List[List[str]],
+        body: bytes
+    ):
+        """Сохранить ответ выполненного запроса на idempotency_ttl_hours"""
+        async with engine.begin() as conn:
+            await conn.execute(
+                update(IdempotencyKey)
+                .where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+                .values(
+                    status="completed",
+                    response_status=status_code,
+                    response_headers=headers,
+                    response_body=body,
+                    expires_at=datetime.utcnow() + timedelta(hours=settings.idempotency_ttl_hours)
+                )
+            )
+
+    @staticmethod
+    async def release(user_id: uuid.UUID, key: str):
+        """Освободить ключ без ответа: повтор выполнит запрос заново"""
+        async with engine.begin() as conn:
+            await conn.execute(
+                delete(IdempotencyKey).where(
+                    IdempotencyKey.user_id == user_id,
+                    IdempotencyKey.key == key,
+                    IdempotencyKey.status == "in_progress"
+                )
+            )
+
+    @staticmethod
+    async def purge_expired(conn: AsyncConnection) -> int:
+        """Удалить просроченные ключи; возвращает число удаленных"""
+        result = await conn.execute(
+            delete(IdempotencyKey).where(IdempotencyKey.expires_at < datetime.utcnow())
+        )
+        return result.rowcount
@@ -0,0 +1,204 @@
+"""
+Сервис transactional outbox: побочные действия записываются в той же транзакции,
+что и изменение, и выполняются фоновым диспетчером после коммита
+"""
+import json
+import time
+import uuid
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import delete, event, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import async_session_maker
+from app.models import OutboxMessage
+from app.utils.metrics import (
+    OUTBOX_MESSAGES_TOTAL, OUTBOX_LAG_SECONDS, OUTBOX_OLDEST_PENDING_SECONDS, OUTBOX_FAILED_MESSAGES
+)
+
+logger = logging.getLogger(__name__)
+
+# Сессия записала сообщение - после коммита будим диспетчер этого процесса
+_ENQUEUED_KEY = "outbox_enqueued"
+
+# Как часто обновлять метрики очереди, секунды
+STATS_INTERVAL_SECONDS = 15
+
+_wakeup: Optional[asyncio.Event] = None
+
+
+def _wakeup_event() -> asyncio.Event:
+    global _wakeup
+    if _wakeup is None:
+        _wakeup = asyncio.Event()
+    return _wakeup
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_dispatcher(session: Session):
+    if session.info.pop(_ENQUEUED_KEY, False) and _wakeup is not None:
+        _wakeup.set()
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_enqueued(session: Session, previous_transaction):
+    session.info.pop(_ENQUEUED_KEY, None)
+
+
+async def _update_goals_on_coin_change(payload: Dict, db: AsyncSession):
+    from app.services.goal_service import GoalService
+    await GoalService.apply_goal_progress_on_coin_change(uuid.UUID(payload["user_id"]), payload["amount"], db)
+
+
+async def _update_goals_on_task_approval(payload: Dict, db: AsyncSession):
+    from app.services.goal_service import GoalService
+    await GoalService.apply_goal_progress_on_task_completion(
+        child_id=uuid.UUID(payload["child_id"]),
+        task_assignment_id=uuid.UUID(payload["assignment_id"]),
+        db=db
+    )
+
+
+# Обработчики по темам; обработчик не коммитит: удаление сообщения и все его изменения
+# фиксирует один коммит в OutboxService.process
+HANDLERS: Dict[str, Callable[[Dict, AsyncSession], Awaitable[None]]] = {
+    "goals.coin_change": _update_goals_on_coin_change,
+    "goals.task_approved": _update_goals_on_task_approval,
+}
+
+
+class OutboxService:
+
+    @staticmethod
+    def enqueue(db: AsyncSession, topic: str, **payload):
+        """Записать сообщение в текущую транзакцию; обработается после коммита"""
+        if topic not in HANDLERS:
+            raise ValueError(f"Unknown outbox topic: {topic}")
+        # UUID и даты сохраняются строками
+        db.add(OutboxMessage(topic=topic, payload=json.loads(json.dumps(payload, default=str))))
+        db.info[_ENQUEUED_KEY] = True
+
+    @staticmethod
+    async def claim_batch(limit: int) -> List[OutboxMessage]:
+        """Захватить готовые сообщения: SKIP LOCKED не дает двум процессам взять одно сообщение,
+        а сдвиг available_at на время аренды возвращает его в очередь, если обработчик упадет"""
+        now = datetime.utcnow()
+        ready = (
+            select(OutboxMessage.id)
+            .where(OutboxMessage.status == "pending", OutboxMessage.available_at <= now)
+            .order_by(OutboxMessage.available_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        async with async_session_maker() as db:
+            result = await db.execute(
+                update(OutboxMessage)
+                .where(OutboxMessage.id.in_(ready.scalar_subquery()))
+                .values(
+                    available_at=now + timedelta(seconds=settings.outbox_lease_seconds),
+                    attempts=OutboxMessage.attempts + 1
+                )
+                .returning(OutboxMessage)
+                .execution_options(synchronize_session=False)
+            )
+            messages = list(result.scalars().all())
+            await db.commit()
+        return messages
+
+    @staticmethod
+    async def process(message: OutboxMessage) -> bool:
+        """Выполнить обработчик; сообщение удаляется в его же транзакции.
+
+        DELETE блокирует строку до коммита: если аренда истекла и сообщение захватил другой
+        процесс, второй DELETE дождется первого и не удалит ничего - обработчик не повторяется.
+        """
+        handler = HANDLERS.get(message.topic)
+        try:
+            if handler is None:
+                raise ValueError(f"No handler for topic {message.topic}")
+            async with async_session_maker() as db:
+                result = await db.execute(delete(OutboxMessage).where(OutboxMessage.id == message.id))
+                if result.rowcount == 0:
+                    OUTBOX_MESSAGES_TOTAL.labels(message.topic, "duplicate").inc()
+                    return False
+                await handler(message.payload, db)
+                await db.commit()
+        except Exception as e:
+            await OutboxService._record_failure(message, e)
+            return False
+
+        OUTBOX_MESSAGES_TOTAL.labels(message.topic, "done").inc()
+        OUTBOX_LAG_SECONDS.labels(message.topic).observe(
+            max(0.0, (datetime.utcnow() - message.created_at).total_seconds())
+        )
+        return True
+
+    @staticmethod
+    async def _record_failure(message: OutboxMessage, error: Exception):
+        failed = message.attempts >= settings.outbox_max_attempts
+        delay = min(3600.0, settings.outbox_retry_base_seconds * 2 ** (message.attempts - 1))
+        values = {"last_error": f"{type(error).__name__}: {error}"[:2000]}
+        if failed:
+            values["status"] = "failed"
+        else:
+            values["available_at"] = datetime.utcnow() + timedelta(seconds=delay)
+
+        async with async_session_maker() as db:
+            await db.execute(update(OutboxMessage).where(OutboxMessage.id == message.id).values(**values))
+            await db.commit()
+
+        OUTBOX_MESSAGES_TOTAL.labels(message.topic, "failed" if failed else "retry").inc()
+        log = logger.error if failed else logger.warning
+        log(f"Outbox message {message.id} ({message.topic}) attempt {message.attempts} failed: {values['last_error']}")
+
+    @staticmethod
+    async def dispatch_once() -> int:
+        """Обработать одну пачку; возвращает число захваченных сообщений"""
+        messages = await OutboxService.claim_batch(settings.outbox_batch_size)
+        # По порядку: обработчики одного пользователя меняют одни и те же цели
+        for message in messages:
+            await OutboxService.process(message)
+        return len(messages)
+
+    @staticmethod
+    async def update_queue_metrics():
+        async with async_session_maker() as db:
+            result = await db.execute(
+                select(
+                    func.min(OutboxMessage.created_at).filter(OutboxMessage.status == "pending"),
+                    func.count().filter(OutboxMessage.status == "failed")
+                )
+            )
+            oldest, failed = result.one()
+        OUTBOX_OLDEST_PENDING_SECONDS.set((datetime.utcnow() - oldest).total_seconds() if oldest else 0)
+        OUTBOX_FAILED_MESSAGES.set(failed)
+
+    @staticmethod
+    async def dispatch_loop():
+        """Фоновый диспетчер (запускается в lifespan)"""
+        wakeup = _wakeup_event()
+        stats_due = 0.0
+        while True:
+            # Сброс до захвата: коммит во время обработки разбудит следующую итерацию
+            wakeup.clear()
+            try:
+                if time.monotonic() >= stats_due:
+                    await OutboxService.update_queue_metrics()
+                    stats_due = time.monotonic() + STATS_INTERVAL_SECONDS
+                if await OutboxService.dispatch_once() >= settings.outbox_batch_size:
+                    # Очередь не пуста - следующая пачка сразу
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Outbox dispatch failed: {e}")
+
+            try:
+                await asyncio.wait_for(wakeup.wait(), settings.outbox_poll_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
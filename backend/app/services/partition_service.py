@@ -0,0 +1,232 @@
+"""
+Сервис обслуживания помесячных разделов coin_transactions
+"""
+import re
+import json
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.config import settings
+from app.database import engine
+from app.models import CoinBalanceSnapshot
+from app.services.change_feed_service import ChangeFeedService
+from app.services.goal_recompute_service import GoalRecomputeService
+from app.services.idempotency_service import IdempotencyService
+
+logger = logging.getLogger(__name__)
+
+PARTITIONED_TABLE = "coin_transactions"
+LEGACY_PARTITION = "coin_transactions_legacy"
+
+# Ключ advisory lock: обслуживание выполняет только одна реплика
+MAINTENANCE_LOCK_KEY = 7245020
+
+# Пользователи, удаленные во время прохода, пропускаются соединением с users
+_SNAPSHOT_SQL = text("""
+    INSERT INTO coin_balance_snapshots (user_id, balance, as_of)
+    SELECT s.user_id, s.balance, :as_of
+    FROM json_to_recordset(CAST(:balances AS json)) AS s(user_id uuid, balance integer)
+    JOIN users u ON u.id = s.user_id
+    ON CONFLICT (user_id) DO UPDATE SET balance = excluded.balance, as_of = excluded.as_of
+""")
+
+_BOUND_RE = re.compile(r"FROM \((?P<lower>[^)]*)\) TO \((?P<upper>[^)]*)\)")
+
+
+class Partition(NamedTuple):
+    name: str
+    lower: Optional[datetime]  # None - MINVALUE
+    upper: Optional[datetime]  # None - MAXVALUE
+    detach_pending: bool
+
+
+def month_start(value: datetime) -> datetime:
+    """Начало месяца (UTC, без таймзоны - как created_at)"""
+    return datetime(value.year, value.month, 1)
+
+
+def add_months(value: datetime, months: int) -> datetime:
+    """Сдвинуть начало месяца на months (может быть отрицательным)"""
+    index = value.year * 12 + value.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(start: datetime) -> str:
+    """Имя раздела за месяц: coin_transactions_p202611"""
+    return f"{PARTITIONED_TABLE}_p{start:%Y%m}"
+
+
+def _parse_bound(value: str) -> Optional[datetime]:
+    value = value.strip()
+    if value in ("MINVALUE", "MAXVALUE"):
+        return None
+    return datetime.fromisoformat(value.strip("'"))
+
+
+class PartitionService:
+
+    @staticmethod
+    async def list_partitions(conn: AsyncConnection) -> List[Partition]:
+        """Разделы coin_transactions с границами диапазонов"""
+        result = await conn.execute(text("""
+            SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), i.inhdetachpending
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = CAST(:table AS regclass)
+            ORDER BY c.relname
+        """), {"table": PARTITIONED_TABLE})
+
+        partitions = []
+        for name, bound, detach_pending in result.all():
+            match = _BOUND_RE.search(bound or "")
+            if not match:
+                continue
+            partitions.append(Partition(
+                name=name,
+                lower=_parse_bound(match.group("lower")),
+                upper=_parse_bound(match.group("upper")),
+                detach_pending=detach_pending
+            ))
+        return partitions
+
+    @staticmethod
+    async def ensure_future_partitions(conn: AsyncConnection, months_ahead: int, now: Optional[datetime] = None) -> List[str]:
+        """Создать разделы с текущего месяца на months_ahead вперед; вернуть имена созданных"""
+        partitions = await PartitionService.list_partitions(conn)
+        current = month_start(now or datetime.utcnow())
+        created = []
+
+        for offset in range(months_ahead + 1):
+            start, end = add_months(current, offset), add_months(current, offset + 1)
+
+            # Месяц уже покрыт (например, разделом legacy после миграции)
+            if any(
+                (p.lower is None or p.lower < end) and (p.upper is None or p.upper > start)
+                for p in partitions
+            ):
+                continue
+
+            name = partition_name(start)
+            await conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {PARTITIONED_TABLE} "
+                f"FOR VALUES FROM ('{start.isoformat(' ')}') TO ('{end.isoformat(' ')}')"
+            ))
+            partitions.append(Partition(name, start, end, False))
+            created.append(name)
+            logger.info(f"Created partition {name}")
+
+        return created
+
+    @staticmethod
+    async def detach_expired_partitions(
+        conn: AsyncConnection,
+        retention_months: int,
+        archive_schema: str,
+        now: Optional[datetime] = None
+    ) -> List[str]:
+        """Отсоединить разделы старше горизонта хранения и перенести их в схему архива.
+
+        DETACH ... CONCURRENTLY не блокирует запись в coin_transactions, но требует
+        соединения в режиме autocommit.
+        """
+        if retention_months <= 0:
+            return []
+
+        horizon = add_months(month_start(now or datetime.utcnow()), -retention_months)
+        detached = []
+
+        # От старых к новым: снимок баланса каждого раздела продолжает предыдущий
+        partitions = sorted(
+            (p for p in await PartitionService.list_partitions(conn) if p.upper is not None),
+            key=lambda p: p.upper
+        )
+        for partition in partitions:
+            if partition.upper > horizon:
+                continue
+
+            await PartitionService.snapshot_balances(conn, partition)
+            if partition.detach_pending:
+                # Предыдущее отсоединение было прервано - завершаем его
+                await conn.execute(text(f"ALTER TABLE {PARTITIONED_TABLE} DETACH PARTITION {partition.name} FINALIZE"))
+            else:
+                await conn.execute(text(f"ALTER TABLE {PARTITIONED_TABLE} DETACH PARTITION {partition.name} CONCURRENTLY"))
+
+            await conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {archive_schema}"))
+            await conn.execute(text(f"ALTER TABLE {partition.name} SET SCHEMA {archive_schema}"))
+            detached.append(partition.name)
+            logger.info(f"Detached partition {partition.name} into schema {archive_schema}")
+
+        return detached
+
+    @staticmethod
+    async def snapshot_balances(conn: AsyncConnection, partition: Partition) -> int:
+        """Записать балансы всех пользователей на верхнюю границу раздела перед его отсоединением.
+
+        Снимок продолжает предыдущий (граница предыдущего отсоединенного раздела) транзакциями
+        раздела; повторный вызов после прерванного прохода ничего не делает.
+        """
+        as_of = await conn.scalar(select(func.max(CoinBalanceSnapshot.as_of)))
+        if as_of is not None and as_of >= partition.upper:
+            return 0
+
+        result = await conn.execute(select(CoinBalanceSnapshot.user_id, CoinBalanceSnapshot.balance))
+        balances = dict(result.all())
+        result = await conn.execute(text(
+            f"SELECT user_id, amount, transaction_type FROM {partition.name} ORDER BY created_at, id"
+        ))
+        GoalRecomputeService.replay_transactions(balances, result)
+        if not balances:
+            return 0
+
+        # Одно выражение: в autocommit снимок записывается целиком или не записывается
+        await conn.execute(_SNAPSHOT_SQL, {
+            "as_of": partition.upper,
+            "balances": json.dumps([{"user_id": str(k), "balance": v} for k, v in balances.items()]),
+        })
+        return len(balances)
+
+    @staticmethod
+    async def run_maintenance() -> Dict:
+        """Один проход обслуживания; пропускается, если его уже выполняет другая реплика"""
+        report = {"created": [], "detached": [], "change_log_families_purged": 0, "idempotency_keys_purged": 0}
+
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            locked = await conn.scalar(text("SELECT pg_try_advisory_lock(:key)"), {"key": MAINTENANCE_LOCK_KEY})
+            if not locked:
+                return report
+
+            try:
+                # Создание раздела ненадолго блокирует таблицу - не ждем долгих транзакций
+                await conn.execute(text("SET lock_timeout = '5s'"))
+                report["created"] = await PartitionService.ensure_future_partitions(
+                    conn, settings.coin_transactions_premake_months
+                )
+                report["detached"] = await PartitionService.detach_expired_partitions(
+                    conn, settings.coin_transactions_retention_months, settings.coin_transactions_archive_schema
+                )
+                report["change_log_families_purged"] = await ChangeFeedService.purge_expired(
+                    conn, settings.change_log_retention_days
+                )
+                report["idempotency_keys_purged"] = await IdempotencyService.purge_expired(conn)
+            finally:
+                await conn.execute(text("RESET lock_timeout"))
+                await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MAINTENANCE_LOCK_KEY})
+
+        return report
+
+    @staticmethod
+    async def maintenance_loop():
+        """Периодическое обслуживание разделов (запускается в lifespan)"""
+        while True:
+            try:
+                await PartitionService.run_maintenance()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Partition maintenance failed: {e}")
+            await asyncio.sleep(settings.partition_maintenance_interval_seconds)
@@ -3,17 +3,31 @@
 """
 import uuid
 from datetime import datetime, date, timedelta
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_, func, desc
 from sqlalchemy.orm import selectinload
 
 from app.models import User, Task, TaskAssignment, CoinTransaction
+from app.utils.tracing import traced
+
+
+def _period_bounds(start_date: date, end_date: date) -> Tuple[datetime, datetime]:
+    """Полуоткрытый интервал [начало start_date, начало дня после end_date).
+
+    По такому диапазону created_at Postgres отсекает месячные разделы
+    coin_transactions, не попадающие в период.
+    """
+    return (
+        datetime.combine(start_date, datetime.min.time()),
+        datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+    )
 
 
 class StatsService:
     
     @staticmethod
+    @traced()
     async def get_family_stats(
         family_id: uuid.UUID,
         start_date: Optional[date] = None,
@@ -27,6 +41,7 @@ class StatsService:
             start_date = date.today().replace(day=1)
         if not end_date:
             end_date = date.today()
+        period_start, period_end = _period_bounds(start_date, end_date)
         
         # Получаем всех детей в семье
         result = await db.execute(
@@ -43,10 +58,8 @@ class StatsService:
             .join(Task)
             .where(and_(
                 Task.family_id == family_id,
-                TaskAssignment.created_at.between(
-                    datetime.combine(start_date, datetime.min.time()),
-                    datetime.combine(end_date, datetime.max.time())
-                )
+                TaskAssignment.created_at >= period_start,
+                TaskAssignment.created_at < period_end
             ))
         )
         assignments = result.scalars().all()
@@ -61,10 +74,8 @@ class StatsService:
             select(func.sum(CoinTransaction.amount)).where(and_(
                 CoinTransaction.user_id.in_([child.id for child in children]),
                 CoinTransaction.transaction_type == "earned",
-                CoinTransaction.created_at.between(
-                    datetime.combine(start_date, datetime.min.time()),
-                    datetime.combine(end_date, datetime.max.time())
-                )
+                CoinTransaction.created_at >= period_start,
+                CoinTransaction.created_at < period_end
             ))
         )
         total_coins_earned = result.scalar() or 0
@@ -73,10 +84,8 @@ class StatsService:
             select(func.sum(-CoinTransaction.amount)).where(and_(
                 CoinTransaction.user_id.in_([child.id for child in children]),
                 CoinTransaction.transaction_type == "spent",
-                CoinTransaction.created_at.between(
-                    datetime.combine(start_date, datetime.min.time()),
-                    datetime.combine(end_date, datetime.max.time())
-                )
+                CoinTransaction.created_at >= period_start,
+                CoinTransaction.created_at < period_end
             ))
         )
         total_coins_spent = result.scalar() or 0
@@ -93,10 +102,8 @@ class StatsService:
                 select(func.sum(CoinTransaction.amount)).where(and_(
                     CoinTransaction.user_id == child.id,
                     CoinTransaction.transaction_type == "earned",
-                    CoinTransaction.created_at.between(
-                        datetime.combine(start_date, datetime.min.time()),
-                        datetime.combine(end_date, datetime.max.time())
-                    )
+                    CoinTransaction.created_at >= period_start,
+                    CoinTransaction.created_at < period_end
                 ))
             )
             child_coins_earned = result.scalar() or 0
@@ -105,10 +112,8 @@ class StatsService:
                 select(func.sum(-CoinTransaction.amount)).where(and_(
                     CoinTransaction.user_id == child.id,
                     CoinTransaction.transaction_type == "spent",
-                    CoinTransaction.created_at.between(
-                        datetime.combine(start_date, datetime.min.time()),
-                        datetime.combine(end_date, datetime.max.time())
-                    )
+                    CoinTransaction.created_at >= period_start,
+                    CoinTransaction.created_at < period_end
                 ))
             )
             child_coins_spent = result.scalar() or 0
@@ -140,21 +145,21 @@ class StatsService:
         }
     
     @staticmethod
+    @traced()
     async def get_child_stats(child_id: uuid.UUID, db: AsyncSession) -> Dict:
         """Получить статистику ребенка"""
         
         # Текущий месяц
         start_date = date.today().replace(day=1)
         end_date = date.today()
+        period_start, period_end = _period_bounds(start_date, end_date)
         
         # Задания за месяц
         result = await db.execute(
             select(TaskAssignment).where(and_(
                 TaskAssignment.child_id == child_id,
-                TaskAssignment.created_at.between(
-                    datetime.combine(start_date, datetime.min.time()),
-                    datetime.combine(end_date, datetime.max.time())
-                )
+                TaskAssignment.created_at >= period_start,
+                TaskAssignment.created_at < period_end
             ))
         )
         assignments = list(result.scalars().all())
@@ -167,10 +172,8 @@ class StatsService:
             select(func.sum(CoinTransaction.amount)).where(and_(
                 CoinTransaction.user_id == child_id,
                 CoinTransaction.transaction_type == "earned",
-                CoinTransaction.created_at.between(
-                    datetime.combine(start_date, datetime.min.time()),
-                    datetime.combine(end_date, datetime.max.time())
-                )
+                CoinTransaction.created_at >= period_start,
+                CoinTransaction.created_at < period_end
             ))
         )
         coins_earned = result.scalar() or 0
@@ -179,10 +182,8 @@ class StatsService:
             select(func.sum(-CoinTransaction.amount)).where(and_(
                 CoinTransaction.user_id == child_id,
                 CoinTransaction.transaction_type == "spent",
-                CoinTransaction.created_at.between(
-                    datetime.combine(start_date, datetime.min.time()),
-                    datetime.combine(end_date, datetime.max.time())
-                )
+                CoinTransaction.created_at >= period_start,
+                CoinTransaction.created_at < period_end
             ))
         )
         coins_spent = result.scalar() or 0
@@ -1,21 +1,65 @@
 """
 Сервис для работы с семейным магазином
 """
+import re
+import json
 import uuid
-from typing import List, Tuple
+import base64
+from typing import List, Optional, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_
+from sqlalchemy import select, and_, text, tuple_
 from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 from fastapi import HTTPException, status
 
 from app.models import StoreItem, Purchase, User
-from app.schemas.store import StoreItemCreate, PurchaseCreate
+from app.models.store import STORE_ITEM_SEARCH_DOCUMENT
+from app.models.versioning import mark_changed
+from app.schemas.store import StoreItemCreate, StoreItemUpdate, PurchaseCreate
 from app.services.coin_service import CoinService
+from app.utils.events import emit_event
+from app.utils.metrics import PURCHASES_TOTAL
+from app.utils.tracing import traced
+
+# Сортировки каталога: колонка и направление; id - второй ключ для однозначного курсора
+CATALOG_SORTS = {
+    "name": (StoreItem.name, "asc"),
+    "price_asc": (StoreItem.price_coins, "asc"),
+    "price_desc": (StoreItem.price_coins, "desc"),
+    "popular": (StoreItem.purchase_count, "desc"),
+}
+
+# Списание остатка и счетчика периода одним выражением: условие проверяется под блокировкой
+# строки, поэтому одновременные покупки не продают больше остатка и лимита
+_RESERVE_STOCK_SQL = text("""
+    UPDATE store_items SET
+        stock_quantity = stock_quantity - 1,
+        purchase_count = purchase_count + 1,
+        period_purchases = CASE
+            WHEN purchase_limit IS NULL THEN period_purchases
+            WHEN period_started_at = date_trunc(purchase_limit_period, timezone('utc', now())) THEN period_purchases + 1
+            ELSE 1
+        END,
+        period_started_at = CASE
+            WHEN purchase_limit IS NULL THEN period_started_at
+            ELSE date_trunc(purchase_limit_period, timezone('utc', now()))
+        END
+    WHERE id = :item_id
+        AND is_available
+        AND (stock_quantity IS NULL OR stock_quantity > 0)
+        AND (
+            purchase_limit IS NULL
+            OR period_started_at IS DISTINCT FROM date_trunc(purchase_limit_period, timezone('utc', now()))
+            OR period_purchases < purchase_limit
+        )
+    RETURNING stock_quantity, period_purchases, period_started_at, purchase_count
+""")
 
 
 class StoreService:
     
     @staticmethod
+    @traced()
     async def get_store_items(family_id: uuid.UUID, db: AsyncSession) -> List[StoreItem]:
         """Получить товары в семейном магазине"""
         result = await db.execute(
@@ -29,6 +73,87 @@ class StoreService:
         return list(result.scalars().all())
     
     @staticmethod
+    @traced()
+    async def search_store_items(
+        family_id: uuid.UUID,
+        db: AsyncSession,
+        category: Optional[str] = None,
+        min_price: Optional[int] = None,
+        max_price: Optional[int] = None,
+        search: Optional[str] = None,
+        sort: str = "name",
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[StoreItem], Optional[str]]:
+        """Каталог с фильтрами, поиском и курсорной пагинацией; без limit - все товары"""
+        column, direction = CATALOG_SORTS[sort]
+        
+        query = select(StoreItem).where(
+            and_(
+                StoreItem.family_id == family_id,
+                StoreItem.is_available == True
+            )
+        )
+        if category:
+            query = query.where(StoreItem.category == category)
+        if min_price is not None:
+            query = query.where(StoreItem.price_coins >= min_price)
+        if max_price is not None:
+            query = query.where(StoreItem.price_coins <= max_price)
+        
+        # Поиск по префиксам слов названия и описания (GIN-индекс ix_store_items_search)
+        words = re.findall(r"[^\W_]+", search or "")[:10]
+        if words:
+            query = query.where(
+                text(f"{STORE_ITEM_SEARCH_DOCUMENT} @@ to_tsquery('russian', :search)").bindparams(
+                    search=" & ".join(f"{word}:*" for word in words)
+                )
+            )
+        
+        # Keyset: следующая страница начинается строго после последнего товара предыдущей
+        if cursor:
+            value, last_id = StoreService._decode_cursor(cursor, sort)
+            key = tuple_(column, StoreItem.id)
+            query = query.where(key > (value, last_id) if direction == "asc" else key < (value, last_id))
+        
+        if direction == "asc":
+            query = query.order_by(column.asc(), StoreItem.id.asc())
+        else:
+            query = query.order_by(column.desc(), StoreItem.id.desc())
+        if limit is not None:
+            query = query.limit(limit + 1)
+        
+        result = await db.execute(query)
+        items = list(result.scalars().all())
+        
+        next_cursor = None
+        if limit is not None and len(items) > limit:
+            items = items[:limit]
+            next_cursor = StoreService._encode_cursor(sort, getattr(items[-1], column.key), items[-1].id)
+        return items, next_cursor
+    
+    @staticmethod
+    def _encode_cursor(sort: str, value, item_id: uuid.UUID) -> str:
+        raw = json.dumps([sort, value, str(item_id)], ensure_ascii=False).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+    
+    @staticmethod
+    def _decode_cursor(cursor: str, sort: str):
+        """Значение сортировки и id из курсора; курсор другой сортировки - ошибка клиента"""
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            cursor_sort, value, item_id = json.loads(raw)
+            if cursor_sort != sort or not isinstance(value, str if sort == "name" else int):
+                raise ValueError("cursor does not match sort")
+            return value, uuid.UUID(item_id)
+        except (ValueError, TypeError):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+    
+    @staticmethod
+    @traced()
     async def create_store_item(
         item_data: StoreItemCreate,
         creator_id: uuid.UUID,
@@ -43,8 +168,12 @@ class StoreService:
             description=item_data.description,
             category=item_data.category,
             price_coins=item_data.price_coins,
+            stock_quantity=item_data.stock_quantity,
+            purchase_limit=item_data.purchase_limit,
+            purchase_limit_period=item_data.purchase_limit_period,
             created_by=creator_id
         )
+        StoreService._validate_limit(item)
         
         db.add(item)
         await db.commit()
@@ -53,15 +182,121 @@ class StoreService:
         return item
     
     @staticmethod
+    @traced()
+    async def update_store_item(
+        item_id: uuid.UUID,
+        item_data: StoreItemUpdate,
+        family_id: uuid.UUID,
+        db: AsyncSession
+    ) -> StoreItem:
+        """Изменить товар (только родители): цена, доступность, остаток и лимит"""
+        result = await db.execute(
+            select(StoreItem).where(
+                and_(
+                    StoreItem.id == item_id,
+                    StoreItem.family_id == family_id
+                )
+            )
+        )
+        item = result.scalar_one_or_none()
+        
+        if not item:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Store item not found"
+            )
+        
+        # Явный null снимает ограничение (остаток или лимит)
+        for field, value in item_data.model_dump(exclude_unset=True).items():
+            setattr(item, field, value)
+        StoreService._validate_limit(item)
+        
+        await db.commit()
+        await db.refresh(item)
+        
+        return item
+    
+    @staticmethod
+    def _validate_limit(item: StoreItem):
+        if (item.purchase_limit is None) != (item.purchase_limit_period is None):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="purchase_limit and purchase_limit_period must be set together"
+            )
+    
+    @staticmethod
+    @traced()
+    async def _reserve_stock(item: StoreItem, db: AsyncSession):
+        """Списать единицу остатка и лимита периода (и учесть покупку в популярности) или ответить 409"""
+        result = await db.execute(_RESERVE_STOCK_SQL, {"item_id": item.id})
+        row = result.one_or_none()
+        
+        if row is None:
+            # Условие не выполнено: перечитываем товар только для текста ошибки
+            await db.refresh(item)
+            if not item.is_available:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Store item not found or not available"
+                )
+            if item.stock_quantity is not None and item.stock_quantity <= 0:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail={
+                        "error": "out_of_stock",
+                        "message": "Товар закончился"
+                    }
+                )
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail={
+                    "error": "purchase_limit_reached",
+                    "message": "Лимит покупок этого товара на период исчерпан",
+                    "limit": item.purchase_limit,
+                    "period": item.purchase_limit_period
+                }
+            )
+        
+        # Значения из RETURNING без повторной записи; версия семьи и лента изменений - при flush
+        for attribute, value in zip(("stock_quantity", "period_purchases", "period_started_at", "purchase_count"), row):
+            set_committed_value(item, attribute, value)
+        mark_changed(db.sync_session, item)
+    
+    @staticmethod
+    @traced()
     async def purchase_item(
         purchase_data: PurchaseCreate,
         child_id: uuid.UUID,
         family_id: uuid.UUID,
         db: AsyncSession
-    ) -> Tuple[Purchase, int]:
-        """Купить товар (дети)"""
+    ) -> Tuple[Purchase, StoreItem, int]:
+        """Купить товар (дети): списание и покупка в одной транзакции"""
+        
+        # Блокировка баланса упорядочивает покупки ребенка, в том числе повторы одного запроса
+        balance = await CoinService.lock_balance(child_id, db)
         
-        # Получаем товар
+        if purchase_data.client_request_id is not None:
+            # Повтор уже выполненного запроса: второе списание не делаем и возвращаем
+            # сохраненную покупку, даже если товар с тех пор скрыт или закончился
+            result = await db.execute(
+                select(Purchase).where(
+                    and_(
+                        Purchase.child_id == child_id,
+                        Purchase.client_request_id == purchase_data.client_request_id
+                    )
+                )
+            )
+            existing = result.scalar_one_or_none()
+            if existing:
+                if existing.item_id != purchase_data.item_id:
+                    raise HTTPException(
+                        status_code=status.HTTP_409_CONFLICT,
+                        detail="client_request_id already used for another purchase"
+                    )
+                result = await db.execute(select(StoreItem).where(StoreItem.id == existing.item_id))
+                return existing, result.scalar_one(), balance.balance
+        
+        # Получаем товар (новая покупка - только доступного)
         result = await db.execute(
             select(StoreItem).where(
                 and_(
@@ -81,8 +316,8 @@ class StoreService:
         
         # Проверяем баланс и списываем коины
         try:
-            _, new_balance = await CoinService.spend_coins(
-                user_id=child_id,
+            CoinService.debit(
+                balance,
                 amount=item.price_coins,
                 description=f"Покупка: {item.name}",
                 reference_id=item.id,
@@ -91,8 +326,7 @@ class StoreService:
             )
         except HTTPException as e:
             # Переформатируем ошибку для соответствия API спецификации
-            if "insufficient_coins" in str(e.detail):
-                balance = await CoinService.get_user_balance(child_id, db)
+            if isinstance(e.detail, dict) and e.detail.get("error") == "insufficient_coins":
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail={
@@ -104,20 +338,26 @@ class StoreService:
                 )
             raise e
         
+        # Остаток и лимит периода
+        await StoreService._reserve_stock(item, db)
+        
         # Создаем покупку
         purchase = Purchase(
             child_id=child_id,
             item_id=item.id,
-            price_paid=item.price_coins
+            price_paid=item.price_coins,
+            client_request_id=purchase_data.client_request_id
         )
         
         db.add(purchase)
+        emit_event(db, "purchase.created", family_id=family_id, user_id=child_id, item_id=item.id, price_paid=item.price_coins)
         await db.commit()
-        await db.refresh(purchase)
+        PURCHASES_TOTAL.inc()
         
-        return purchase, new_balance
+        return purchase, item, balance.balance
     
     @staticmethod
+    @traced()
     async def get_child_purchases(child_id: uuid.UUID, db: AsyncSession) -> List[Purchase]:
         """Получить покупки ребенка"""
         result = await db.execute(
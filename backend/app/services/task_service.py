@@ -12,17 +12,23 @@ from fastapi import HTTPException, status
 from app.models import Task, TaskTemplate, TaskAssignment, User
 from app.schemas.task import TaskCreate, TaskAssignmentComplete, TaskAssignmentApprove
 from app.services.coin_service import CoinService
+from app.services.outbox_service import OutboxService
+from app.utils.events import emit_event
+from app.utils.metrics import TASKS_REVIEWED_TOTAL
+from app.utils.tracing import traced
 
 
 class TaskService:
     
     @staticmethod
+    @traced()
     async def get_task_templates(db: AsyncSession) -> List[TaskTemplate]:
         """Получить все шаблоны заданий"""
         result = await db.execute(select(TaskTemplate).where(TaskTemplate.is_system_template == True))
         return list(result.scalars().all())
     
     @staticmethod
+    @traced()
     async def create_task(
         task_data: TaskCreate,
         creator_id: uuid.UUID,
@@ -89,6 +95,7 @@ class TaskService:
             )
             db.add(assignment)
             assignments.append(assignment)
+        emit_event(db, "task.created", family_id=family_id, task_id=task.id, assigned_to=task_data.assigned_to)
         
         await db.commit()
         await db.refresh(task)
@@ -100,6 +107,7 @@ class TaskService:
         return task, assignments
     
     @staticmethod
+    @traced()
     async def get_child_tasks(child_id: uuid.UUID, db: AsyncSession) -> List[TaskAssignment]:
         """Получить задания ребенка"""
         result = await db.execute(
@@ -111,6 +119,7 @@ class TaskService:
         return list(result.scalars().all())
     
     @staticmethod
+    @traced()
     async def get_parent_tasks(parent_id: uuid.UUID, family_id: uuid.UUID, db: AsyncSession) -> Tuple[List[Task], List[dict]]:
         """Получить задания родителя"""
         
@@ -154,6 +163,7 @@ class TaskService:
         return created_tasks, pending_approvals
     
     @staticmethod
+    @traced()
     async def complete_task(
         assignment_id: uuid.UUID,
         completion_data: TaskAssignmentComplete,
@@ -185,6 +195,7 @@ class TaskService:
         assignment.completed_at = datetime.utcnow()
         assignment.proof_text = completion_data.proof_text
         assignment.proof_image_url = completion_data.proof_image_url
+        emit_event(db, "task.completed", user_id=child_id, assignment_id=assignment.id, task_id=assignment.task_id)
         
         await db.commit()
         await db.refresh(assignment)
@@ -192,6 +203,7 @@ class TaskService:
         return assignment
     
     @staticmethod
+    @traced()
     async def approve_task(
         assignment_id: uuid.UUID,
         approval_data: TaskAssignmentApprove,
@@ -224,9 +236,10 @@ class TaskService:
             assignment.approved_by = approver_id
             assignment.coins_earned = assignment.task.reward_coins
             
-            # Начисляем коины ребенку
-            _, new_balance = await CoinService.add_coins(
-                user_id=assignment.child_id,
+            # Начисляем коины ребенку в той же транзакции, что и одобрение
+            balance = await CoinService.lock_balance(assignment.child_id, db)
+            CoinService.credit(
+                balance,
                 amount=assignment.task.reward_coins,
                 description=f"Выполнение задания: {assignment.task.title}",
                 transaction_type="earned",
@@ -234,35 +247,29 @@ class TaskService:
                 reference_type="task",
                 db=db
             )
+            new_balance = balance.balance
         else:
             # Отклоняем
             assignment.status = "rejected"
             assignment.approved_at = datetime.utcnow()
             assignment.approved_by = approver_id
             new_balance = 0  # Не начисляем коины
+        emit_event(
+            db, "task.reviewed",
+            user_id=assignment.child_id, assignment_id=assignment.id, status=assignment.status
+        )
+        if approval_data.approved:
+            # Прогресс целей обновит фоновый обработчик после коммита
+            OutboxService.enqueue(db, "goals.task_approved", child_id=assignment.child_id, assignment_id=assignment.id)
         
         await db.commit()
+        TASKS_REVIEWED_TOTAL.labels(assignment.status).inc()
         await db.refresh(assignment)
         
-        # Обновляем прогресс целей при одобрении задания
-        if approval_data.approved:
-            try:
-                from app.services.goal_service import GoalService
-                await GoalService.update_goal_progress_on_task_completion(
-                    child_id=assignment.child_id,
-                    task_assignment_id=assignment.id,
-                    db=db
-                )
-            except ImportError:
-                # Игнорируем если модуль целей недоступен
-                pass
-            except Exception:
-                # Не прерываем основную операцию при ошибке обновления целей
-                pass
-        
         return assignment, new_balance
     
     @staticmethod
+    @traced()
     async def get_parent_task_statistics(parent_id: uuid.UUID, family_id: uuid.UUID, db: AsyncSession) -> dict:
         """Получить статистику заданий для родителя"""
         
@@ -321,6 +328,7 @@ class TaskService:
         return stats
     
     @staticmethod
+    @traced()
     async def get_parent_task_history(
         parent_id: uuid.UUID, 
         family_id: uuid.UUID, 
@@ -0,0 +1,42 @@
+"""
+Одноразовая подготовка перед обслуживанием запросов: проверка cost bcrypt и миграции схемы.
+
+Под uvicorn выполняется в lifespan. Под gunicorn (preload_app) - один раз в мастер-процессе
+до запуска воркеров: воркеры наследуют результат при fork и не повторяют проверку схемы и DDL.
+"""
+import asyncio
+
+from app.config import settings
+from app.database import engine
+from app.migrations import ensure_database_schema
+from app.utils.auth import advise_bcrypt_rounds, calibrate_password_hashing
+
+_prepared_before_fork = False
+
+
+def is_prepared_before_fork() -> bool:
+    return _prepared_before_fork
+
+
+async def prepare_process():
+    """Подготовка в процессе, который сам обслуживает запросы (uvicorn, воркер без preload)"""
+    await calibrate_password_hashing()
+    await ensure_database_schema()
+
+
+def prepare_before_fork():
+    """Подготовка в мастер-процессе gunicorn; соединения с базой закрываются до fork"""
+    global _prepared_before_fork
+
+    # Без пула потоков хеширования: потоки не переживают fork
+    if settings.bcrypt_target_ms > 0:
+        advise_bcrypt_rounds()
+
+    async def migrate():
+        try:
+            await ensure_database_schema()
+        finally:
+            await engine.dispose()
+
+    asyncio.run(migrate())
+    _prepared_before_fork = True
@@ -2,7 +2,12 @@
 Утилиты для аутентификации и работы с JWT токенами
 """
 import os
+import math
+import time
+import asyncio
+import logging
 import secrets
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
@@ -10,6 +15,11 @@ from passlib.context import CryptContext
 from fastapi import HTTPException, status
 from dotenv import load_dotenv
 
+from app.config import settings
+from app.utils.metrics import PASSWORD_HASH_QUEUE_DEPTH, PASSWORD_HASH_WAIT_SECONDS, PASSWORD_HASH_SECONDS
+
+logger = logging.getLogger(__name__)
+
 load_dotenv()
 
 # Настройки JWT
@@ -17,8 +27,29 @@ JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "fallback_secret_key_change_in_prod
 JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "1440"))
 
-# Контекст для хеширования паролей (в данном случае - пасскодов)
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Назначение токена потока событий (claim purpose); обычные токены назначения не имеют
+STREAM_TOKEN_PURPOSE = "stream"
+
+# Границы рекомендуемого cost-фактора bcrypt
+BCRYPT_MIN_ROUNDS = 10
+BCRYPT_MAX_ROUNDS = 16
+
+# Контекст для хеширования паролей (в данном случае - пасскодов).
+# Cost задается настройкой и одинаков на всех репликах; min совпадает с default, поэтому
+# needs_update() отмечает только хеши слабее текущего, а более стойкие не пересчитываются.
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.bcrypt_rounds,
+    bcrypt__min_rounds=settings.bcrypt_rounds,
+)
+
+# Отдельный ограниченный пул потоков для bcrypt, чтобы не блокировать event loop
+_hash_executor = ThreadPoolExecutor(
+    max_workers=settings.password_hash_workers,
+    thread_name_prefix="password-hash"
+)
+_pending_hash_operations = 0
 
 
 def generate_passcode() -> str:
@@ -46,6 +77,88 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+def password_needs_rehash(hashed_password: str) -> bool:
+    """Проверяет, ниже ли cost сохраненного хеша настроенного BCRYPT_ROUNDS"""
+    return pwd_context.needs_update(hashed_password)
+
+
+def calibrate_bcrypt_rounds(target_ms: int) -> int:
+    """Оценивает cost-фактор bcrypt под целевое время хеширования на этой машине"""
+    probe = CryptContext(schemes=["bcrypt"], bcrypt__default_rounds=BCRYPT_MIN_ROUNDS)
+    started = time.perf_counter()
+    probe.hash(secrets.token_hex(8))
+    elapsed_ms = max((time.perf_counter() - started) * 1000, 0.001)
+
+    # Каждый следующий раунд удваивает время хеширования
+    rounds = BCRYPT_MIN_ROUNDS
+    if target_ms > elapsed_ms:
+        rounds += int(math.floor(math.log2(target_ms / elapsed_ms)))
+    return max(BCRYPT_MIN_ROUNDS, min(BCRYPT_MAX_ROUNDS, rounds))
+
+
+async def _run_in_hash_pool(operation: str, func, *args):
+    """Выполняет операцию bcrypt в выделенном пуле потоков"""
+    global _pending_hash_operations
+
+    if _pending_hash_operations >= settings.password_hash_max_queue:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please retry later",
+            headers={"Retry-After": "1"},
+        )
+
+    submitted_at = time.perf_counter()
+
+    def job():
+        PASSWORD_HASH_QUEUE_DEPTH.dec()
+        started_at = time.perf_counter()
+        PASSWORD_HASH_WAIT_SECONDS.observe(started_at - submitted_at)
+        try:
+            return func(*args)
+        finally:
+            PASSWORD_HASH_SECONDS.labels(operation).observe(time.perf_counter() - started_at)
+
+    _pending_hash_operations += 1
+    PASSWORD_HASH_QUEUE_DEPTH.inc()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_hash_executor, job)
+    finally:
+        _pending_hash_operations -= 1
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Проверяет пароль пользователя, не блокируя event loop"""
+    return await _run_in_hash_pool("verify_password", verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Хеширует пароль пользователя, не блокируя event loop"""
+    return await _run_in_hash_pool("hash_password", get_password_hash, password)
+
+
+def advise_bcrypt_rounds():
+    """Сравнивает BCRYPT_ROUNDS с оценкой под BCRYPT_TARGET_MS и только сообщает о расхождении.
+
+    Cost не меняется: на разных машинах оценка разная, и реплики с разным cost пересчитывали бы
+    хеши друг друга при каждом входе.
+    """
+    rounds = calibrate_bcrypt_rounds(settings.bcrypt_target_ms)
+    if rounds != settings.bcrypt_rounds:
+        logger.warning(
+            f"BCRYPT_ROUNDS={settings.bcrypt_rounds}, but {rounds} rounds match "
+            f"BCRYPT_TARGET_MS={settings.bcrypt_target_ms} on this machine"
+        )
+    else:
+        logger.info(f"BCRYPT_ROUNDS={rounds} matches BCRYPT_TARGET_MS={settings.bcrypt_target_ms}")
+
+
+async def calibrate_password_hashing():
+    """Проверяет cost-фактор bcrypt при старте, если задано целевое время"""
+    if settings.bcrypt_target_ms <= 0:
+        return
+    await asyncio.get_running_loop().run_in_executor(_hash_executor, advise_bcrypt_rounds)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Создает JWT токен"""
     to_encode = data.copy()
@@ -59,14 +172,49 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
-def verify_token(token: str) -> dict:
-    """Проверяет и декодирует JWT токен"""
+def create_stream_token(user) -> str:
+    """Короткий токен только для подключения к GET /v1/events: он передается в строке запроса
+    (EventSource не умеет заголовки) и может попасть в логи прокси"""
+    return create_access_token(data={
+        "sub": str(user.id),
+        "fid": str(user.family_id),
+        "role": user.role,
+        "purpose": STREAM_TOKEN_PURPOSE
+    }, expires_delta=timedelta(seconds=settings.events_token_ttl_seconds))
+
+
+def create_user_access_token(user) -> str:
+    """Создает JWT токен с claims пользователя (id, семья, роль)"""
+    return create_access_token(data={
+        "sub": str(user.id),
+        "fid": str(user.family_id),
+        "role": user.role
+    })
+
+
+def get_token_subject(authorization: Optional[str]) -> Optional[str]:
+    """Возвращает sub из заголовка Authorization или None, не выбрасывая ошибок"""
+    if not authorization or not authorization.lower().startswith("bearer "):
+        return None
+    try:
+        payload = jwt.decode(authorization[7:].strip(), JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
+    except JWTError:
+        return None
+    if payload.get("purpose") is not None:
+        return None
+    return payload.get("sub")
+
+
+def verify_token(token: str, purpose: Optional[str] = None) -> dict:
+    """Проверяет и декодирует JWT токен; токен с назначением (purpose) годится только для него"""
     try:
         payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
-        return payload
     except JWTError:
+        payload = None
+    if payload is None or payload.get("purpose") != purpose:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
-        )
\ No newline at end of file
+        )
+    return payload
\ No newline at end of file
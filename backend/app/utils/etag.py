@@ -0,0 +1,50 @@
+"""
+Условные GET: слабый ETag по версии данных семьи (families.data_version)
+"""
+import hashlib
+from datetime import datetime
+
+from fastapi import Depends, HTTPException, Request, Response, status
+from sqlalchemy import select
+
+from app.database import read_session_maker
+from app.models import Family
+from app.utils.permissions import CurrentUser, get_current_claims
+
+# Ответ кэшируется только браузером пользователя и всегда перепроверяется
+CACHE_CONTROL = "private, no-cache"
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Слабое сравнение (RFC 9110): W/ не учитывается"""
+    if if_none_match.strip() == "*":
+        return True
+    tags = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag.removeprefix("W/") for tag in tags)
+
+
+async def family_etag(
+    request: Request,
+    response: Response,
+    current_user: CurrentUser = Depends(get_current_claims)
+):
+    """Зависимость для GET: 304 до бизнес-запросов, если данные семьи не менялись.
+
+    Версия читается там же, откуда эндпоинт читает данные (реплика или основная база):
+    отставшая версия при свежих данных безопасна, обратное - нет.
+    В ETag входят пользователь, адрес запроса и текущая дата (окна статистики по дням).
+    """
+    async with read_session_maker(request)() as db:
+        version = await db.scalar(select(Family.data_version).where(Family.id == current_user.family_id))
+    if version is None:
+        return
+
+    scope = f"{current_user.id}:{request.url.path}?{request.url.query}:{datetime.utcnow().date()}"
+    etag = f'W/"{version}-{hashlib.sha256(scope.encode()).hexdigest()[:16]}"'
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL, "Vary": "Authorization"}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    response.headers.update(headers)
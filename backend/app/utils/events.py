@@ -0,0 +1,193 @@
+"""
+События семьи в реальном времени: сервисы ставят доменные события в очередь сессии,
+при коммите они уходят в Postgres NOTIFY, а каждый процесс через LISTEN раздает их
+своим подключениям (GET /v1/events, Server-Sent Events).
+
+NOTIFY транзакционный: событие доставляется только после коммита и пропадает при откате.
+"""
+import json
+import uuid
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional, Set, Tuple
+
+import asyncpg
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.utils.metrics import EVENT_STREAM_CONNECTIONS, EVENTS_DELIVERED_TOTAL, EVENT_STREAM_OVERFLOWS_TOTAL
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "family_events"
+
+# События текущей транзакции сессии
+_PENDING_KEY = "pending_family_events"
+
+# Семья события - явная или семья пользователя; одно выражение на весь коммит
+_NOTIFY_SQL = text("""
+    SELECT pg_notify(:channel, json_build_object(
+        'family_id', coalesce(e.family_id, u.family_id),
+        'type', e.type,
+        'data', e.data
+    )::text)
+    FROM json_to_recordset(CAST(:events AS json)) AS e(family_id uuid, user_id uuid, type text, data json)
+    LEFT JOIN users u ON u.id = e.user_id
+""")
+
+
+def emit_event(
+    db,
+    event_type: str,
+    family_id: Optional[uuid.UUID] = None,
+    user_id: Optional[uuid.UUID] = None,
+    **data
+):
+    """Поставить событие в очередь; отправляется при коммите сессии (семья - по family_id или user_id)"""
+    if not settings.events_enabled:
+        return
+    if user_id is not None:
+        data["user_id"] = user_id
+    db.info.setdefault(_PENDING_KEY, []).append({
+        "family_id": family_id,
+        "user_id": user_id,
+        "type": event_type,
+        "data": data,
+    })
+
+
+@event.listens_for(Session, "before_commit")
+def _notify_pending_events(session: Session):
+    events = session.info.pop(_PENDING_KEY, None)
+    if events:
+        session.connection().execute(_NOTIFY_SQL, {
+            "channel": CHANNEL,
+            "events": json.dumps(events, default=str, ensure_ascii=False),
+        })
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _discard_pending_events(session: Session, transaction):
+    # После отката события не отправляются
+    if transaction.parent is None:
+        session.info.pop(_PENDING_KEY, None)
+
+
+@dataclass(eq=False)
+class Subscription:
+    """Подключение клиента: ограниченная очередь событий его семьи"""
+    family_id: str
+    queue: asyncio.Queue = field(default_factory=lambda: asyncio.Queue(maxsize=max(1, settings.events_queue_size)))
+    # Клиент не успевал читать и был отключен
+    overflowed: bool = False
+
+
+class FamilyEventBroker:
+    """Подписки процесса и одно LISTEN-соединение с базой"""
+
+    def __init__(self):
+        self._subscriptions: Dict[str, Set[Subscription]] = {}
+        self._connection: Optional[asyncpg.Connection] = None
+        # Служебные каналы того же соединения: канал -> (обработчик payload, смена состояния LISTEN)
+        self._channels: Dict[str, Tuple[Callable[[str], None], Callable[[bool], None]]] = {}
+
+    def listen(self, channel: str, callback: Callable[[str], None], on_state: Callable[[bool], None]):
+        """Слушать служебный канал. on_state(True) - LISTEN установлен, on_state(False) -
+        соединение потеряно и уведомления канала могут пропадать"""
+        self._channels[channel] = (callback, on_state)
+
+    def subscribe(self, family_id: uuid.UUID) -> Subscription:
+        subscription = Subscription(family_id=str(family_id))
+        self._subscriptions.setdefault(subscription.family_id, set()).add(subscription)
+        EVENT_STREAM_CONNECTIONS.inc()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        family = self._subscriptions.get(subscription.family_id)
+        if family is None or subscription not in family:
+            return
+        family.discard(subscription)
+        if not family:
+            del self._subscriptions[subscription.family_id]
+        EVENT_STREAM_CONNECTIONS.dec()
+
+    def publish_local(self, family_id: str, message: Dict):
+        """Раздать событие подписчикам семьи в этом процессе"""
+        for subscription in list(self._subscriptions.get(family_id, ())):
+            try:
+                subscription.queue.put_nowait(message)
+                EVENTS_DELIVERED_TOTAL.inc()
+            except asyncio.QueueFull:
+                # Медленный клиент не задерживает остальных: отключаем его,
+                # после переподключения он перечитает дашборд
+                subscription.overflowed = True
+                self.unsubscribe(subscription)
+                EVENT_STREAM_OVERFLOWS_TOTAL.inc()
+
+    def _broadcast(self, message: Dict):
+        for family_id in list(self._subscriptions):
+            self.publish_local(family_id, message)
+
+    def _on_notify(self, connection, pid, channel, payload):
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            logger.warning(f"Malformed event payload: {payload[:200]}")
+            return
+        family_id = message.pop("family_id", None)
+        if family_id:
+            self.publish_local(family_id, message)
+
+    async def run(self):
+        """LISTEN с переподключением; после разрыва клиенты получают resync"""
+        delay = 1
+        while True:
+            try:
+                self._connection = await asyncpg.connect(listen_dsn())
+                lost = asyncio.Event()
+                self._connection.add_termination_listener(lambda connection: lost.set())
+                await self._connection.add_listener(CHANNEL, self._on_notify)
+                for channel, (callback, on_state) in self._channels.items():
+                    await self._connection.add_listener(
+                        channel, lambda connection, pid, channel, payload, callback=callback: callback(payload)
+                    )
+                    on_state(True)
+                logger.info(f"Listening for family events on channel {CHANNEL}")
+                if delay > 1:
+                    # Пока соединения не было, события могли потеряться
+                    self._broadcast({"type": "resync", "data": {}})
+                delay = 1
+                await lost.wait()
+                logger.warning("Event listener connection lost, reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Event listener failed: {e}; retry in {delay}s")
+            finally:
+                for _, on_state in self._channels.values():
+                    on_state(False)
+                if self._connection is not None and not self._connection.is_closed():
+                    await self._connection.close()
+                self._connection = None
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30)
+
+
+def listen_dsn() -> str:
+    """DSN для asyncpg: отдельный URL (pgbouncer в transaction mode не поддерживает LISTEN) или основная база"""
+    url = settings.events_database_url or settings.database_url
+    for prefix in ("postgresql+asyncpg://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql://" + url[len(prefix):]
+    return url
+
+
+def format_sse(message: Dict) -> str:
+    """Событие в формате text/event-stream"""
+    payload = json.dumps(message["data"], default=str, ensure_ascii=False)
+    return f"event: {message['type']}\ndata: {payload}\n\n"
+
+
+broker = FamilyEventBroker()
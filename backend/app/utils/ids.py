@@ -0,0 +1,52 @@
+"""
+Упорядоченные по времени UUID (UUIDv7, RFC 9562) для таблиц с интенсивной вставкой
+"""
+import os
+import threading
+import time
+import uuid
+
+_lock = threading.Lock()
+_last_timestamp_ms = 0
+_counter = 0
+
+# 12 бит rand_a используются как счетчик внутри одной миллисекунды
+_COUNTER_MAX = 0xFFF
+
+
+def uuid7() -> uuid.UUID:
+    """Сгенерировать UUIDv7: 48 бит unix-времени в мс, затем счетчик и случайные биты.
+
+    Значения монотонно растут внутри процесса, поэтому новые строки попадают
+    в правый край B-tree индекса, а не в случайные страницы. Тип остается
+    обычным uuid.UUID и подходит для существующих колонок UUID.
+    """
+    global _last_timestamp_ms, _counter
+
+    with _lock:
+        timestamp_ms = time.time_ns() // 1_000_000
+        if timestamp_ms > _last_timestamp_ms:
+            _last_timestamp_ms = timestamp_ms
+            _counter = int.from_bytes(os.urandom(2), "big") & 0x7FF  # оставляем запас под инкременты
+        else:
+            # Часы не сдвинулись (или пошли назад) - продолжаем последовательность
+            _counter += 1
+            if _counter > _COUNTER_MAX:
+                _last_timestamp_ms += 1
+                _counter = 0
+            timestamp_ms = _last_timestamp_ms
+        counter = _counter
+
+    rand_b = int.from_bytes(os.urandom(8), "big") & 0x3FFFFFFFFFFFFFFF
+
+    value = (timestamp_ms & 0xFFFFFFFFFFFF) << 80
+    value |= 0x7 << 76          # версия 7
+    value |= counter << 64
+    value |= 0x2 << 62          # вариант RFC 4122/9562
+    value |= rand_b
+    return uuid.UUID(int=value)
+
+
+def uuid7_timestamp_ms(value: uuid.UUID) -> int:
+    """Время создания (unix, мс), закодированное в UUIDv7"""
+    return value.int >> 80
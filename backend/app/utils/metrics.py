@@ -0,0 +1,141 @@
+"""
+Метрики приложения в формате Prometheus
+"""
+import os
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, disable_created_metrics
+from prometheus_client.multiprocess import MultiProcessCollector
+
+# Под gunicorn каждый воркер пишет метрики в общий каталог (см. gunicorn.conf.py);
+# gauge-метрики суммируются по живым процессам (multiprocess_mode="livesum")
+MULTIPROCESS = "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+# Ряды *_created не нужны дашбордам и удваивают объем ответа /metrics
+disable_created_metrics()
+
+# HTTP-запросы (route - шаблон пути, например /v1/goals/{goal_id})
+HTTP_REQUESTS_TOTAL = Counter(
+    "familycoins_http_requests_total",
+    "Обработанные HTTP-запросы",
+    ["method", "route", "status"]
+)
+HTTP_REQUEST_DURATION_SECONDS = Histogram(
+    "familycoins_http_request_duration_seconds",
+    "Время обработки HTTP-запроса",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "familycoins_http_requests_in_progress",
+    "HTTP-запросы в обработке",
+    ["method"],
+    multiprocess_mode="livesum"
+)
+
+# Бизнес-события
+COINS_CREDITED_TOTAL = Counter(
+    "familycoins_coins_credited_total",
+    "Начисленные коины",
+    ["transaction_type"]
+)
+COINS_DEBITED_TOTAL = Counter(
+    "familycoins_coins_debited_total",
+    "Списанные коины",
+    ["transaction_type"]
+)
+TASKS_REVIEWED_TOTAL = Counter(
+    "familycoins_tasks_reviewed_total",
+    "Проверенные родителями задания",
+    ["decision"]
+)
+PURCHASES_TOTAL = Counter(
+    "familycoins_purchases_total",
+    "Покупки в семейном магазине"
+)
+
+# События в реальном времени (GET /v1/events)
+EVENT_STREAM_CONNECTIONS = Gauge(
+    "familycoins_event_stream_connections",
+    "Открытые подключения к потоку событий",
+    multiprocess_mode="livesum"
+)
+EVENTS_DELIVERED_TOTAL = Counter(
+    "familycoins_events_delivered_total",
+    "События, поставленные в очереди подключений"
+)
+EVENT_STREAM_OVERFLOWS_TOTAL = Counter(
+    "familycoins_event_stream_overflows_total",
+    "Подключения, отключенные из-за переполнения очереди (медленный клиент)"
+)
+
+# Transactional outbox (побочные действия после коммита)
+OUTBOX_MESSAGES_TOTAL = Counter(
+    "familycoins_outbox_messages_total",
+    "Обработанные сообщения outbox",
+    ["topic", "result"]  # done, retry, failed, duplicate
+)
+OUTBOX_LAG_SECONDS = Histogram(
+    "familycoins_outbox_lag_seconds",
+    "Время от записи сообщения до успешной обработки",
+    ["topic"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 3600.0)
+)
+OUTBOX_OLDEST_PENDING_SECONDS = Gauge(
+    "familycoins_outbox_oldest_pending_seconds",
+    "Возраст самого старого необработанного сообщения",
+    multiprocess_mode="max"
+)
+OUTBOX_FAILED_MESSAGES = Gauge(
+    "familycoins_outbox_failed_messages",
+    "Сообщения, исчерпавшие попытки",
+    multiprocess_mode="max"
+)
+
+# Idempotency-Key
+IDEMPOTENT_REQUESTS_TOTAL = Counter(
+    "familycoins_idempotent_requests_total",
+    "Изменяющие запросы с Idempotency-Key",
+    ["result"]  # executed, replayed, in_progress, mismatch
+)
+
+# Хеширование паролей
+PASSWORD_HASH_QUEUE_DEPTH = Gauge(
+    "familycoins_password_hash_queue_depth",
+    "Операции bcrypt, ожидающие свободного потока",
+    multiprocess_mode="livesum"
+)
+PASSWORD_HASH_WAIT_SECONDS = Histogram(
+    "familycoins_password_hash_wait_seconds",
+    "Время ожидания операции bcrypt в очереди пула",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+PASSWORD_HASH_SECONDS = Histogram(
+    "familycoins_password_hash_seconds",
+    "Длительность операции bcrypt в потоке пула",
+    ["operation"],
+    buckets=(0.01, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0)
+)
+
+# Пул соединений с базой данных
+DB_POOL_CHECKOUT_WAIT_SECONDS = Histogram(
+    "familycoins_db_pool_checkout_wait_seconds",
+    "Время ожидания соединения из пула",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    "familycoins_db_queries_per_request",
+    "Число SQL-выражений на один HTTP-запрос",
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+)
+DB_POOL_SIZE = Gauge("familycoins_db_pool_size", "Размер пула соединений", ["pool"], multiprocess_mode="livesum")
+DB_POOL_IN_USE = Gauge("familycoins_db_pool_in_use", "Соединения, выданные из пула", ["pool"], multiprocess_mode="livesum")
+DB_POOL_IDLE = Gauge("familycoins_db_pool_idle", "Свободные соединения в пуле", ["pool"], multiprocess_mode="livesum")
+DB_POOL_OVERFLOW = Gauge("familycoins_db_pool_overflow", "Соединения сверх pool_size", ["pool"], multiprocess_mode="livesum")
+
+
+def metrics_registry():
+    """Реестр для /metrics: в режиме нескольких процессов - сводка по всем воркерам"""
+    if not MULTIPROCESS:
+        return REGISTRY
+    registry = CollectorRegistry()
+    MultiProcessCollector(registry)
+    return registry
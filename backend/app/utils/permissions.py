@@ -2,47 +2,120 @@
 Утилиты для проверки прав доступа
 """
 import uuid
+from dataclasses import dataclass
 from typing import Optional
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
 
-from app.database import get_async_session
-from app.models import User
-from app.utils.auth import verify_token
+from app.database import async_session_maker, get_async_session
+from app.utils.auth import STREAM_TOKEN_PURPOSE, verify_token
+from app.utils.rate_limit import is_internal_client
+from app.utils.user_cache import user_cache
 
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 
+# Ключ scope["state"]: пользователь, уже проверенный пакетным запросом (POST /v1/batch);
+# клиент записать в state ничего не может
+RESOLVED_USER_STATE = "current_user"
 
-async def get_current_user(
+
+@dataclass(frozen=True)
+class CurrentUser:
+    """Пользователь из claims токена: достаточно для большинства эндпоинтов"""
+    id: uuid.UUID
+    family_id: uuid.UUID
+    role: str
+
+
+def _claims_from_payload(payload: dict) -> Optional[CurrentUser]:
+    """Собрать пользователя из claims токена, если они есть"""
+    try:
+        return CurrentUser(
+            id=uuid.UUID(payload["sub"]),
+            family_id=uuid.UUID(payload["fid"]),
+            role=payload["role"]
+        )
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _user_id_from_payload(payload: dict) -> uuid.UUID:
+    user_id = payload.get("sub")
+    try:
+        return uuid.UUID(user_id)
+    except (TypeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials"
+        )
+
+
+def resolved_user(request: Request) -> Optional[CurrentUser]:
+    """Пользователь подзапроса пакета: токен проверен один раз для всего пакета"""
+    return getattr(request.state, RESOLVED_USER_STATE, None)
+
+
+async def get_current_claims(
+    request: Request,
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: AsyncSession = Depends(get_async_session)
-) -> User:
-    """Получить текущего пользователя из токена"""
+) -> CurrentUser:
+    """Получить текущего пользователя из claims токена без запроса к базе"""
+    resolved = resolved_user(request)
+    if resolved is not None:
+        return resolved
+
     payload = verify_token(credentials.credentials)
-    user_id: str = payload.get("sub")
-    
-    if user_id is None:
+    claims = _claims_from_payload(payload)
+    if claims is not None:
+        return claims
+
+    # Старые токены содержат только sub - берем пользователя из кэша
+    user = await user_cache.get(_user_id_from_payload(payload), db)
+    if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials"
+            detail="User not found"
         )
-    
-    # Получаем пользователя из базы данных
-    result = await db.execute(select(User).where(User.id == uuid.UUID(user_id)))
-    user = result.scalar_one_or_none()
-    
+    return CurrentUser(id=user.id, family_id=user.family_id, role=user.role)
+
+
+async def get_stream_claims(
+    token: Optional[str] = Query(None),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)
+) -> CurrentUser:
+    """Пользователь долгого соединения (SSE): обычный токен из заголовка или ?token= - короткий
+    токен потока из POST /v1/events/token (EventSource не передает заголовки, а строка запроса
+    попадает в логи, поэтому долгоживущий токен в ней не принимается).
+
+    Сессия открывается только на время проверки, чтобы не держать соединение пула весь поток.
+    """
+    if credentials:
+        payload = verify_token(credentials.credentials)
+    elif token:
+        payload = verify_token(token, purpose=STREAM_TOKEN_PURPOSE)
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated"
+        )
+    claims = _claims_from_payload(payload)
+    if claims is not None:
+        return claims
+
+    async with async_session_maker() as db:
+        user = await user_cache.get(_user_id_from_payload(payload), db)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found"
         )
-    
-    return user
+    return CurrentUser(id=user.id, family_id=user.family_id, role=user.role)
 
 
-async def require_parent(current_user: User = Depends(get_current_user)) -> User:
+async def require_parent(current_user: CurrentUser = Depends(get_current_claims)) -> CurrentUser:
     """Требует, чтобы пользователь был родителем"""
     if current_user.role != "parent":
         raise HTTPException(
@@ -52,7 +125,7 @@ async def require_parent(current_user: User = Depends(get_current_user)) -> User
     return current_user
 
 
-async def require_child(current_user: User = Depends(get_current_user)) -> User:
+async def require_child(current_user: CurrentUser = Depends(get_current_claims)) -> CurrentUser:
     """Требует, чтобы пользователь был ребенком"""
     if current_user.role != "child":
         raise HTTPException(
@@ -64,8 +137,8 @@ async def require_child(current_user: User = Depends(get_current_user)) -> User:
 
 async def require_family_member(
     family_id: uuid.UUID,
-    current_user: User = Depends(get_current_user)
-) -> User:
+    current_user: CurrentUser = Depends(get_current_claims)
+) -> CurrentUser:
     """Требует, чтобы пользователь был членом указанной семьи"""
     if current_user.family_id != family_id:
         raise HTTPException(
@@ -77,23 +150,32 @@ async def require_family_member(
 
 async def require_child_or_parent_of_child(
     child_id: uuid.UUID,
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_claims),
     db: AsyncSession = Depends(get_async_session)
-) -> User:
+) -> CurrentUser:
     """Требует, чтобы пользователь был указанным ребенком или родителем в той же семье"""
     if current_user.id == child_id:
         # Пользователь - это сам ребенок
         return current_user
-    
+
     if current_user.role == "parent":
-        # Проверяем, что ребенок в той же семье
-        result = await db.execute(select(User).where(User.id == child_id))
-        child = result.scalar_one_or_none()
-        
-        if child and child.family_id == current_user.family_id:
+        # Проверяем, что ребенок в той же семье (через кэш пользователей)
+        child_family_id = await user_cache.get_family_id(child_id, db)
+
+        if child_family_id == current_user.family_id:
             return current_user
-    
+
     raise HTTPException(
         status_code=status.HTTP_403_FORBIDDEN,
         detail="Access denied: not authorized for this child"
-    )
\ No newline at end of file
+    )
+
+
+async def require_internal_network(request: Request):
+    """Служебные эндпоинты: доступны только из INTERNAL_NETWORKS в любом окружении
+    (ENVIRONMENT по умолчанию development, поэтому от него проверка не зависит)"""
+    if not is_internal_client(request):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Forbidden"
+        )
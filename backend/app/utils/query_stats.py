@@ -0,0 +1,86 @@
+"""
+Счетчик SQL-запросов на HTTP-запрос и детектор повторяющихся выражений (N+1)
+"""
+import time
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Callable, Optional, Tuple
+from sqlalchemy import event
+
+from app.utils.metrics import DB_QUERIES_PER_REQUEST
+from app.utils.slow_queries import normalize_sql, record_statement
+from app.utils.tracing import get_current_trace, record_span
+
+
+@dataclass
+class QueryStats:
+    """SQL-статистика одного HTTP-запроса"""
+    count: int = 0
+    total_seconds: float = 0.0
+    # Форма выражения (SQL с плейсхолдерами) -> сколько раз выполнено
+    shapes: Counter = field(default_factory=Counter)
+    # Описание запроса ("GET /v1/goals/{goal_id}"); маршрут известен только после роутинга
+    describe_route: Optional[Callable[[], str]] = None
+
+    def record(self, statement: str, elapsed: float):
+        self.count += 1
+        self.total_seconds += elapsed
+        self.shapes[statement] += 1
+
+    def most_repeated(self) -> Optional[Tuple[str, int]]:
+        """Самое часто повторяющееся выражение и число повторов"""
+        if not self.shapes:
+            return None
+        return self.shapes.most_common(1)[0]
+
+
+# Статистика текущего запроса; дочерние задачи (asyncio.gather) видят тот же объект
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def start_request_stats(describe_route: Optional[Callable[[], str]] = None) -> QueryStats:
+    """Начать сбор статистики для текущего запроса"""
+    stats = QueryStats(describe_route=describe_route)
+    _current_stats.set(stats)
+    return stats
+
+
+def get_request_stats() -> Optional[QueryStats]:
+    return _current_stats.get()
+
+
+def finish_request_stats(stats: QueryStats):
+    """Записать итог запроса в метрики"""
+    DB_QUERIES_PER_REQUEST.observe(stats.count)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started_at"].pop()
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.record(statement, elapsed)
+
+    record_statement(statement, parameters, executemany, elapsed, stats.describe_route if stats is not None else None)
+
+    if get_current_trace() is not None:
+        record_span("sql", elapsed, statement=normalize_sql(statement)[:300])
+
+
+def _handle_error(exception_context):
+    # Выражение упало - снимаем засечку времени, чтобы стек не рос
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_started_at"):
+        conn.info["query_started_at"].pop()
+
+
+def instrument_engine(async_engine):
+    """Подключить подсчет выражений к движку (события уровня курсора)"""
+    sync_engine = async_engine.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
@@ -0,0 +1,168 @@
+"""
+Ограничение частоты попыток входа и присоединения к семье (скользящее окно)
+"""
+import time
+import uuid
+import logging
+import ipaddress
+from collections import deque
+from typing import Deque, Dict, List, Optional, Union
+from fastapi import HTTPException, Request, status
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+IPNetwork = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+
+def _parse_networks(values: List[str]) -> List[IPNetwork]:
+    return [ipaddress.ip_network(value.strip(), strict=False) for value in values]
+
+
+def in_networks(host: Optional[str], networks: List[IPNetwork]) -> bool:
+    try:
+        address = ipaddress.ip_address(host or "")
+    except ValueError:
+        return False
+    return any(address in network for network in networks)
+
+
+_trusted_proxies = _parse_networks(settings.trusted_proxies)
+_internal_networks = _parse_networks(settings.internal_networks)
+
+
+def get_client_ip(request: Request) -> str:
+    """IP клиента. Заголовки прокси учитываются, только если соединение пришло от доверенного
+    прокси (TRUSTED_PROXIES): иначе клиент может подставить в них любой адрес"""
+    peer = request.client.host if request.client else "unknown"
+    if not in_networks(peer, _trusted_proxies):
+        return peer
+
+    real_ip = request.headers.get("X-Real-IP")
+    if real_ip:
+        return real_ip.strip()
+    x_forwarded_for = request.headers.get("X-Forwarded-For")
+    if x_forwarded_for:
+        # Справа налево: адреса добавлены нашими прокси, первый недоверенный - клиент
+        for address in reversed(x_forwarded_for.split(",")):
+            address = address.strip()
+            if address and not in_networks(address, _trusted_proxies):
+                return address
+    return peer
+
+
+def is_internal_client(request: Request) -> bool:
+    """Запрос пришел из внутренней сети (INTERNAL_NETWORKS: Prometheus в docker-сети, localhost)"""
+    return in_networks(get_client_ip(request), _internal_networks)
+
+
+class MemoryRateLimitBackend:
+    """Скользящее окно в памяти процесса"""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._hits: Dict[str, Deque[float]] = {}
+
+    async def hit(self, key: str, limit: int, window_seconds: int) -> Optional[float]:
+        """Зарегистрировать попытку; вернуть время до повтора, если лимит превышен"""
+        now = time.monotonic()
+        hits = self._hits.get(key)
+        if hits is None:
+            if len(self._hits) >= self.max_keys:
+                self._prune(now, window_seconds)
+            hits = self._hits[key] = deque()
+
+        while hits and hits[0] <= now - window_seconds:
+            hits.popleft()
+
+        if len(hits) >= limit:
+            return hits[0] + window_seconds - now
+
+        hits.append(now)
+        return None
+
+    def _prune(self, now: float, window_seconds: int):
+        """Удалить ключи без попыток в текущем окне"""
+        for key in [k for k, v in self._hits.items() if not v or v[-1] <= now - window_seconds]:
+            del self._hits[key]
+        if len(self._hits) >= self.max_keys:
+            self._hits.clear()
+
+
+class RedisRateLimitBackend:
+    """Скользящее окно в Redis, общее для всех реплик"""
+
+    def __init__(self, redis_url: str, fallback: MemoryRateLimitBackend):
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(redis_url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self._fallback = fallback
+
+    async def hit(self, key: str, limit: int, window_seconds: int) -> Optional[float]:
+        now = time.time()
+        redis_key = f"familycoins:ratelimit:{key}"
+        member = f"{now}:{uuid.uuid4().hex[:8]}"
+        try:
+            async with self._redis.pipeline(transaction=True) as pipe:
+                pipe.zremrangebyscore(redis_key, 0, now - window_seconds)
+                pipe.zcard(redis_key)
+                pipe.zrange(redis_key, 0, 0, withscores=True)
+                pipe.zadd(redis_key, {member: now})
+                pipe.expire(redis_key, window_seconds)
+                _, count, oldest, _, _ = await pipe.execute()
+
+            if count >= limit:
+                # Отклоненная попытка не должна занимать место в окне
+                await self._redis.zrem(redis_key, member)
+                oldest_at = oldest[0][1] if oldest else now
+                return oldest_at + window_seconds - now
+            return None
+        except Exception as e:
+            # Недоступный Redis не должен блокировать вход - считаем локально
+            logger.warning(f"Rate limit backend unavailable, using in-process limits: {e}")
+            return await self._fallback.hit(key, limit, window_seconds)
+
+
+def _create_backend():
+    memory_backend = MemoryRateLimitBackend()
+    if settings.rate_limit_backend == "redis":
+        return RedisRateLimitBackend(settings.redis_url, memory_backend)
+    return memory_backend
+
+
+rate_limit_backend = _create_backend()
+
+
+async def _enforce(checks):
+    """Проверить набор (ключ, лимит) и отклонить запрос при превышении любого"""
+    if not settings.rate_limit_enabled:
+        return
+
+    window = settings.auth_rate_limit_window_seconds
+    for key, limit in checks:
+        if limit <= 0:
+            continue
+        retry_after = await rate_limit_backend.hit(key, limit, window)
+        if retry_after is not None:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many attempts, please try again later",
+                headers={"Retry-After": str(max(1, int(retry_after + 0.999)))}
+            )
+
+
+async def enforce_login_limits(request: Request, username: str):
+    """Ограничить попытки входа по IP и имени пользователя (до bcrypt и БД)"""
+    await _enforce([
+        (f"login:ip:{get_client_ip(request)}", settings.login_rate_limit_per_ip),
+        (f"login:user:{username.lower()}", settings.login_rate_limit_per_username),
+    ])
+
+
+async def enforce_join_limits(request: Request, passcode: str):
+    """Ограничить попытки присоединения по IP и префиксу пасскода (до bcrypt и БД)"""
+    await _enforce([
+        (f"join:ip:{get_client_ip(request)}", settings.join_rate_limit_per_ip),
+        (f"join:passcode:{passcode[:3]}", settings.join_rate_limit_per_passcode_prefix),
+    ])
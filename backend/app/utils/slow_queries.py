@@ -0,0 +1,119 @@
+"""
+Журнал медленных SQL-выражений с планами EXPLAIN в кольцевом буфере
+"""
+import re
+import json
+import asyncio
+import logging
+import contextvars
+from collections import deque
+from datetime import datetime
+from itertools import count
+from typing import Callable, Deque, Dict, List, Optional, Set
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_PLACEHOLDER_RE = re.compile(r"\$\d+(::[A-Z_]+( WITH(OUT)? TIME ZONE)?(\[\])?)?")
+_PLACEHOLDER_LIST_RE = re.compile(r"\?(, \?)+")
+_READ_STATEMENT_RE = re.compile(r"\s*(SELECT|WITH)\b", re.IGNORECASE)
+
+# Медленные выражения (новые справа); размер ограничен настройкой
+_entries: Deque[Dict] = deque(maxlen=max(1, settings.slow_query_buffer_size))
+_entry_ids = count(1)
+
+# Не больше одного EXPLAIN одновременно: журнал не должен сам нагружать базу
+_explain_in_progress = False
+_explain_tasks: Set[asyncio.Task] = set()
+
+
+def normalize_sql(statement: str) -> str:
+    """SQL без значений: плейсхолдеры заменены на ?, списки IN (?, ?, ?) свернуты"""
+    normalized = " ".join(statement.split())
+    normalized = _PLACEHOLDER_RE.sub("?", normalized)
+    return _PLACEHOLDER_LIST_RE.sub("?...", normalized)
+
+
+def parameter_shapes(parameters, executemany: bool) -> List[str]:
+    """Типы параметров без значений (значения могут содержать персональные данные)"""
+    if executemany and parameters:
+        return [f"{len(parameters)} rows x ({', '.join(parameter_shapes(parameters[0], False))})"]
+    if isinstance(parameters, dict):
+        return [f"{key}: {type(value).__name__}" for key, value in parameters.items()]
+    return [type(value).__name__ for value in (parameters or ())]
+
+
+def record_statement(
+    statement: str,
+    parameters,
+    executemany: bool,
+    elapsed: float,
+    describe_route: Optional[Callable[[], str]]
+):
+    """Вызывается после каждого выражения; записывает его, если оно медленнее порога"""
+    threshold_ms = settings.slow_query_threshold_ms
+    duration_ms = elapsed * 1000
+    if threshold_ms <= 0 or duration_ms < threshold_ms or statement.startswith("EXPLAIN"):
+        return
+
+    route = describe_route() if describe_route else None
+
+    entry = {
+        "id": next(_entry_ids),
+        "at": datetime.utcnow().isoformat(),
+        "route": route,
+        "duration_ms": round(duration_ms, 2),
+        "sql": normalize_sql(statement),
+        "parameters": parameter_shapes(parameters, executemany),
+        "plan": None,
+    }
+    _entries.append(entry)
+    logger.warning(
+        f"Slow query {entry['duration_ms']} ms in {route or '-'}: {entry['sql'][:500]} "
+        f"params=[{', '.join(entry['parameters'])}]"
+    )
+
+    if settings.slow_query_explain and not executemany and _READ_STATEMENT_RE.match(statement):
+        _schedule_explain(entry, statement, parameters)
+
+
+def _schedule_explain(entry: Dict, statement: str, parameters):
+    global _explain_in_progress
+    if _explain_in_progress:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+
+    _explain_in_progress = True
+    # Пустой контекст: EXPLAIN не должен попадать в статистику исходного запроса
+    task = loop.create_task(_explain(entry, statement, parameters), context=contextvars.Context())
+    _explain_tasks.add(task)
+    task.add_done_callback(_explain_tasks.discard)
+
+
+async def _explain(entry: Dict, statement: str, parameters):
+    """EXPLAIN (FORMAT JSON) без ANALYZE: план строится, но выражение не выполняется"""
+    global _explain_in_progress
+    from app.database import engine
+
+    try:
+        async with engine.connect() as conn:
+            result = await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", tuple(parameters or ()))
+            plan = result.scalar()
+        entry["plan"] = json.loads(plan) if isinstance(plan, str) else plan
+    except Exception as e:
+        entry["plan"] = {"error": str(e)}
+    finally:
+        _explain_in_progress = False
+
+
+def get_slow_queries(limit: int = 50) -> List[Dict]:
+    """Последние медленные выражения, новые первыми"""
+    return list(reversed(_entries))[:limit]
+
+
+def clear_slow_queries():
+    _entries.clear()
@@ -0,0 +1,249 @@
+"""
+Легковесная трассировка: спаны в contextvars вокруг сервисных методов и SQL-выражений.
+
+Трасса одного HTTP-запроса собирается в памяти и по завершении выгружается
+в JSON Lines файл или во внутренний буфер (GET /v1/admin/traces).
+Из спанов строится разбивка времени в формате folded stacks для flame graph.
+"""
+import os
+import json
+import time
+import random
+import asyncio
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from functools import wraps
+from typing import Any, Deque, Dict, List, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Span:
+    """Отрезок работы внутри трассы"""
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    name: str
+    start: float  # unix time, секунды
+    duration_ms: float = 0.0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class Trace:
+    """Спаны одного запроса; создается только для попавших в выборку запросов"""
+    trace_id: str
+    spans: List[Span] = field(default_factory=list)
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("span", default=None)
+
+# Внутренний буфер последних трасс (экспорт "memory")
+_collected: Deque[Dict] = deque(maxlen=max(1, settings.trace_buffer_size))
+_file_lock = threading.Lock()
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[tuple]:
+    """W3C traceparent -> (trace_id, parent_span_id, sampled)"""
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        sampled = bool(int(parts[3], 16) & 1)
+    except ValueError:
+        return None
+    return parts[1], parts[2], sampled
+
+
+def get_current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def start_trace(name: str, traceparent: Optional[str] = None, trust_sampled: bool = False, **attributes):
+    """Корневой спан запроса. Решение о выборке принимается здесь; флаг sampled из traceparent
+    учитывается только при trust_sampled, иначе любой клиент мог бы включить трассировку всех своих запросов"""
+    incoming = parse_traceparent(traceparent)
+    if incoming:
+        trace_id, parent_id, sampled = incoming
+    else:
+        trace_id, parent_id, sampled = _new_id(128), None, False
+    if not (incoming and trust_sampled):
+        sampled = random.random() < settings.trace_sample_rate
+
+    if not sampled:
+        yield None
+        return
+
+    trace = Trace(trace_id=trace_id)
+    trace_token = _current_trace.set(trace)
+    try:
+        with _span(trace, name, parent_id, attributes) as root:
+            yield root
+    finally:
+        _current_trace.reset(trace_token)
+        _export(trace, root)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Вложенный спан; без активной трассы ничего не делает"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+
+    parent = _current_span.get()
+    with _span(trace, name, parent.span_id if parent else None, attributes) as current:
+        yield current
+
+
+@contextmanager
+def _span(trace: Trace, name: str, parent_id: Optional[str], attributes: Dict):
+    current = Span(
+        trace_id=trace.trace_id,
+        span_id=_new_id(64),
+        parent_id=parent_id,
+        name=name,
+        start=time.time(),
+        attributes=attributes,
+    )
+    started_at = time.perf_counter()
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.attributes["error"] = type(e).__name__
+        raise
+    finally:
+        _current_span.reset(token)
+        current.duration_ms = round((time.perf_counter() - started_at) * 1000, 3)
+        trace.spans.append(current)
+
+
+def record_span(name: str, elapsed: float, **attributes):
+    """Завершенный спан с уже измеренной длительностью (SQL-выражения из событий курсора)"""
+    trace = _current_trace.get()
+    if trace is None:
+        return
+    parent = _current_span.get()
+    trace.spans.append(Span(
+        trace_id=trace.trace_id,
+        span_id=_new_id(64),
+        parent_id=parent.span_id if parent else None,
+        name=name,
+        start=time.time() - elapsed,
+        duration_ms=round(elapsed * 1000, 3),
+        attributes=attributes,
+    ))
+
+
+def traced(name: Optional[str] = None):
+    """Декоратор: обернуть функцию в спан (по умолчанию имя - Класс.метод)"""
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        if asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if _current_trace.get() is None:
+                    return await func(*args, **kwargs)
+                with span(span_name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_trace.get() is None:
+                return func(*args, **kwargs)
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+def _export(trace: Trace, root: Optional[Span]):
+    if root is None or root.duration_ms < settings.trace_min_duration_ms:
+        return
+
+    # Родитель записывается после детей - сортируем по времени начала
+    record = {
+        "trace_id": trace.trace_id,
+        "name": root.name,
+        "duration_ms": root.duration_ms,
+        "spans": [asdict(s) for s in sorted(trace.spans, key=lambda s: s.start)],
+    }
+    try:
+        if settings.trace_exporter == "memory":
+            _collected.append(record)
+        elif settings.trace_exporter == "jsonl":
+            line = json.dumps(record, default=str, ensure_ascii=False)
+            with _file_lock, open(settings.trace_file, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+    except Exception as e:
+        # Трассировка не должна ломать обработку запроса
+        logger.warning(f"Trace export failed: {e}")
+
+
+def get_traces(limit: int = 20) -> List[Dict]:
+    """Последние трассы из внутреннего буфера, новые первыми"""
+    return list(reversed(_collected))[:limit]
+
+
+def clear_traces():
+    _collected.clear()
+
+
+def folded_stacks(spans: List[Dict]) -> Dict[str, float]:
+    """Собственное время спанов по стекам вызовов: "корень;A;B" -> мс (формат flamegraph.pl / speedscope)"""
+    by_id = {s["span_id"]: s for s in spans}
+    children_ms: Dict[str, float] = {}
+    for s in spans:
+        if s["parent_id"] in by_id:
+            children_ms[s["parent_id"]] = children_ms.get(s["parent_id"], 0.0) + s["duration_ms"]
+
+    stacks: Dict[str, float] = {}
+    for s in spans:
+        path, node = [], s
+        while node is not None:
+            path.append(node["name"].replace(";", ","))
+            node = by_id.get(node["parent_id"])
+        self_ms = max(0.0, s["duration_ms"] - children_ms.get(s["span_id"], 0.0))
+        key = ";".join(reversed(path))
+        stacks[key] = stacks.get(key, 0.0) + self_ms
+    return stacks
+
+
+def fold_traces(traces: List[Dict], route: Optional[str] = None, min_duration_ms: float = 0) -> str:
+    """Сумма folded stacks по трассам; веса - целые микросекунды"""
+    totals: Dict[str, float] = {}
+    for trace in traces:
+        if (route and trace["name"] != route) or trace["duration_ms"] < min_duration_ms:
+            continue
+        for stack, self_ms in folded_stacks(trace["spans"]).items():
+            totals[stack] = totals.get(stack, 0.0) + self_ms
+    return "\n".join(f"{stack} {round(ms * 1000)}" for stack, ms in sorted(totals.items()))
+
+
+def read_trace_file(path: str = None) -> List[Dict]:
+    """Трассы из JSON Lines файла экспорта"""
+    path = path or settings.trace_file
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
@@ -0,0 +1,116 @@
+"""
+Кэш пользователей в памяти процесса с коротким TTL
+
+Запись сбрасывается во всех процессах: триггер на users отправляет NOTIFY user_changed
+при любом UPDATE/DELETE (в том числе Core update() и каскадном удалении семьи), канал
+слушает LISTEN-соединение событий (app.utils.events). Пока канал не слушается (события
+выключены, соединение переподключается), запись живет не дольше UNSYNCED_TTL_SECONDS.
+"""
+import time
+import uuid
+from typing import Dict, Optional, Tuple
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models import User
+from app.utils.events import broker
+
+USER_CHANGED_CHANNEL = "user_changed"
+
+# Срок записи, пока изменения из других процессов не приходят
+UNSYNCED_TTL_SECONDS = 5
+
+# Колонки пользователя, которые попадают в кэш: только то, что читают проверки доступа
+# (хеш пароля и прочие поля в памяти процесса не держим)
+_USER_COLUMNS = ("id", "family_id", "role", "name", "username")
+
+
+class UserCache:
+    """TTL-кэш строк пользователей; сбрасывается при изменении пользователя"""
+
+    def __init__(self, ttl_seconds: int, max_entries: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: Dict[uuid.UUID, Tuple[float, dict]] = {}
+        # Уведомления user_changed доходят до процесса
+        self.synced = False
+
+    def _get_row(self, user_id: uuid.UUID) -> Optional[dict]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        expires_at, row = entry
+        if expires_at < time.monotonic():
+            self._entries.pop(user_id, None)
+            return None
+        return row
+
+    def put(self, row: dict) -> dict:
+        """Сохранить снимок пользователя (колонки _USER_COLUMNS)"""
+        ttl_seconds = self.ttl_seconds if self.synced else min(self.ttl_seconds, UNSYNCED_TTL_SECONDS)
+        if ttl_seconds > 0:
+            if len(self._entries) >= self.max_entries:
+                self._entries.clear()
+            self._entries[row["id"]] = (time.monotonic() + ttl_seconds, row)
+        return row
+
+    def invalidate(self, user_id: uuid.UUID):
+        """Удалить пользователя из кэша"""
+        self._entries.pop(user_id, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def set_synced(self, synced: bool):
+        """Канал user_changed подключен или потерян; уведомления могли пропасть - сбрасываем все"""
+        self.synced = synced
+        self.clear()
+
+    def peek_family_id(self, user_id: uuid.UUID) -> Optional[uuid.UUID]:
+        """Семья пользователя из кэша без обращения к базе"""
+        row = self._get_row(user_id)
+        return row["family_id"] if row else None
+
+    async def get(self, user_id: uuid.UUID, db: AsyncSession) -> Optional[User]:
+        """Получить пользователя из кэша или базы данных"""
+        row = self._get_row(user_id)
+        if row is None:
+            result = await db.execute(
+                select(*(getattr(User, key) for key in _USER_COLUMNS)).where(User.id == user_id)
+            )
+            found = result.one_or_none()
+            if found is None:
+                return None
+            row = self.put(dict(found._mapping))
+
+        # Отдаем отдельную копию, чтобы запросы не делили один объект
+        return User(**row)
+
+    async def get_family_id(self, user_id: uuid.UUID, db: AsyncSession) -> Optional[uuid.UUID]:
+        """Получить семью пользователя"""
+        family_id = self.peek_family_id(user_id)
+        if family_id is not None:
+            return family_id
+        user = await self.get(user_id, db)
+        return user.family_id if user else None
+
+
+user_cache = UserCache(ttl_seconds=settings.user_cache_ttl_seconds)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_cached_user(mapper, connection, target):
+    """Сбрасываем кэш своего процесса сразу, не дожидаясь уведомления"""
+    user_cache.invalidate(target.id)
+
+
+def _on_user_changed(payload: str):
+    try:
+        user_cache.invalidate(uuid.UUID(payload))
+    except ValueError:
+        pass
+
+
+broker.listen(USER_CHANGED_CHANNEL, _on_user_changed, user_cache.set_synced)
@@ -0,0 +1,197 @@
+"""
+Стресс-тест: одновременные покупки товара с остатком и лимитом периода
+
+Создает временную семью с --children детьми и товар с остатком --stock и лимитом
+--limit покупок в месяц, затем каждый ребенок одновременно делает --attempts покупок
+через StoreService.purchase_item (каждая в своей сессии). Параллельно родитель одобряет
+по --approvals выполненных заданий каждого ребенка через TaskService.approve_task.
+Проверяет, что продано ровно min(stock, limit) единиц, остаток не ушел в минус,
+а баланс равен начальному плюс награды за одобрения минус успешные покупки (начисление
+не затирает списание и наоборот, взаимных блокировок нет). Семья удаляется после
+прогона (если не указан --keep).
+
+Запуск из папки backend:
+    python -m benchmarks.store_contention --children 4 --attempts 25 --stock 30 --limit 20 --approvals 10
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+import uuid
+from collections import Counter
+
+from fastapi import HTTPException
+from sqlalchemy import delete, func, select, text
+
+from app.database import async_session_maker, engine
+from app.models import CoinBalance, Family, Purchase, StoreItem, Task, TaskAssignment, User
+from app.schemas.store import PurchaseCreate
+from app.schemas.task import TaskAssignmentApprove
+from app.services.store_service import StoreService
+from app.services.task_service import TaskService
+
+PRICE = 1
+REWARD = 1
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Проверить, что одновременные покупки не превышают остаток и лимит")
+    parser.add_argument("--children", type=int, default=4, help="Детей, покупающих одновременно")
+    parser.add_argument("--attempts", type=int, default=25, help="Покупок на ребенка")
+    parser.add_argument("--stock", type=int, default=30, help="Остаток товара")
+    parser.add_argument("--limit", type=int, default=20, help="Лимит покупок семьей в месяц (0 - без лимита)")
+    parser.add_argument("--approvals", type=int, default=10, help="Одобрений заданий на ребенка во время покупок")
+    parser.add_argument("--keep", action="store_true", help="Не удалять семью после прогона")
+    return parser.parse_args(argv)
+
+
+async def _create_family(args: argparse.Namespace):
+    suffix = uuid.uuid4().hex[:8]
+    async with async_session_maker() as db:
+        family = Family(name=f"bench-{suffix}", passcode="bench")
+        db.add(family)
+        await db.flush()
+
+        parent = User(family_id=family.id, name="Parent", username=f"bench-p-{suffix}", password_hash="-", role="parent")
+        children = [
+            User(family_id=family.id, name=f"Child {i}", username=f"bench-c{i}-{suffix}", password_hash="-", role="child")
+            for i in range(args.children)
+        ]
+        db.add_all([parent, *children])
+        await db.flush()
+
+        # Коинов хватает на все попытки: отказы возможны только из-за остатка и лимита
+        db.add_all([
+            CoinBalance(user_id=child.id, balance=args.attempts * PRICE, total_earned=args.attempts * PRICE, total_spent=0)
+            for child in children
+        ])
+        item = StoreItem(
+            family_id=family.id,
+            name="Bench item",
+            category="bench",
+            price_coins=PRICE,
+            stock_quantity=args.stock,
+            purchase_limit=args.limit or None,
+            purchase_limit_period="month" if args.limit else None,
+            created_by=parent.id
+        )
+        db.add(item)
+
+        # Выполненные задания, которые родитель одобряет во время покупок
+        task = Task(family_id=family.id, title="Bench task", category="bench", reward_coins=REWARD, created_by=parent.id)
+        db.add(task)
+        await db.flush()
+        assignments = [
+            TaskAssignment(task_id=task.id, child_id=child.id, status="completed")
+            for child in children
+            for _ in range(args.approvals)
+        ]
+        db.add_all(assignments)
+        await db.commit()
+        return family.id, parent.id, [child.id for child in children], item.id, [a.id for a in assignments]
+
+
+async def _purchase(child_id: uuid.UUID, family_id: uuid.UUID, item_id: uuid.UUID) -> str:
+    async with async_session_maker() as db:
+        try:
+            await StoreService.purchase_item(PurchaseCreate(item_id=item_id), child_id, family_id, db)
+            return "ok"
+        except HTTPException as e:
+            return e.detail.get("error", str(e.status_code)) if isinstance(e.detail, dict) else str(e.status_code)
+        except Exception as e:
+            # Взаимная блокировка и прочие ошибки базы - провал прогона
+            return f"error:{type(e).__name__}"
+
+
+async def _approve(assignment_id: uuid.UUID, parent_id: uuid.UUID) -> str:
+    async with async_session_maker() as db:
+        try:
+            await TaskService.approve_task(assignment_id, TaskAssignmentApprove(approved=True), parent_id, db)
+            return "approved"
+        except Exception as e:
+            return f"error:{type(e).__name__}"
+
+
+async def _cleanup(family_id: uuid.UUID, child_ids):
+    async with engine.begin() as conn:
+        await conn.execute(
+            text("DELETE FROM outbox_messages WHERE coalesce(payload->>'user_id', payload->>'child_id') = ANY(:user_ids)"),
+            {"user_ids": [str(child_id) for child_id in child_ids]}
+        )
+        await conn.execute(text("DELETE FROM change_log WHERE family_id = :family_id"), {"family_id": family_id})
+        # Одобрения ссылаются на родителя - задания удаляются раньше пользователей
+        await conn.execute(delete(Task).where(Task.family_id == family_id))
+        await conn.execute(delete(Family).where(Family.id == family_id))
+
+
+async def run(args: argparse.Namespace) -> dict:
+    family_id, parent_id, child_ids, item_id, assignment_ids = await _create_family(args)
+    try:
+        purchases_calls = [
+            _purchase(child_id, family_id, item_id)
+            for _ in range(args.attempts)
+            for child_id in child_ids
+        ]
+        approval_calls = [_approve(assignment_id, parent_id) for assignment_id in assignment_ids]
+        # Одобрения вперемешку с покупками: начисления идут одновременно со списаниями
+        calls = []
+        step = max(1, len(purchases_calls) // max(1, len(approval_calls)))
+        for i, call in enumerate(purchases_calls):
+            calls.append(call)
+            if i % step == 0 and approval_calls:
+                calls.append(approval_calls.pop())
+        calls.extend(approval_calls)
+
+        started_at = time.perf_counter()
+        results = await asyncio.gather(*calls)
+        elapsed = time.perf_counter() - started_at
+
+        async with async_session_maker() as db:
+            stock = await db.scalar(select(StoreItem.stock_quantity).where(StoreItem.id == item_id))
+            purchases = await db.scalar(select(func.count()).select_from(Purchase).where(Purchase.item_id == item_id))
+            spent, earned, balance = (await db.execute(
+                select(func.sum(CoinBalance.total_spent), func.sum(CoinBalance.total_earned), func.sum(CoinBalance.balance))
+                .where(CoinBalance.user_id.in_(child_ids))
+            )).one()
+
+        outcomes = Counter(results)
+        initial = len(child_ids) * args.attempts * PRICE
+        expected = min(args.stock, args.limit) if args.limit else args.stock
+        expected = min(expected, args.children * args.attempts)
+        report = {
+            "attempts": len(results),
+            "seconds": round(elapsed, 2),
+            "outcomes": dict(outcomes),
+            "purchases": purchases,
+            "expected_purchases": expected,
+            "stock_left": stock,
+            "coins_spent": spent,
+            "coins_earned": earned - initial,
+            "expected_balance": initial + outcomes["approved"] * REWARD - purchases * PRICE,
+            "balance": balance,
+        }
+        report["ok"] = (
+            outcomes["ok"] == purchases == expected
+            and outcomes["approved"] == len(assignment_ids)
+            and stock == args.stock - purchases
+            and spent == purchases * PRICE
+            and earned - initial == outcomes["approved"] * REWARD
+            and balance == report["expected_balance"]
+        )
+        return report
+    finally:
+        if not args.keep:
+            await _cleanup(family_id, child_ids)
+        await engine.dispose()
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    return 0 if report["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""
+Бенчмарк: скорость вставки и размер индекса первичного ключа для uuid4 и uuid7
+
+Создает две таблицы со структурой coin_transactions, заливает в каждую --rows строк
+пачками через COPY и печатает скорость по отрезкам и итоговые размеры таблицы и индекса.
+Таблицы удаляются после замера (если не указан --keep).
+
+Запуск из папки backend:
+    python -m benchmarks.uuid_inserts --rows 10000000
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+import uuid
+from datetime import datetime
+
+import asyncpg
+
+from app.config import settings
+from app.database import normalize_database_url
+from app.utils.ids import uuid7
+
+GENERATORS = {
+    "uuid4": uuid.uuid4,
+    "uuid7": uuid7,
+}
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Сравнить вставку с uuid4 и uuid7 в первичном ключе")
+    parser.add_argument("--rows", type=int, default=10_000_000, help="Строк в каждой таблице")
+    parser.add_argument("--batch-size", type=int, default=10_000, help="Строк в одной пачке COPY")
+    parser.add_argument("--report-every", type=int, default=1_000_000, help="Печатать скорость каждые N строк")
+    parser.add_argument("--users", type=int, default=1_000, help="Сколько разных user_id в данных")
+    parser.add_argument("--keep", action="store_true", help="Не удалять таблицы после замера")
+    return parser.parse_args(argv)
+
+
+def _dsn() -> str:
+    return normalize_database_url(settings.database_url).replace("postgresql+asyncpg://", "postgresql://", 1)
+
+
+async def _create_table(conn: asyncpg.Connection, table: str):
+    await conn.execute(f"DROP TABLE IF EXISTS {table}")
+    await conn.execute(f"""
+        CREATE TABLE {table} (
+            id uuid PRIMARY KEY,
+            user_id uuid NOT NULL,
+            amount integer NOT NULL,
+            transaction_type varchar(20) NOT NULL,
+            description varchar(255) NOT NULL,
+            created_at timestamp NOT NULL
+        )
+    """)
+
+
+async def run_variant(conn: asyncpg.Connection, name: str, args: argparse.Namespace) -> dict:
+    """Залить таблицу для одного генератора и собрать замеры"""
+    table = f"bench_ids_{name}"
+    generate_id = GENERATORS[name]
+    user_ids = [uuid.uuid4() for _ in range(args.users)]
+    columns = ["id", "user_id", "amount", "transaction_type", "description", "created_at"]
+
+    await _create_table(conn, table)
+
+    segments = []
+    inserted = 0
+    segment_rows = 0
+    segment_seconds = 0.0
+    total_seconds = 0.0
+
+    while inserted < args.rows:
+        size = min(args.batch_size, args.rows - inserted)
+        now = datetime.utcnow()
+        records = [
+            (generate_id(), random.choice(user_ids), 10, "earned", "benchmark", now)
+            for _ in range(size)
+        ]
+
+        # Время генерации данных не входит в замер
+        started_at = time.perf_counter()
+        await conn.copy_records_to_table(table, records=records, columns=columns)
+        elapsed = time.perf_counter() - started_at
+
+        inserted += size
+        segment_rows += size
+        segment_seconds += elapsed
+        total_seconds += elapsed
+
+        if segment_rows >= args.report_every or inserted == args.rows:
+            rate = segment_rows / segment_seconds if segment_seconds else 0
+            segments.append({"rows_total": inserted, "rows_per_second": round(rate)})
+            print(f"{name}: {inserted:>12,} rows, {rate:,.0f} rows/s in last segment", file=sys.stderr)
+            segment_rows = 0
+            segment_seconds = 0.0
+
+    sizes = await conn.fetchrow(
+        "SELECT pg_relation_size($1::regclass) AS table_bytes, pg_relation_size($2::regclass) AS index_bytes",
+        table, f"{table}_pkey"
+    )
+
+    if not args.keep:
+        await conn.execute(f"DROP TABLE {table}")
+
+    return {
+        "rows": inserted,
+        "seconds": round(total_seconds, 2),
+        "rows_per_second": round(inserted / total_seconds) if total_seconds else 0,
+        "table_mb": round(sizes["table_bytes"] / 1024 / 1024, 1),
+        "pkey_index_mb": round(sizes["index_bytes"] / 1024 / 1024, 1),
+        "segments": segments,
+    }
+
+
+async def run(args: argparse.Namespace) -> dict:
+    conn = await asyncpg.connect(_dsn())
+    try:
+        return {name: await run_variant(conn, name, args) for name in GENERATORS}
+    finally:
+        await conn.close()
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""
+Конфигурация gunicorn для продакшена: несколько процессов с воркерами uvicorn
+
+Запуск:
+    gunicorn app.main:app -c gunicorn.conf.py
+"""
+import math
+import os
+import shutil
+
+# Метрики всех воркеров собираются через общий каталог. Переменная должна быть
+# задана до импорта prometheus_client, то есть до загрузки приложения (preload_app)
+PROMETHEUS_MULTIPROC_DIR = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/familycoins-metrics")
+shutil.rmtree(PROMETHEUS_MULTIPROC_DIR, ignore_errors=True)
+os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+
+
+def cpu_limit() -> float:
+    """Доступные ядра с учетом квоты cgroup (docker --cpus, лимиты Railway и Kubernetes)"""
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+
+    # cgroup v2: "<quota> <period>" или "max <period>"
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            return min(cores, int(quota) / int(period))
+    except (OSError, ValueError):
+        pass
+
+    # cgroup v1: квота -1 означает отсутствие ограничения
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        if quota > 0:
+            return min(cores, quota / period)
+    except (OSError, ValueError):
+        pass
+
+    return cores
+
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Асинхронный воркер загружает ядро целиком, поэтому один воркер на ядро квоты
+# (WEB_CONCURRENCY задает число явно)
+workers = int(os.environ.get("WEB_CONCURRENCY") or max(1, math.ceil(cpu_limit())))
+
+# Приложение импортируется один раз в мастере; воркеры получают его при fork
+preload_app = True
+
+# Перезапуск воркера после N запросов; разброс не дает всем воркерам перезапуститься одновременно
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", "10000"))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", "1000"))
+
+# На SIGTERM воркер перестает принимать соединения и дорабатывает начатые запросы
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "60"))
+keepalive = 5
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.environ.get("LOG_LEVEL", "info").lower()
+
+
+def on_starting(server):
+    """Мастер: миграции и калибровка bcrypt один раз до запуска воркеров"""
+    from prometheus_client import multiprocess
+    from app.config import settings
+    from app.startup import prepare_before_fork
+
+    prepare_before_fork()
+    if workers > 1 and settings.rate_limit_enabled and settings.rate_limit_backend != "redis":
+        # Окно в памяти у каждого воркера свое: лимиты фактически умножаются на число воркеров
+        server.log.warning(
+            f"RATE_LIMIT_BACKEND={settings.rate_limit_backend} keeps limits per worker ({workers} workers); "
+            "set RATE_LIMIT_BACKEND=redis"
+        )
+    # Gauge-метрики, записанные мастером при подготовке, не должны суммироваться с воркерами
+    multiprocess.mark_process_dead(os.getpid())
+    server.log.info(f"Starting {workers} workers (cpu limit {cpu_limit():g})")
+
+
+def post_fork(server, worker):
+    """Воркер не использует соединения, унаследованные от мастера"""
+    from app.database import engine, read_engine
+
+    engine.sync_engine.dispose(close=False)
+    if read_engine is not engine:
+        read_engine.sync_engine.dispose(close=False)
+
+
+def child_exit(server, worker):
+    """Gauge-метрики завершившегося воркера больше не учитываются"""
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
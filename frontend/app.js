@@ -6,6 +6,8 @@ const API_VERSION = '/v1';
 let currentUser = null;
 let authToken = null;
 let familyData = null;
+// Метка read-your-writes от API: до этого момента (мс) чтения идут в основную базу, а не в реплику
+let primaryUntil = 0;
 
 // Утилиты для работы с API
 class ApiClient {
@@ -19,12 +21,19 @@ class ApiClient {
         if (authToken) {
             headers['Authorization'] = `Bearer ${authToken}`;
         }
+        if (primaryUntil > Date.now()) {
+            headers['X-Primary-Until'] = String(primaryUntil);
+        }
+
+        // Изменяющий запрос повторяется с тем же ключом: сервер не выполнит его дважды
+        const method = options.method || 'GET';
+        if (method !== 'GET' && authToken && !headers['Idempotency-Key']) {
+            headers['Idempotency-Key'] = crypto.randomUUID();
+        }
 
         try {
-            const response = await fetch(url, {
-                ...options,
-                headers
-            });
+            const response = await this.fetchWithRetry(url, { ...options, headers }, headers['Idempotency-Key'] ? 2 : 0);
+            primaryUntil = Math.max(primaryUntil, Number(response.headers.get('X-Primary-Until')) || 0);
 
             if (!response.ok) {
                 const errorData = await response.json().catch(() => ({}));
@@ -40,7 +49,9 @@ class ApiClient {
                     throw new Error('Not authenticated');
                 }
                 
-                throw new Error(errorData.detail || `HTTP error! status: ${response.status}`);
+                // detail - строка или объект с message (insufficient_coins, out_of_stock)
+                const detail = errorData.detail?.message || errorData.detail;
+                throw new Error(detail || `HTTP error! status: ${response.status}`);
             }
 
             return await response.json();
@@ -50,6 +61,18 @@ class ApiClient {
         }
     }
 
+    // Повтор при сетевой ошибке (ответ не получен); ответы с ошибкой HTTP не повторяются
+    static async fetchWithRetry(url, options, retries) {
+        for (let attempt = 0; ; attempt++) {
+            try {
+                return await fetch(url, options);
+            } catch (error) {
+                if (attempt >= retries) throw error;
+                await new Promise(resolve => setTimeout(resolve, 500 * 2 ** attempt));
+            }
+        }
+    }
+
     static async get(endpoint) {
         return this.request(endpoint, { method: 'GET' });
     }
@@ -71,6 +94,13 @@ class ApiClient {
     static async delete(endpoint) {
         return this.request(endpoint, { method: 'DELETE' });
     }
+
+    // Несколько вызовов одним запросом: [{method, path, body}] -> [{status, headers, body}]
+    static async batch(requests) {
+        return this.post('/batch', {
+            requests: requests.map(r => ({ ...r, path: `${API_VERSION}${r.path}` }))
+        });
+    }
 }
 
 // Утилиты для UI
@@ -237,27 +267,28 @@ class Auth {
         // Настраиваем видимость элементов по роли
         UI.updateRoleVisibility(currentUser.role);
         
-        // Загружаем данные
+        // Загружаем данные (дашборд приходит одним запросом вместе с составом семьи)
         this.loadDashboard();
-        this.loadFamilyData();
+        LiveEvents.connect();
     }
 
     static async loadDashboard() {
         try {
-            // Загружаем баланс монет
-            const balance = await ApiClient.get('/coins/balance');
-            document.getElementById('coin-count').textContent = balance.balance;
-            document.getElementById('dashboard-coins').textContent = balance.balance;
+            // Баланс, задания, статистика, цели, магазин и семья - одним запросом
+            const dashboard = await ApiClient.get('/dashboard');
+            document.getElementById('coin-count').textContent = dashboard.balance.balance;
+            document.getElementById('dashboard-coins').textContent = dashboard.balance.balance;
 
             if (currentUser.role === 'child') {
                 // Для детей - простая статистика
-                const tasks = await ApiClient.get('/tasks/my');
-                const activeTasks = tasks.assignments.filter(a => a.status === 'assigned' || a.status === 'completed').length;
+                const activeTasks = dashboard.tasks.assignments.filter(a => a.status === 'assigned' || a.status === 'completed').length;
                 document.getElementById('dashboard-total-tasks').textContent = activeTasks;
             } else {
                 // Для родителей - расширенная статистика
-                await this.loadParentStatistics();
+                this.renderParentStatistics(dashboard.statistics);
             }
+
+            this.renderFamilyData(dashboard.family);
         } catch (error) {
             console.error('Error loading dashboard:', error);
         }
@@ -267,21 +298,23 @@ class Auth {
         try {
             // Загружаем статистику заданий
             const stats = await ApiClient.get('/tasks/statistics');
-            
-            // Обновляем общую статистику
-            document.getElementById('dashboard-total-tasks').textContent = stats.total_tasks;
-            document.getElementById('tasks-in-progress').textContent = stats.in_progress;
-            document.getElementById('tasks-pending').textContent = stats.pending_approval;
-            document.getElementById('tasks-completed').textContent = stats.completed;
-            
-            // Отображаем статистику по детям
-            this.renderChildrenStatistics(stats.children);
-            
+            this.renderParentStatistics(stats);
         } catch (error) {
             console.error('Error loading parent statistics:', error);
         }
     }
 
+    static renderParentStatistics(stats) {
+        // Обновляем общую статистику
+        document.getElementById('dashboard-total-tasks').textContent = stats.total_tasks;
+        document.getElementById('tasks-in-progress').textContent = stats.in_progress;
+        document.getElementById('tasks-pending').textContent = stats.pending_approval;
+        document.getElementById('tasks-completed').textContent = stats.completed;
+
+        // Отображаем статистику по детям
+        this.renderChildrenStatistics(stats.children);
+    }
+
     static renderChildrenStatistics(childrenStats) {
         const container = document.getElementById('children-stats');
         
@@ -319,53 +352,58 @@ class Auth {
     static async loadFamilyData() {
         try {
             const familyInfo = await ApiClient.get('/auth/family/members');
-            familyData = familyInfo.family;
-            
-            // Обновляем информацию о семье
-            document.getElementById('family-name-display').textContent = familyInfo.family.name;
-            document.getElementById('family-id').textContent = familyInfo.family.id;
-            document.getElementById('family-passcode').textContent = familyInfo.family.passcode;
-            
-            // Отображаем членов семьи с детальной информацией
-            const membersContainer = document.getElementById('family-members');
-            membersContainer.innerHTML = familyInfo.members.map(member => `
-                <div class="member-card ${member.role}" ${member.role === 'child' && currentUser.role === 'parent' ? `onclick="showChildProfile('${member.id}')"` : ''}>
-                    <div class="member-header">
-                        <div class="member-avatar ${member.role}">
-                            <i class="fas ${member.role === 'parent' ? 'fa-crown' : 'fa-child'}"></i>
-                            ${member.name.charAt(0).toUpperCase()}
-                        </div>
-                        <div class="member-main-info">
-                            <div class="member-name">${member.name}</div>
-                            <div class="member-role">
-                                ${member.role === 'parent' ? 'Родитель' : 'Ребенок'}
-                                ${member.role === 'child' && currentUser.role === 'parent' ? '<span class="clickable-hint">Нажмите для просмотра профиля</span>' : ''}
-                            </div>
-                        </div>
-                        <button class="btn btn-sm btn-outline" onclick="event.stopPropagation(); copyMemberId('${member.id}')" title="Копировать ID">
-                            <i class="fas fa-copy"></i>
-                        </button>
-                    </div>
-                    
-                    <div class="member-details">
-                        <div class="detail-item">
-                            <label>ID пользователя:</label>
-                            <code class="member-id">${member.id}</code>
-                        </div>
-                        <div class="detail-item">
-                            <label>Дата присоединения:</label>
-                            <span>${UI.formatDate(member.created_at)}</span>
-                        </div>
-                    </div>
-                </div>
-            `).join('');
+            this.renderFamilyData(familyInfo);
         } catch (error) {
             console.error('Error loading family data:', error);
             UI.showToast('Ошибка загрузки данных семьи', 'error');
         }
     }
 
+    static renderFamilyData(familyInfo) {
+        familyData = familyInfo.family;
+        
+        // Обновляем информацию о семье
+        document.getElementById('family-name-display').textContent = familyInfo.family.name;
+        document.getElementById('family-id').textContent = familyInfo.family.id;
+        document.getElementById('family-passcode').textContent = familyInfo.family.passcode;
+        
+        // Отображаем членов семьи с детальной информацией
+        const membersContainer = document.getElementById('family-members');
+        membersContainer.innerHTML = familyInfo.members.map(member => `
+            <div class="member-card ${member.role}" ${member.role === 'child' && currentUser.role === 'parent' ? `onclick="showChildProfile('${member.id}')"` : ''}>
+                <div class="member-header">
+                    <div class="member-avatar ${member.role}">
+                        <i class="fas ${member.role === 'parent' ? 'fa-crown' : 'fa-child'}"></i>
+                        ${member.name.charAt(0).toUpperCase()}
+                    </div>
+                    <div class="member-main-info">
+                        <div class="member-name">${member.name}</div>
+                        <div class="member-role">
+                            ${member.role === 'parent' ? 'Родитель' : 'Ребенок'}
+                            ${member.role === 'child' && currentUser.role === 'parent' ? '<span class="clickable-hint">Нажмите для просмотра профиля</span>' : ''}
+                        </div>
+                    </div>
+                    <button class="btn btn-sm btn-outline" onclick="event.stopPropagation(); copyMemberId('${member.id}')" title="Копировать ID">
+                        <i class="fas fa-copy"></i>
+                    </button>
+                </div>
+                
+                <div class="member-details">
+                    <div class="detail-item">
+                        <label>ID пользователя:</label>
+                        <code class="member-id">${member.id}</code>
+                    </div>
+                    <div class="detail-item">
+                        <label>Дата присоединения:</label>
+                        <span>${UI.formatDate(member.created_at)}</span>
+                    </div>
+                </div>
+            </div>
+        `).join('');
+    }
+
     static logout() {
+        LiveEvents.disconnect();
         authToken = null;
         currentUser = null;
         familyData = null;
@@ -375,6 +413,64 @@ class Auth {
     }
 }
 
+// События в реальном времени: сервер сообщает об изменениях в семье, дашборд перечитывается
+class LiveEvents {
+    static source = null;
+    static reloadTimer = null;
+    static reconnectTimer = null;
+    static EVENT_TYPES = [
+        'balance.changed', 'task.created', 'task.completed', 'task.reviewed',
+        'purchase.created', 'goal.completed', 'resync'
+    ];
+
+    static async connect() {
+        if (!authToken || !window.EventSource) return;
+        this.disconnect();
+
+        // EventSource не передает заголовки - в строке запроса короткий токен только для потока
+        let streamToken;
+        try {
+            streamToken = (await ApiClient.post('/events/token', {})).token;
+        } catch (error) {
+            console.error('Error getting stream token:', error);
+            return;
+        }
+        if (!authToken) return;
+
+        const url = `${API_BASE_URL}${API_VERSION}/events?token=${encodeURIComponent(streamToken)}`;
+        const source = this.source = new EventSource(url);
+
+        let opened = false;
+        source.addEventListener('open', () => {
+            // После переподключения события могли потеряться
+            if (opened) this.scheduleReload();
+            opened = true;
+        });
+        source.addEventListener('error', () => {
+            // Токен потока истек - браузер не переподключится сам, берем новый
+            if (source.readyState === EventSource.CLOSED && this.source === source) {
+                clearTimeout(this.reconnectTimer);
+                this.reconnectTimer = setTimeout(() => this.connect(), 3000);
+            }
+        });
+        this.EVENT_TYPES.forEach(type => source.addEventListener(type, () => this.scheduleReload()));
+    }
+
+    static scheduleReload() {
+        // Несколько событий одной операции - одна загрузка дашборда
+        clearTimeout(this.reloadTimer);
+        this.reloadTimer = setTimeout(() => Auth.loadDashboard(), 300);
+    }
+
+    static disconnect() {
+        clearTimeout(this.reconnectTimer);
+        if (this.source) {
+            this.source.close();
+            this.source = null;
+        }
+    }
+}
+
 // Управление заданиями
 class Tasks {
     static async loadTemplates() {
@@ -1107,11 +1203,45 @@ class ChildProfile {
 
 // Управление магазином
 class Store {
-    static async loadItems() {
+    // Ключ повтора на товар до успешной покупки: повторное нажатие или повтор запроса не спишет коины дважды
+    static pendingPurchases = {};
+
+    static pageSize = 24;
+    static nextCursor = null;
+    static filterTimer = null;
+
+    // Параметры каталога из фильтров; курсор - только для следующей страницы
+    static catalogQuery(more) {
+        const params = new URLSearchParams({ limit: this.pageSize });
+        const search = document.getElementById('store-search')?.value.trim();
+        const category = document.getElementById('store-category-filter')?.value;
+        const sort = document.getElementById('store-sort')?.value;
+        if (search) params.set('q', search);
+        if (category) params.set('category', category);
+        if (sort) params.set('sort', sort);
+        if (more && this.nextCursor) params.set('cursor', this.nextCursor);
+        return params.toString();
+    }
+
+    static applyFilters() {
+        // Поиск при вводе - после паузы, а не на каждую букву
+        clearTimeout(this.filterTimer);
+        this.filterTimer = setTimeout(() => this.loadItems(), 300);
+    }
+
+    static async loadItems(more = false) {
         try {
-            const response = await ApiClient.get('/store/items');
+            const response = await ApiClient.get(`/store/items?${this.catalogQuery(more)}`);
             const container = document.getElementById('store-container');
-            container.innerHTML = response.items.map(item => this.renderStoreItem(item)).join('');
+            const html = response.items.map(item => this.renderStoreItem(item)).join('');
+            if (more) {
+                container.insertAdjacentHTML('beforeend', html);
+            } else {
+                container.innerHTML = html || '<div class="empty-state">Товары не найдены</div>';
+            }
+            this.nextCursor = response.next_cursor;
+            const moreButton = document.getElementById('store-more');
+            if (moreButton) moreButton.style.display = this.nextCursor ? '' : 'none';
         } catch (error) {
             console.error('Error loading store items:', error);
             const container = document.getElementById('store-container');
@@ -1120,7 +1250,13 @@ class Store {
     }
 
     static renderStoreItem(item) {
-        const canBuy = currentUser.role === 'child';
+        const soldOut = item.stock_quantity === 0 || item.period_remaining === 0;
+        const canBuy = currentUser.role === 'child' && !soldOut;
+        const periods = { day: 'сегодня', week: 'на этой неделе', month: 'в этом месяце' };
+        const limits = [
+            item.stock_quantity != null ? `Осталось: ${item.stock_quantity}` : '',
+            item.period_remaining != null ? `Можно купить ${periods[item.purchase_limit_period]}: ${item.period_remaining}` : ''
+        ].filter(Boolean).join(' · ');
         const canCreateGoal = currentUser.role === 'child' || currentUser.role === 'parent';
         
         return `
@@ -1134,6 +1270,7 @@ class Store {
                 </div>
                 <div class="item-description">${item.description}</div>
                 <div class="item-category">${item.category}</div>
+                ${limits ? `<div class="item-stock">${limits}</div>` : ''}
                 <div class="item-actions">
                     ${canBuy ? `
                         <button class="btn btn-primary" onclick="Store.purchaseItem('${item.id}', ${item.price_coins || item.price})">
@@ -1155,10 +1292,13 @@ class Store {
     static async purchaseItem(itemId, price) {
         if (!confirm(`Купить этот товар за ${price} монет?`)) return;
 
+        const requestId = this.pendingPurchases[itemId] || (this.pendingPurchases[itemId] = crypto.randomUUID());
         try {
             const response = await ApiClient.post('/store/purchase', {
-                item_id: itemId
+                item_id: itemId,
+                client_request_id: requestId
             });
+            delete this.pendingPurchases[itemId];
             UI.showToast(`Товар куплен! Новый баланс: ${response.new_balance}`, 'success');
             Auth.loadDashboard(); // Обновляем баланс
         } catch (error) {
@@ -1172,11 +1312,18 @@ class Store {
 
         try {
             const itemData = {
-                name: formData.get('title'),
+                name: formData.get('name'),
                 description: formData.get('description'),
-                price_coins: parseInt(formData.get('cost')),
+                price_coins: parseInt(formData.get('price')),
                 category: formData.get('category')
             };
+            if (formData.get('stock')) {
+                itemData.stock_quantity = parseInt(formData.get('stock'));
+            }
+            if (formData.get('limit')) {
+                itemData.purchase_limit = parseInt(formData.get('limit'));
+                itemData.purchase_limit_period = formData.get('limit_period');
+            }
 
             await ApiClient.post('/store/items', itemData);
             UI.showToast('Товар добавлен!', 'success');
@@ -2178,6 +2325,8 @@ class GoalForm {
         habitData: null,
         coinTarget: null
     };
+    // Справочники мастера, загруженные одним пакетным запросом
+    static prefetched = null;
 
     static init() {
         // Проверяем авторизацию в самом начале
@@ -2204,8 +2353,28 @@ class GoalForm {
         this.updateProgress();
         this.updateButtons();
         
-        // Загружаем данные для первого шага
-        this.loadExecutorsData();
+        // Загружаем справочники всех шагов одним запросом, затем данные первого шага
+        this.prefetched = null;
+        this.prefetchFormData().finally(() => this.loadExecutorsData());
+    }
+
+    static async prefetchFormData() {
+        if (!authToken) return;
+        try {
+            const [executors, goalTypes, storeItems] = await ApiClient.batch([
+                { path: '/goals/form-data/executors' },
+                { path: '/goals/form-data/goal-types' },
+                { path: '/store/items' }
+            ]);
+            this.prefetched = {
+                executors: executors.status === 200 ? executors.body : null,
+                goalTypes: goalTypes.status === 200 ? goalTypes.body : null,
+                storeItems: storeItems.status === 200 ? storeItems.body : null
+            };
+        } catch (error) {
+            // Без пакета каждый шаг загрузит свои данные сам
+            console.error('Error prefetching goal form data:', error);
+        }
     }
 
     static async loadExecutorsData() {
@@ -2217,7 +2386,7 @@ class GoalForm {
                 return;
             }
 
-            const data = await ApiClient.get('/goals/form-data/executors');
+            const data = this.prefetched?.executors || await ApiClient.get('/goals/form-data/executors');
             this.renderExecutors(data.executors);
         } catch (error) {
             console.error('Error loading executors:', error);
@@ -2307,7 +2476,7 @@ class GoalForm {
 
     static async loadGoalTypesData() {
         try {
-            const data = await ApiClient.get('/goals/form-data/goal-types');
+            const data = this.prefetched?.goalTypes || await ApiClient.get('/goals/form-data/goal-types');
             this.renderGoalTypes(data.goal_types);
         } catch (error) {
             console.error('Error loading goal types:', error);
@@ -2359,7 +2528,7 @@ class GoalForm {
 
     static async loadStoreItems() {
         try {
-            const items = await ApiClient.get('/store');
+            const items = this.prefetched?.storeItems || await ApiClient.get('/store/items');
             this.renderStoreItems(items.items);
         } catch (error) {
             console.error('Error loading store items:', error);
@@ -2377,10 +2546,10 @@ class GoalForm {
             option.dataset.itemId = item.id;
 
             option.innerHTML = `
-                <div class="item-name">${item.title}</div>
+                <div class="item-name">${item.name}</div>
                 <div class="item-cost">
                     <i class="fas fa-coins"></i>
-                    ${item.cost}
+                    ${item.price_coins}
                 </div>
             `;
 
@@ -2401,8 +2570,8 @@ class GoalForm {
         // Сохраняем данные товара
         this.formData.storeItemData = {
             store_item_id: item.id,
-            store_item_name: item.title,
-            store_item_cost: item.cost,
+            store_item_name: item.name,
+            store_item_cost: item.price_coins,
             store_item_image_url: item.image_url,
             availability_deadline: item.availability_end_date
         };
@@ -2410,7 +2579,7 @@ class GoalForm {
         // Автоматически заполняем название цели
         const titleInput = document.getElementById('goal-title');
         if (!titleInput.value) {
-            titleInput.value = `Накопить на ${item.title}`;
+            titleInput.value = `Накопить на ${item.name}`;
             this.formData.title = titleInput.value;
         }
     }
@@ -2434,14 +2603,14 @@ class GoalForm {
 
     static async loadStoreItemsForReward() {
         try {
-            const items = await ApiClient.get('/store');
+            const items = this.prefetched?.storeItems || await ApiClient.get('/store/items');
             const select = document.getElementById('habit-reward-item');
             select.innerHTML = '<option value="">Выберите товар</option>';
             
             items.items.forEach(item => {
                 const option = document.createElement('option');
                 option.value = item.id;
-                option.textContent = `${item.title} (${item.cost} монет)`;
+                option.textContent = `${item.name} (${item.price_coins} монет)`;
                 select.appendChild(option);
             });
         } catch (error) {